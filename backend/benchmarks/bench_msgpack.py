@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+MessagePack vs JSON for the catalog and list payloads.
+
+Reads the real products, orders and transactions from MONGO_URL/DB_NAME (the
+same database the server uses). If Mongo is unreachable it falls back to the
+synthetic payloads of bench_serialization.py. For each payload it reports the
+raw and gzipped body size, plus median encode and decode time, for orjson
+(the JSON path) and msgpack (Accept: application/msgpack).
+
+    MONGO_URL=mongodb://localhost:27017 DB_NAME=gold python benchmarks/bench_msgpack.py
+"""
+import gzip
+import os
+import time
+
+import msgpack
+import orjson
+from pymongo import MongoClient, DESCENDING
+
+from bench_serialization import product, order, transaction
+from server import msgpack_default
+
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+DB_NAME = os.environ.get('DB_NAME', 'gold')
+REPEAT = int(os.environ.get('BENCH_REPEAT', '200'))
+
+
+def load_payloads():
+    try:
+        db = MongoClient(MONGO_URL, serverSelectionTimeoutMS=2000)[DB_NAME]
+        db.command('ping')
+        payloads = [
+            ("products", list(db.products.find({"is_active": True}, {"_id": 0}))),
+            ("orders (100)", list(db.orders.find({}, {"_id": 0}).sort("created_at", DESCENDING).limit(100))),
+            ("transactions (50)", list(db.transactions.find({}, {"_id": 0}).sort("created_at", DESCENDING).limit(50))),
+        ]
+        source = f"{MONGO_URL}/{DB_NAME}"
+    except Exception as e:
+        print(f"MongoDB not reachable ({type(e).__name__}); using synthetic payloads")
+        payloads = [
+            ("products (500)", [product(i) for i in range(500)]),
+            ("orders (100)", [order(i) for i in range(100)]),
+            ("transactions (50)", [transaction(i) for i in range(50)]),
+        ]
+        source = "synthetic"
+    return source, [(name, docs) for name, docs in payloads if docs]
+
+
+def timed(fn):
+    samples = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    source, payloads = load_payloads()
+    print(f"Payloads from {source}\n")
+    formats = [
+        ("json", lambda c: orjson.dumps(c, option=orjson.OPT_NON_STR_KEYS), orjson.loads),
+        ("msgpack", lambda c: msgpack.packb(c, datetime=False, default=msgpack_default), msgpack.unpackb),
+    ]
+    print(f"{'payload':<20} {'format':<8} {'bytes':>10} {'gzip bytes':>11} {'encode us':>10} {'decode us':>10}")
+    for name, docs in payloads:
+        for format_name, encode, decode in formats:
+            body = encode(docs)
+            encode_us = timed(lambda: encode(docs))
+            decode_us = timed(lambda: decode(body))
+            print(f"{name:<20} {format_name:<8} {len(body):>10,} {len(gzip.compress(body)):>11,} {encode_us:>10.1f} {decode_us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
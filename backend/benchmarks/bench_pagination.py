@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Keyset vs offset pagination benchmark on a 1M-row orders collection.
+
+Seeds BENCH_DB_NAME (default gold_bench) with synthetic orders the first time it
+runs, then times fetching a page at increasing depths using the same
+(created_at, order_id) keyset query as server.paginate() and, for comparison,
+skip()/limit(). Keyset latency should stay flat; skip latency grows with depth.
+
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_pagination.py
+"""
+import os
+import time
+import uuid
+import random
+from datetime import datetime, timezone, timedelta
+
+from pymongo import MongoClient, DESCENDING
+
+MONGO_URL = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
+DB_NAME = os.environ.get('BENCH_DB_NAME', 'gold_bench')
+ROWS = int(os.environ.get('BENCH_ROWS', '1000000'))
+PAGE_SIZE = int(os.environ.get('BENCH_PAGE_SIZE', '100'))
+DEPTHS = [1, 10, 100, 1000, 5000, 9000]
+SORT = [("created_at", DESCENDING), ("order_id", DESCENDING)]
+
+
+def seed(orders):
+    if orders.estimated_document_count() >= ROWS:
+        return
+    orders.drop()
+    print(f"Seeding {ROWS:,} orders...")
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    batch = []
+    for i in range(ROWS):
+        batch.append({
+            "order_id": f"order_{uuid.uuid4().hex[:12]}",
+            "user_id": f"user_{random.randrange(50000):06d}",
+            "items": [{"product_id": "prod_bench", "title": "خاتم", "quantity": 1, "price_qar": 1800, "subtotal": 1800}],
+            "total_qar": 1800,
+            "status": "pending",
+            # Seconds granularity so some created_at values collide and the tiebreak matters
+            "created_at": (start + timedelta(seconds=i // 3)).isoformat(),
+        })
+        if len(batch) == 10000:
+            orders.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        orders.insert_many(batch, ordered=False)
+    orders.create_index(SORT, name="created_at_-1_order_id_-1")
+
+
+def keyset_page(orders, cursor):
+    query = {}
+    if cursor:
+        last_value, last_id = cursor
+        query = {"$or": [{"created_at": {"$lt": last_value}}, {"created_at": last_value, "order_id": {"$lt": last_id}}]}
+    return list(orders.find(query, {"_id": 0}).sort(SORT).limit(PAGE_SIZE))
+
+
+def timed(fn, repeat=5):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    orders = MongoClient(MONGO_URL)[DB_NAME].orders
+    seed(orders)
+
+    # Collect the keyset cursor at each depth by walking the pages once
+    cursors = {}
+    cursor = None
+    for page in range(1, max(DEPTHS) + 1):
+        if page in DEPTHS:
+            cursors[page] = cursor
+        docs = keyset_page(orders, cursor)
+        if not docs:
+            break
+        cursor = (docs[-1]["created_at"], docs[-1]["order_id"])
+
+    print(f"{'page':>6} {'row offset':>12} {'keyset ms':>10} {'skip ms':>10}")
+    for page in DEPTHS:
+        if page not in cursors:
+            continue
+        offset = (page - 1) * PAGE_SIZE
+        keyset_ms = timed(lambda: keyset_page(orders, cursors[page]))
+        skip_ms = timed(lambda: list(orders.find({}, {"_id": 0}).sort(SORT).skip(offset).limit(PAGE_SIZE)))
+        print(f"{page:>6} {offset:>12,} {keyset_ms:>10.2f} {skip_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
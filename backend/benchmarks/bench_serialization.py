@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Response serialization benchmark: FastAPI's default path vs server.fast_response().
+
+Payloads mirror the shapes the hot endpoints return (Arabic titles and
+descriptions, image URLs, order line items) at their default page sizes. For
+each endpoint it times
+
+    before: [response_model validation] + jsonable_encoder + JSONResponse (json.dumps)
+    after:  ORJSONResponse on the raw documents, as fast_response() does
+
+and reports the median microseconds per response and the body size.
+
+    python benchmarks/bench_serialization.py
+"""
+import os
+import sys
+import time
+import uuid
+import random
+from datetime import datetime, timezone, timedelta
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from pydantic import TypeAdapter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from server import GoldPriceResponse, GOLD_KARATS  # noqa: E402
+
+REPEAT = int(os.environ.get('BENCH_REPEAT', '200'))
+NOW = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+TITLES = ["خاتم ذهب عيار 21", "سبيكة ذهب 50 جرام", "عقد لؤلؤ طبيعي", "أسورة ذهب إيطالية", "طقم ألماس فاخر"]
+DESCRIPTION = "قطعة مصنوعة يدوياً من الذهب الخالص بتصميم قطري أصيل مستوحى من التراث، مناسبة للهدايا والمناسبات. " * 3
+
+
+def product(i):
+    weight = round(random.uniform(2, 100), 2)
+    price = round(weight * random.uniform(250, 400), 2)
+    return {
+        "product_id": f"prod_{uuid.uuid4().hex[:8]}",
+        "title": random.choice(TITLES),
+        "description": DESCRIPTION,
+        "type": random.choice(["jewelry", "investment_bar", "designer"]),
+        "category": random.choice(["خواتم", "عقود", "أساور", "سبائك"]),
+        "karat": random.choice(GOLD_KARATS),
+        "weight_grams": weight,
+        "price_qar": price,
+        "price_per_gram": round(price / weight, 2),
+        "image_url": f"https://images.unsplash.com/photo-{1600000000000 + i}?w=400&h=400&fit=crop",
+        "images": [f"https://images.unsplash.com/photo-{1600000000000 + i + k}?w=800" for k in range(4)],
+        "merchant_name": "مجوهرات الدوحة",
+        "designer_name": None,
+        "is_active": True,
+        "change_seq": i,
+    }
+
+
+def order(i):
+    items = [{"product_id": f"prod_{k}", "title": random.choice(TITLES), "quantity": 1, "price_qar": 1800.0, "subtotal": 1800.0}
+             for k in range(random.randint(1, 4))]
+    total = sum(item["subtotal"] for item in items)
+    return {
+        "order_id": f"order_{uuid.uuid4().hex[:12]}",
+        "user_id": "user_bench",
+        "items": items,
+        "subtotal_qar": total,
+        "discount_qar": 0,
+        "total_qar": total,
+        "status": "pending",
+        "created_at": (NOW - timedelta(hours=i)).isoformat(),
+    }
+
+
+def transaction(i):
+    return {
+        "transaction_id": f"txn_{uuid.uuid4().hex[:12]}",
+        "user_id": "user_bench",
+        "type": random.choice(["buy", "sell"]),
+        "grams": round(random.uniform(1, 50), 3),
+        "price_per_gram_qar": 352.4,
+        "total_qar": round(random.uniform(300, 15000), 2),
+        "created_at": (NOW - timedelta(hours=i)).isoformat(),
+    }
+
+
+def gold_price(karat):
+    return {"karat": karat, "price_per_gram_qar": round(352.4 * karat / 24, 2), "change_amount": 1.25,
+            "change_percent": 0.35, "updated_at": NOW.isoformat()}
+
+
+def timed(fn):
+    samples = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1e6)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    random.seed(7)
+    gold_adapter = TypeAdapter(List[GoldPriceResponse])
+    endpoints = [
+        ("/gold-prices", [gold_price(k) for k in GOLD_KARATS],
+         lambda c: JSONResponse(gold_adapter.dump_python(gold_adapter.validate_python(c), mode="json")).body),
+        ("/products (100)", [product(i) for i in range(100)], None),
+        ("/products (500)", [product(i) for i in range(500)], None),
+        ("/orders (50)", [order(i) for i in range(50)], None),
+        ("/transactions (50)", [transaction(i) for i in range(50)], None),
+    ]
+
+    print(f"{'endpoint':<20} {'bytes':>9} {'before us':>10} {'after us':>10} {'speedup':>8}")
+    for name, payload, before in endpoints:
+        before = before or (lambda c: JSONResponse(jsonable_encoder(c)).body)
+        before_us = timed(lambda: before(payload))
+        after_us = timed(lambda: ORJSONResponse(payload).body)
+        size = len(ORJSONResponse(payload).body)
+        print(f"{name:<20} {size:>9,} {before_us:>10.1f} {after_us:>10.1f} {before_us / after_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Latency of the admin 360° user overview against a running server.
+
+Logs in as the admin, then requests GET /api/admin/users/{id}/overview
+BENCH_REPEAT times for OVERVIEW_USER_ID (default: the admin's own account) and
+reports the median and p95 round trip. Exits 1 when the median is over
+OVERVIEW_BUDGET_MS, so it can gate a performance job; it is not part of the
+functional test suite because timings depend on the machine and its load.
+
+    REACT_APP_BACKEND_URL=http://localhost:8001 python benchmarks/bench_user_overview.py
+"""
+import os
+import sys
+
+import requests
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'http://localhost:8001').rstrip('/')
+ADMIN_CREDENTIALS = {"email": "eng.mohamed87@live.com", "password": "Realmadridclub2011"}
+REPEAT = int(os.environ.get('BENCH_REPEAT', '21'))
+BUDGET_MS = float(os.environ.get('OVERVIEW_BUDGET_MS', '300'))
+
+
+def main():
+    session = requests.Session()
+    response = session.post(f"{BASE_URL}/api/auth/login", json=ADMIN_CREDENTIALS)
+    response.raise_for_status()
+    session.headers.update({"Authorization": f"Bearer {response.json()['token']}"})
+    user_id = os.environ.get('OVERVIEW_USER_ID') or session.get(f"{BASE_URL}/api/auth/me").json()["user_id"]
+
+    url = f"{BASE_URL}/api/admin/users/{user_id}/overview"
+    session.get(url).raise_for_status()  # warm the connection and server caches
+    samples = []
+    for _ in range(REPEAT):
+        response = session.get(url)
+        response.raise_for_status()
+        samples.append(response.elapsed.total_seconds() * 1000)
+    samples.sort()
+
+    median = samples[len(samples) // 2]
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"{'user':>20} {'median ms':>10} {'p95 ms':>10} {'budget ms':>10}")
+    print(f"{user_id:>20} {median:>10.1f} {p95:>10.1f} {BUDGET_MS:>10.0f}")
+    return 0 if median <= BUDGET_MS else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,52 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, Request, Response, BackgroundTasks
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response, BackgroundTasks
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.utils import is_body_allowed_for_status_code
+from starlette.exceptions import HTTPException as StarletteHTTPException
 from fastapi.security import HTTPBearer
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import IndexModel, UpdateOne, ReplaceOne, ReturnDocument, ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional
+from typing import Dict, List, Optional
+from collections import defaultdict
 import uuid
 from datetime import datetime, timezone, timedelta
 import bcrypt
 import jwt
 import httpx
 import asyncio
+import base64
+import bisect
+import csv
+import gzip
+import hashlib
+import io
+import json
+import math
+import re
+import unicodedata
+import time
+import zlib
+import shutil
+import tempfile
+from urllib.parse import parse_qsl
 import resend
 import secrets
 import certifi
+import numpy as np
+import orjson
+import msgpack
+import brotli
+from contextvars import ContextVar
+from contextlib import asynccontextmanager
+from starlette.datastructures import MutableHeaders
+from starlette.responses import FileResponse, StreamingResponse
 
 ROOT_DIR = Path(__file__).parent
 env_path = ROOT_DIR / '.env'
@@ -26,12 +56,13 @@ if env_path.exists():
 # MongoDB connection with SSL certificate for Atlas
 mongo_url = os.environ.get('MONGO_URL', 'mongodb://localhost:27017')
 db_name = os.environ.get('DB_NAME', 'gold')
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '10'))
 
 try:
     if 'mongodb+srv' in mongo_url or 'mongodb.net' in mongo_url:
-        client = AsyncIOMotorClient(mongo_url, tlsCAFile=certifi.where(), serverSelectionTimeoutMS=5000)
+        client = AsyncIOMotorClient(mongo_url, tlsCAFile=certifi.where(), serverSelectionTimeoutMS=5000, minPoolSize=MONGO_MIN_POOL_SIZE)
     else:
-        client = AsyncIOMotorClient(mongo_url, serverSelectionTimeoutMS=5000)
+        client = AsyncIOMotorClient(mongo_url, serverSelectionTimeoutMS=5000, minPoolSize=MONGO_MIN_POOL_SIZE)
     db = client[db_name]
 except Exception as e:
     print(f"MongoDB connection error: {e}")
@@ -57,7 +88,238 @@ if RESEND_API_KEY:
 last_gold_prices = {}
 price_update_subscribers = []
 
-app = FastAPI()
+# ==================== RESPONSES ====================
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+JSON_MEDIA_TYPES = ("application/json", "application/*", "*/*")
+# Wire format negotiated for the current request; set by ContentNegotiationMiddleware
+response_format: ContextVar[str] = ContextVar("response_format", default="json")
+
+def negotiate_format(accept: str) -> str:
+    """msgpack when Accept lists it with at least the quality given to JSON"""
+    msgpack_q = json_q = 0.0
+    for part in accept.split(","):
+        media_type, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if media_type in MSGPACK_MEDIA_TYPES:
+            msgpack_q = max(msgpack_q, q)
+        elif media_type in JSON_MEDIA_TYPES:
+            json_q = max(json_q, q)
+    return "msgpack" if msgpack_q > 0 and msgpack_q >= json_q else "json"
+
+def msgpack_default(value):
+    # Same shapes the JSON encoder produces, so both formats share one schema
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def orjson_default(value):
+    # orjson covers datetimes and numpy itself; models are dumped as on the msgpack path
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def encode_body(content) -> tuple:
+    """(body, media type) for the negotiated format"""
+    if response_format.get() == "msgpack":
+        return msgpack.packb(content, default=msgpack_default, datetime=False), MSGPACK_MEDIA_TYPES[0]
+    return orjson.dumps(content, default=orjson_default,
+                        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY), "application/json"
+
+def merge_vary(headers: MutableHeaders, value: str):
+    """Add fields to Vary without repeating ones already listed"""
+    fields = [field.strip() for field in f"{headers.get('vary', '')},{value}".split(",") if field.strip()]
+    headers["vary"] = ", ".join(dict.fromkeys(fields))
+
+class ApiResponse(Response):
+    """Default response class: orjson, or MessagePack when the client asked for it"""
+    media_type = "application/json"
+
+    def __init__(self, content=None, status_code: int = 200, headers=None, media_type=None, background=None):
+        body, negotiated = encode_body(content)
+        super().__init__(body, status_code, headers, media_type or negotiated, background)
+        merge_vary(self.headers, "Accept")
+
+class ContentNegotiationMiddleware:
+    """Pure ASGI middleware so the negotiated format is visible to the endpoint's context"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api"):
+            return await self.app(scope, receive, send)
+        accept = next((v.decode("latin-1") for k, v in scope["headers"] if k == b"accept"), "")
+        token = response_format.set(negotiate_format(accept))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            response_format.reset(token)
+
+# Bodies below this size are sent uncompressed; framing overhead outweighs the saving
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+# Larger bodies are compressed off the event loop
+COMPRESS_IN_THREAD_BYTES = 256 * 1024
+COMPRESSIBLE_TYPES = ("application/json", "application/msgpack", "application/x-ndjson", "text/")
+# (gzip level, brotli quality): fast for per-request bodies, thorough for cached bodies compressed once
+COMPRESS_LEVELS = {"fast": (6, 4), "cached": (9, 9)}
+
+def negotiate_encoding(accept_encoding: str) -> str:
+    """Preferred content coding from Accept-Encoding: br, then gzip, else identity"""
+    qualities = {}
+    for part in accept_encoding.split(","):
+        coding, *params = [p.strip() for p in part.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        qualities[coding.lower()] = q
+    wildcard = qualities.get("*", 0.0)
+    for coding in ("br", "gzip"):
+        if qualities.get(coding, wildcard) > 0:
+            return coding
+    return "identity"
+
+def compress(body: bytes, encoding: str, level: str = "fast") -> bytes:
+    gzip_level, brotli_quality = COMPRESS_LEVELS[level]
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level)
+
+async def compress_async(body: bytes, encoding: str, level: str = "fast") -> bytes:
+    if len(body) >= COMPRESS_IN_THREAD_BYTES:
+        return await asyncio.to_thread(compress, body, encoding, level)
+    return compress(body, encoding, level)
+
+class CompressionMiddleware:
+    """gzip/brotli for /api responses above COMPRESS_MIN_BYTES.
+
+    Responses that already carry Content-Encoding (precompressed cache entries) and streamed
+    responses pass through uncompressed. Every response of a compressible type gets
+    Vary: Accept-Encoding, compressed or not, so a shared cache never hands an identity
+    body stored for one client to another that asked differently.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith("/api"):
+            return await self.app(scope, receive, send)
+        accept_encoding = next((v.decode("latin-1") for k, v in scope["headers"] if k == b"accept-encoding"), "")
+        encoding = negotiate_encoding(accept_encoding)
+
+        start = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                if headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+                    merge_vary(headers, "Accept-Encoding")
+                if encoding == "identity":
+                    passthrough = True
+                    await send(message)
+                    return
+                start = message
+                return
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] != "http.response.body":
+                # zerocopysend / pathsend: already-encoded file bodies go out as they are
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+            if (message.get("more_body") or "content-encoding" in headers or len(body) < COMPRESS_MIN_BYTES
+                    or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+            body = await compress_async(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+# Internal render requests carry this header so they reach the real handlers
+SNAPSHOT_RENDER_HEADER = "x-snapshot-render"
+
+class StaticSnapshotMiddleware:
+    """Serve pre-rendered public responses from disk before routing, dependency injection or serialization.
+
+    Uses the ASGI zerocopysend extension (sendfile) when the server offers it, otherwise
+    FileResponse, which in turn prefers pathsend. Anything not in the manifest falls through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD") or not scope["path"].startswith("/api"):
+            return await self.app(scope, receive, send)
+        query = "&".join(f"{k}={v}" for k, v in sorted(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True)))
+        entry = static_snapshots.manifest.get((scope["path"], query))
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        if entry is None or SNAPSHOT_RENDER_HEADER in headers or negotiate_format(headers.get("accept", "")) != "json":
+            return await self.app(scope, receive, send)
+
+        if etag_matches_header(headers.get("if-none-match"), entry.etag):
+            return await Response(status_code=304, headers=entry.validators)(scope, receive, send)
+        encoding = negotiate_encoding(headers.get("accept-encoding", ""))
+        if encoding not in entry.files:
+            encoding = "identity"
+        path, size = entry.files[encoding]
+        response_headers = {**entry.headers, "content-length": str(size)}
+        if encoding != "identity":
+            response_headers["content-encoding"] = encoding
+
+        if "http.response.zerocopysend" in scope.get("extensions", {}) and scope["method"] == "GET":
+            with open(path, "rb") as file:
+                await send({"type": "http.response.start", "status": 200,
+                            "headers": [(k.encode("latin-1"), v.encode("latin-1")) for k, v in response_headers.items()]})
+                await send({"type": "http.response.zerocopysend", "file": file.fileno(), "count": size})
+            return
+        response = FileResponse(path, headers=response_headers, media_type=entry.headers["content-type"], method=scope["method"])
+        await response(scope, receive, send)
+
+def fast_response(content, response: Optional[Response] = None) -> Response:
+    """Serialize trusted DB/snapshot data directly, skipping jsonable_encoder and response_model validation.
+
+    Headers already set on the injected response (cursors, catalog version) are carried over.
+    """
+    fast = ApiResponse(content)
+    if response is not None:
+        for key, value in response.raw_headers:
+            if key == b"vary":
+                merge_vary(fast.headers, value.decode("latin-1"))
+            else:
+                fast.raw_headers.append((key, value))
+    return fast
+
+app = FastAPI(default_response_class=ApiResponse)
 
 # CORS configuration - MUST be added right after app creation
 allowed_origins = [
@@ -68,13 +330,30 @@ allowed_origins = [
     "http://127.0.0.1:3000"
 ]
 
+# Innermost, so CORS, negotiation and compression still wrap snapshot responses
+app.add_middleware(StaticSnapshotMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=allowed_origins,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Catalog-Version"],
 )
+app.add_middleware(ContentNegotiationMiddleware)
+app.add_middleware(CompressionMiddleware)
+
+@app.exception_handler(StarletteHTTPException)
+async def http_exception_handler(request: Request, exc: StarletteHTTPException):
+    # Errors use the negotiated format too
+    headers = getattr(exc, "headers", None)
+    if not is_body_allowed_for_status_code(exc.status_code):
+        return Response(status_code=exc.status_code, headers=headers)
+    return ApiResponse({"detail": exc.detail}, status_code=exc.status_code, headers=headers)
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    return ApiResponse({"detail": jsonable_encoder(exc.errors())}, status_code=422)
 
 api_router = APIRouter(prefix="/api")
 
@@ -119,6 +398,8 @@ class ProductCreate(BaseModel):
     merchant_name: Optional[str] = None
     stock: int = 10
     category: Optional[str] = None
+    price_linked: bool = False  # reprice from the live karat price every tick
+    making_charge: float = 1.0  # multiplier over weight × karat price
 
 class ProductResponse(BaseModel):
     product_id: str
@@ -219,6 +500,22 @@ class GiftVoucherCreate(BaseModel):
     message: Optional[str] = ""
     validity_days: int = 365
 
+class CouponCreate(BaseModel):
+    code: str
+    discount_type: str  # percentage, fixed
+    value: float
+    categories: List[str] = []
+    merchants: List[str] = []
+    karats: List[int] = []
+    min_order_qar: float = 0
+    max_discount_qar: Optional[float] = None
+    usage_limit: Optional[int] = None
+    expires_at: Optional[datetime] = None
+    is_active: bool = True
+
+class MetalSpotUpdate(BaseModel):
+    usd_per_oz: float
+
 class GiftVoucherResponse(BaseModel):
     voucher_id: str
     voucher_code: str
@@ -279,64 +576,1590 @@ async def get_admin_user(request: Request) -> dict:
         raise HTTPException(status_code=403, detail="غير مسموح - صلاحيات الأدمن مطلوبة")
     return user
 
-# ==================== STARTUP ====================
+# ==================== INDEXES ====================
+
+# Declarative index spec per collection: (keys, options). Reconciled at startup.
+INDEX_SPECS = {
+    "users": [
+        ([("email", ASCENDING)], {"unique": True}),
+        ([("user_id", ASCENDING)], {"unique": True}),
+        ([("role", ASCENDING)], {}),
+        ([("created_at", DESCENDING), ("user_id", DESCENDING)], {}),
+    ],
+    "wallets": [
+        ([("user_id", ASCENDING)], {"unique": True}),
+    ],
+    "products": [
+        ([("product_id", ASCENDING)], {"unique": True}),
+        ([("is_active", ASCENDING), ("type", ASCENDING), ("category", ASCENDING)], {}),
+        ([("is_active", ASCENDING), ("created_at", DESCENDING)], {}),
+        ([("is_active", ASCENDING), ("type", ASCENDING), ("created_at", DESCENDING)], {}),
+        ([("type", ASCENDING)], {}),
+        ([("change_seq", ASCENDING)], {}),
+    ],
+    "merchants": [
+        ([("merchant_id", ASCENDING)], {"unique": True}),
+        ([("is_active", ASCENDING)], {}),
+        ([("change_seq", ASCENDING)], {}),
+    ],
+    "designers": [
+        ([("designer_id", ASCENDING)], {"unique": True}),
+        ([("is_active", ASCENDING)], {}),
+        ([("change_seq", ASCENDING)], {}),
+    ],
+    "catalog_tombstones": [
+        ([("change_seq", ASCENDING)], {}),
+    ],
+    "gold_prices": [
+        ([("karat", ASCENDING)], {"unique": True}),
+        ([("change_seq", ASCENDING)], {}),
+    ],
+    "carts": [
+        ([("user_id", ASCENDING)], {"unique": True}),
+    ],
+    "orders": [
+        ([("order_id", ASCENDING)], {"unique": True}),
+        ([("user_id", ASCENDING), ("created_at", DESCENDING), ("order_id", DESCENDING)], {}),
+        ([("created_at", DESCENDING), ("order_id", DESCENDING)], {}),
+    ],
+    "transactions": [
+        ([("transaction_id", ASCENDING)], {"unique": True}),
+        ([("user_id", ASCENDING), ("created_at", DESCENDING), ("transaction_id", DESCENDING)], {}),
+    ],
+    "notifications": [
+        ([("notification_id", ASCENDING)], {"unique": True}),
+        ([("user_id", ASCENDING), ("created_at", DESCENDING), ("notification_id", DESCENDING)], {}),
+        ([("user_id", ASCENDING), ("read", ASCENDING)], {}),
+    ],
+    "price_alerts": [
+        ([("alert_id", ASCENDING)], {"unique": True}),
+        ([("user_id", ASCENDING), ("created_at", DESCENDING)], {}),
+        ([("triggered", ASCENDING)], {}),
+    ],
+    "password_resets": [
+        ([("email", ASCENDING)], {"unique": True}),
+        ([("token", ASCENDING)], {}),
+    ],
+    "sharia_acceptance": [
+        ([("user_id", ASCENDING)], {"unique": True}),
+    ],
+    "gift_vouchers": [
+        ([("voucher_code", ASCENDING)], {"unique": True}),
+        ([("voucher_code", ASCENDING), ("status", ASCENDING), ("expires_at", ASCENDING)], {}),
+        ([("voucher_id", ASCENDING)], {"unique": True}),
+        ([("sender_id", ASCENDING), ("created_at", DESCENDING), ("voucher_id", DESCENDING)], {}),
+        ([("redeemed_by", ASCENDING), ("redeemed_at", DESCENDING)], {}),
+    ],
+    "gifts": [
+        ([("gift_token", ASCENDING)], {"unique": True}),
+    ],
+    "portfolio": [
+        ([("id", ASCENDING)], {"unique": True}),
+        ([("user_id", ASCENDING)], {}),
+    ],
+    "coupons": [
+        ([("code", ASCENDING)], {"unique": True}),
+        ([("coupon_id", ASCENDING)], {"unique": True}),
+        ([("is_active", ASCENDING), ("remaining_uses", ASCENDING)], {}),
+        ([("created_at", DESCENDING)], {}),
+    ],
+    "seller_sales": [
+        ([("kind", ASCENDING), ("revenue_qar", DESCENDING)], {}),
+        ([("kind", ASCENDING), ("units", DESCENDING)], {}),
+        ([("kind", ASCENDING), ("orders", DESCENDING)], {}),
+    ],
+}
+
+# Every filtered query shape issued by this module: (collection, filter, sort).
+# Unfiltered reads of tiny collections (gold_prices) and count_documents({}) are not listed.
+QUERY_SHAPES = [
+    ("users", {"email": "x"}, None),
+    ("users", {"user_id": "x"}, None),
+    ("users", {"role": "admin"}, None),
+    ("users", {}, [("created_at", DESCENDING), ("user_id", DESCENDING)]),
+    ("users", {"role": "user"}, [("created_at", DESCENDING), ("user_id", DESCENDING)]),
+    ("wallets", {"user_id": "x"}, None),
+    ("products", {"product_id": "x"}, None),
+    ("products", {"product_id": {"$in": ["x"]}}, None),
+    ("products", {"is_active": True}, None),
+    ("products", {"is_active": True, "type": "jewelry"}, None),
+    ("products", {"is_active": True, "type": "jewelry", "category": "خواتم"}, None),
+    ("products", {"is_active": True}, [("created_at", DESCENDING)]),
+    ("products", {"is_active": True, "type": "jewelry"}, [("created_at", DESCENDING)]),
+    ("products", {"type": "designer"}, None),
+    ("products", {}, [("product_id", ASCENDING)]),
+    ("products", {"type": "designer"}, [("product_id", ASCENDING)]),
+    ("merchants", {"merchant_id": "x"}, None),
+    ("merchants", {"is_active": True}, None),
+    ("merchants", {"merchant_id": {"$in": ["x"]}}, None),
+    ("designers", {"designer_id": "x"}, None),
+    ("designers", {"is_active": True}, None),
+    ("designers", {"designer_id": {"$in": ["x"]}}, None),
+    ("gold_prices", {"karat": 24}, None),
+    ("gold_prices", {"change_seq": {"$gt": 0}}, None),
+    ("products", {"change_seq": {"$gt": 0}}, None),
+    ("merchants", {"change_seq": {"$gt": 0}}, None),
+    ("designers", {"change_seq": {"$gt": 0}}, None),
+    ("catalog_tombstones", {"change_seq": {"$gt": 0}}, None),
+    ("carts", {"user_id": "x"}, None),
+    ("orders", {"order_id": "x"}, None),
+    ("orders", {"order_id": "x", "user_id": "x"}, None),
+    ("orders", {"user_id": "x"}, [("created_at", DESCENDING)]),
+    ("orders", {"user_id": "x"}, [("created_at", DESCENDING), ("order_id", DESCENDING)]),
+    ("orders", {}, [("created_at", DESCENDING), ("order_id", DESCENDING)]),
+    ("transactions", {"user_id": "x"}, [("created_at", DESCENDING), ("transaction_id", DESCENDING)]),
+    ("notifications", {"user_id": "x"}, [("created_at", DESCENDING), ("notification_id", DESCENDING)]),
+    ("notifications", {"notification_id": "x", "user_id": "x"}, None),
+    ("notifications", {"user_id": "x", "read": False}, None),
+    ("price_alerts", {"triggered": False}, None),
+    ("price_alerts", {"user_id": "x"}, [("created_at", DESCENDING)]),
+    ("price_alerts", {"alert_id": "x", "user_id": "x"}, None),
+    ("password_resets", {"email": "x"}, None),
+    ("password_resets", {"token": {"$regex": "^abcdefgh"}, "used": False}, None),
+    ("sharia_acceptance", {"user_id": "x"}, None),
+    ("gift_vouchers", {"voucher_code": "x"}, None),
+    ("gift_vouchers", {"sender_id": "x"}, [("created_at", DESCENDING), ("voucher_id", DESCENDING)]),
+    ("gift_vouchers", {"redeemed_by": "x"}, [("redeemed_at", DESCENDING)]),
+    ("gifts", {"gift_token": "x"}, None),
+    ("portfolio", {"user_id": "x"}, None),
+    ("portfolio", {"id": "x", "user_id": "x"}, None),
+    ("coupons", {"code": "x"}, None),
+    ("coupons", {"coupon_id": "x"}, None),
+    ("coupons", {"is_active": True, "remaining_uses": {"$ne": 0}}, None),
+    ("coupons", {}, [("created_at", DESCENDING)]),
+    ("seller_sales", {"kind": "merchant"}, [("revenue_qar", DESCENDING)]),
+    ("seller_sales", {"kind": "merchant"}, [("units", DESCENDING)]),
+    ("seller_sales", {"kind": "merchant"}, [("orders", DESCENDING)]),
+]
 
-@app.on_event("startup")
-async def startup_event():
-    # Wait for MongoDB connection
-    if db is None:
-        logger.error("MongoDB not connected!")
+# Indexes this module created in the past and has since replaced (e.g. widened with a tiebreak
+# field). Only these are dropped; indexes created by ops or other services are left alone.
+SUPERSEDED_INDEXES = {
+    "orders": ["user_id_1_created_at_-1", "created_at_-1"],
+    "transactions": ["user_id_1_created_at_-1"],
+    "notifications": ["user_id_1_created_at_-1"],
+    "gift_vouchers": ["sender_id_1_created_at_-1"],
+}
+
+def index_name(keys) -> str:
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+async def ensure_indexes():
+    """Reconcile INDEX_SPECS with the database; safe to run on every boot"""
+    for collection_name, specs in INDEX_SPECS.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        for name in SUPERSEDED_INDEXES.get(collection_name, []):
+            if name in existing:
+                await collection.drop_index(name)
+        models = []
+        for keys, options in specs:
+            name = index_name(keys)
+            current = existing.get(name)
+            if current and bool(current.get("unique")) != bool(options.get("unique")):
+                # Spec changed (e.g. unique added) - rebuild under the same name
+                await collection.drop_index(name)
+                current = None
+            if not current:
+                models.append(IndexModel(keys, name=name, **options))
+        if not models:
+            continue
+        try:
+            await collection.create_indexes(models)
+            logger.info(f"Created {len(models)} index(es) on {collection_name}")
+        except Exception as e:
+            # Usually duplicate values blocking a unique index; keep booting
+            logger.error(f"Index creation failed on {collection_name}: {e}")
+
+def plan_has_collscan(plan) -> bool:
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(plan_has_collscan(v) for v in plan.values())
+    if isinstance(plan, list):
+        return any(plan_has_collscan(v) for v in plan)
+    return False
+
+async def find_collscans() -> list:
+    """Explain every entry in QUERY_SHAPES and return those that fall back to a COLLSCAN"""
+    offenders = []
+    for collection_name, query, sort in QUERY_SHAPES:
+        cursor = db[collection_name].find(query, {"_id": 0})
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        if plan_has_collscan(explain.get("queryPlanner", {}).get("winningPlan", {})):
+            offenders.append((collection_name, query, sort))
+    return offenders
+
+# ==================== CONDITIONAL GET ====================
+
+# Cache-Control per route family
+CACHE_POLICIES = {
+    "catalog_list": "public, max-age=30, stale-while-revalidate=60",
+    "catalog_item": "public, max-age=120, stale-while-revalidate=300",
+    "prices": "public, max-age=15",
+    # Status can flip on redeem, so always revalidate; the 304 path is cheap
+    "voucher": "private, no-cache",
+}
+
+def make_etag(*parts) -> str:
+    """Weak ETag over the version parts and the negotiated wire format"""
+    encoded = "|".join(str(part) for part in (*parts, response_format.get())).encode()
+    return f'W/"{hashlib.blake2b(encoded, digest_size=12).hexdigest()}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    return etag_matches_header(request.headers.get("if-none-match"), etag)
+
+def etag_matches_header(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110): W/ prefixes are ignored
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+def validator_headers(etag: str, policy: str) -> dict:
+    return {"ETag": etag, "Cache-Control": CACHE_POLICIES[policy], "Vary": "Accept, Accept-Encoding"}
+
+def not_modified(request: Request, etag: str, policy: str) -> Optional[Response]:
+    """304 for a matching If-None-Match, checked before any data is loaded"""
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=validator_headers(etag, policy))
+    return None
+
+# ==================== CACHE ====================
+
+class TTLCache:
+    """In-process cache for hot read endpoints; concurrent misses on a key share one load"""
+
+    def __init__(self, ttl_seconds: float, max_entries: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = {}
+        self._loading = {}  # key -> future of the current load; invalidate() retires it
+
+    async def get_or_load(self, key: str, loader):
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+
+        pending = self._loading.get(key)
+        if pending:
+            return await pending
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            value = await loader()
+            # Invalidated mid-load: the value may predate the write, so it is returned but not cached
+            if self._loading.get(key) is future:
+                self._entries.pop(key, None)
+                self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+                if self.max_entries and len(self._entries) > self.max_entries:
+                    # Oldest insertion first
+                    del self._entries[next(iter(self._entries))]
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a miss with no other waiters does not log "never retrieved"
+            future.exception()
+            raise
+        finally:
+            if self._loading.get(key) is future:
+                del self._loading[key]
+
+    def invalidate(self, prefix: str = ""):
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            del self._entries[key]
+        for key in [k for k in self._loading if k.startswith(prefix)]:
+            # Later callers start a fresh load instead of joining this one
+            del self._loading[key]
+
+read_cache = TTLCache(ttl_seconds=int(os.environ.get('READ_CACHE_TTL', '60')))
+
+class EncodedBody:
+    """A serialized response body with the headers it was built with; compressed variants are made once, on demand"""
+
+    def __init__(self, body: bytes, media_type: str, headers: list):
+        self.media_type = media_type
+        self.headers = headers
+        self.variants = {"identity": body}
+
+    async def variant(self, encoding: str) -> tuple:
+        identity = self.variants["identity"]
+        if encoding == "identity" or len(identity) < COMPRESS_MIN_BYTES:
+            return "identity", identity
+        if encoding not in self.variants:
+            self.variants[encoding] = await compress_async(identity, encoding, level="cached")
+        return encoding, self.variants[encoding]
+
+# Serialized bodies of cacheable responses; keys are bounded because they include query parameters
+body_cache = TTLCache(ttl_seconds=int(os.environ.get('READ_CACHE_TTL', '60')), max_entries=512)
+
+def canonical_query(request: Request) -> str:
+    """Query string with parameters sorted, so equivalent URLs share a cache key"""
+    return "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+
+async def cached_response(request: Request, key: str, build,
+                          etag: Optional[str] = None, policy: Optional[str] = None) -> Response:
+    """Serve `build(response)` from body_cache, already serialized and compressed for this client.
+
+    Headers build sets on its scratch response (cursors, versions) are cached with the body.
+    Keys get the wire format appended; callers include every input that changes the content.
+    With an etag, a matching If-None-Match is answered 304 without touching the cache.
+    """
+    if etag:
+        unchanged = not_modified(request, etag, policy)
+        if unchanged:
+            return unchanged
+
+    async def load():
+        scratch = Response()
+        content = await build(scratch)
+        body, media_type = encode_body(content)
+        del scratch.headers["content-length"]
+        return EncodedBody(body, media_type, scratch.raw_headers)
+
+    entry = await body_cache.get_or_load(f"{key}:{response_format.get()}", load)
+    encoding, body = await entry.variant(negotiate_encoding(request.headers.get("accept-encoding", "")))
+    response = Response(content=body, media_type=entry.media_type, headers={"Vary": "Accept, Accept-Encoding"})
+    if encoding != "identity":
+        response.headers["Content-Encoding"] = encoding
+    if etag:
+        response.headers.update(validator_headers(etag, policy))
+    response.raw_headers.extend(entry.headers)
+    return response
+
+async def prime_connection_pool():
+    """Open MONGO_MIN_POOL_SIZE connections up front by running that many pings concurrently"""
+    await asyncio.gather(*(client.admin.command('ping') for _ in range(MONGO_MIN_POOL_SIZE)))
+
+async def warm_read_caches():
+    """Load the catalog snapshot and prices so the first requests hit memory"""
+    await asyncio.gather(cached_gold_prices(), ensure_catalog())
+    if STATIC_SNAPSHOTS_ENABLED:
+        await asyncio.to_thread(static_snapshots.prepare)
+        static_snapshots.refresh()
+
+# ==================== CATALOG SNAPSHOT ====================
+
+# Catalog collections held in memory, with the business id field of each
+CATALOG_COLLECTIONS = {"products": "product_id", "merchants": "merchant_id", "designers": "designer_id"}
+PRODUCT_INDEX_FIELDS = ("type", "category", "merchant_name", "designer_name")
+# Listing sorts: name -> (field, descending). Without a sort, listings keep load position order
+PRODUCT_SORTS = {
+    "price_asc": ("price_qar", False),
+    "price_desc": ("price_qar", True),
+    "weight_asc": ("weight_grams", False),
+    "weight_desc": ("weight_grams", True),
+    "price_per_gram_asc": ("price_per_gram", False),
+    "price_per_gram_desc": ("price_per_gram", True),
+    "newest": ("created_at", True),
+}
+CATALOG_RELOAD_SECONDS = int(os.environ.get('CATALOG_RELOAD_SECONDS', '60'))
+
+def sort_number(value):
+    """Numeric form of a sort field, so keys can be negated and cursors stay numbers: timestamps become epoch seconds"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if isinstance(value, datetime):
+        return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+    return value
+
+def price_per_gram(product: dict) -> Optional[float]:
+    weight = product.get("weight_grams")
+    if not weight or product.get("price_qar") is None:
+        return None
+    return round(product["price_qar"] / weight, 2)
+
+def doc_digest(doc: dict) -> int:
+    encoded = orjson.dumps(doc, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str)
+    return int.from_bytes(hashlib.blake2b(encoded, digest_size=16).digest(), "big")
+
+class CatalogSnapshot:
+    """Whole catalog in memory; active products are indexed by type, category, merchant and designer"""
+
+    def __init__(self):
+        self.docs = {name: {} for name in CATALOG_COLLECTIONS}
+        self.positions = {}  # product_id -> load order, keeps listings in natural order
+        self.object_ids = {}  # (collection, _id) -> business id, resolves change-stream deletes
+        self.product_indexes = {field: {} for field in PRODUCT_INDEX_FIELDS}
+        self.active_lists = {}
+        self.version = 0
+        # Content digests, identical on every worker holding the same data; used for ETags
+        self.doc_hashes = {name: {} for name in CATALOG_COLLECTIONS}
+        self.digests = dict.fromkeys(CATALOG_COLLECTIONS, 0)
+        self.loaded = False
+        self.change_stream_active = False
+        # Derived in-memory structures; called as listener(collection, doc_id), doc_id None = whole collection
+        self.listeners = []
+
+    def _bump(self, collection: str, doc_ids: Optional[list] = None):
+        self.version += 1
+        self.active_lists = {}
+        for listener in self.listeners:
+            for doc_id in doc_ids or [None]:
+                listener(collection, doc_id)
+
+    def _index_product(self, doc: dict):
+        if not doc.get("is_active"):
+            return
+        for field in PRODUCT_INDEX_FIELDS:
+            value = doc.get(field)
+            if value is not None:
+                self.product_indexes[field].setdefault(value, set()).add(doc["product_id"])
+
+    def _unindex_product(self, doc: dict):
+        for field in PRODUCT_INDEX_FIELDS:
+            bucket = self.product_indexes[field].get(doc.get(field))
+            if bucket is not None:
+                bucket.discard(doc["product_id"])
+                if not bucket:
+                    del self.product_indexes[field][doc.get(field)]
+
+    def _store(self, collection: str, doc: dict) -> str:
+        doc_id = doc[CATALOG_COLLECTIONS[collection]]
+        object_id = doc.pop("_id", None)
+        if object_id is not None:
+            self.object_ids[(collection, object_id)] = doc_id
+        if collection == "products":
+            self.positions.setdefault(doc_id, len(self.positions))
+            # Precomputed for documents written before the field existed
+            if "price_per_gram" not in doc:
+                doc["price_per_gram"] = price_per_gram(doc)
+        return doc_id
+
+    def load(self, collection: str, docs: list):
+        """Replace one collection wholesale; version only moves if the content changed"""
+        new_docs = {}
+        for doc in docs:
+            new_docs[self._store(collection, doc)] = doc
+        if collection == "products":
+            # Positions outlive reloads, but Mongo may return a different order: keep the dict (and
+            # so active() and the unsorted listing the keyset cursor bisects) in position order
+            new_docs = dict(sorted(new_docs.items(), key=lambda item: self.positions[item[0]]))
+        if new_docs == self.docs[collection]:
+            return
+        self.docs[collection] = new_docs
+        self.doc_hashes[collection] = {doc_id: doc_digest(doc) for doc_id, doc in new_docs.items()}
+        self.digests[collection] = 0
+        for doc_hash in self.doc_hashes[collection].values():
+            self.digests[collection] ^= doc_hash
+        if collection == "products":
+            self.product_indexes = {field: {} for field in PRODUCT_INDEX_FIELDS}
+            for doc in new_docs.values():
+                self._index_product(doc)
+        self._bump(collection)
+
+    def _replace(self, collection: str, doc: dict) -> Optional[str]:
+        doc_id = self._store(collection, doc)
+        old = self.docs[collection].get(doc_id)
+        if old == doc:
+            return None
+        if collection == "products":
+            if old:
+                self._unindex_product(old)
+            self._index_product(doc)
+        self.docs[collection][doc_id] = doc
+        # XOR keeps the collection digest order-independent and updatable per document
+        doc_hash = doc_digest(doc)
+        self.digests[collection] ^= self.doc_hashes[collection].get(doc_id, 0) ^ doc_hash
+        self.doc_hashes[collection][doc_id] = doc_hash
+        return doc_id
+
+    def apply(self, collection: str, doc: dict) -> bool:
+        """Insert or replace one document; returns False when nothing changed"""
+        doc_id = self._replace(collection, doc)
+        if doc_id is None:
+            return False
+        self._bump(collection, [doc_id])
+        return True
+
+    def apply_many(self, collection: str, docs: list) -> int:
+        """Apply a batch of documents under a single version bump"""
+        changed = [doc_id for doc_id in (self._replace(collection, doc) for doc in docs) if doc_id is not None]
+        if changed:
+            self._bump(collection, changed)
+        return len(changed)
+
+    def remove(self, collection: str, doc_id: str) -> bool:
+        old = self.docs[collection].pop(doc_id, None)
+        if old is None:
+            return False
+        self.digests[collection] ^= self.doc_hashes[collection].pop(doc_id)
+        if collection == "products":
+            self._unindex_product(old)
+        self._bump(collection, [doc_id])
+        return True
+
+    def get(self, collection: str, doc_id: str):
+        return self.docs[collection].get(doc_id)
+
+    def active(self, collection: str) -> list:
+        if collection not in self.active_lists:
+            self.active_lists[collection] = [d for d in self.docs[collection].values() if d.get("is_active")]
+        return self.active_lists[collection]
+
+    def query_products(self, **filters) -> list:
+        """Active products matching every non-empty filter, in position order"""
+        filters = {field: value for field, value in filters.items() if value is not None}
+        if not filters:
+            return self.active("products")
+        buckets = [self.product_indexes[field].get(value, set()) for field, value in filters.items()]
+        product_ids = set.intersection(*sorted(buckets, key=len))
+        products = self.docs["products"]
+        return [products[pid] for pid in sorted(product_ids, key=self.positions.__getitem__)]
+
+    def sort_key(self, sort: Optional[str]):
+        """Total order for a listing sort; products missing the field go last, position breaks ties"""
+        field, descending = PRODUCT_SORTS[sort] if sort else (None, False)
+        positions = self.positions
+        if field is None:
+            return lambda doc: (-positions[doc["product_id"]] if descending else positions[doc["product_id"]],)
+
+        def key(doc):
+            value = sort_number(doc.get(field))
+            if value is None:
+                return (1, 0, positions[doc["product_id"]])
+            return (0, -value if descending else value, positions[doc["product_id"]])
+        return key
+
+    def sorted_products(self, sort: str) -> list:
+        """All active products presorted for one listing sort; rebuilt once per catalog version"""
+        view = ("sorted", sort)
+        if view not in self.active_lists:
+            self.active_lists[view] = sorted(self.active("products"), key=self.sort_key(sort))
+        return self.active_lists[view]
+
+catalog = CatalogSnapshot()
+
+async def load_catalog():
+    """Full reload of every catalog collection from Mongo"""
+    results = await asyncio.gather(*(db[name].find({}).to_list(None) for name in CATALOG_COLLECTIONS))
+    for name, docs in zip(CATALOG_COLLECTIONS, results):
+        catalog.load(name, docs)
+    catalog.loaded = True
+    logger.info(f"Catalog snapshot loaded (version {catalog.version})")
+
+catalog_loading = None
+
+async def ensure_catalog():
+    """Load the snapshot on first use if warm-up has not finished yet; concurrent callers share one load"""
+    global catalog_loading
+    if catalog.loaded:
         return
-    
+    if catalog_loading is None or (catalog_loading.done() and catalog_loading.exception()):
+        catalog_loading = asyncio.ensure_future(load_catalog())
+    await asyncio.shield(catalog_loading)
+
+async def sync_catalog_doc(collection: str, doc_id: str):
+    """Admin write hook: refresh one document so this worker reads its own writes"""
+    doc = await db[collection].find_one({CATALOG_COLLECTIONS[collection]: doc_id})
+    if doc:
+        catalog.apply(collection, doc)
+    else:
+        catalog.remove(collection, doc_id)
+
+def apply_catalog_change(change: dict):
+    collection = change["ns"]["coll"]
+    operation = change["operationType"]
+    if operation in ("insert", "update", "replace") and change.get("fullDocument"):
+        catalog.apply(collection, change["fullDocument"])
+    elif operation == "delete":
+        doc_id = catalog.object_ids.pop((collection, change["documentKey"]["_id"]), None)
+        if doc_id:
+            catalog.remove(collection, doc_id)
+
+async def reload_catalog_at():
+    """Full reload; returns the cluster time read just before it (None without a replica set)"""
+    hello = await db.command("ping")
+    await load_catalog()
+    return hello.get("operationTime")
+
+async def watch_catalog_changes():
+    """Follow catalog changes from a change stream; without a replica set, reload periodically instead.
+
+    Every (re)start reloads the snapshot and opens the stream at the cluster time taken before that
+    reload, so writes landing during the load or while no stream was open are replayed, not lost.
+    """
+    global catalog_loading
+    pipeline = [{"$match": {"ns.coll": {"$in": list(CATALOG_COLLECTIONS)}}}]
+    fallback_logged = False
+    while True:
+        try:
+            # Set before the first await so ensure_catalog callers share this load
+            catalog_loading = asyncio.ensure_future(reload_catalog_at())
+            start_at = await asyncio.shield(catalog_loading)
+        except Exception as e:
+            logger.error(f"Catalog reload failed: {e}")
+            await asyncio.sleep(CATALOG_RELOAD_SECONDS)
+            continue
+        try:
+            async with db.watch(pipeline, full_document="updateLookup", start_at_operation_time=start_at) as stream:
+                catalog.change_stream_active = True
+                logger.info("Catalog change stream started")
+                async for change in stream:
+                    apply_catalog_change(change)
+        except Exception as e:
+            if catalog.change_stream_active or not fallback_logged:
+                logger.warning(f"Catalog change stream unavailable ({e}); reloading every {CATALOG_RELOAD_SECONDS}s")
+                fallback_logged = True
+        catalog.change_stream_active = False
+        await asyncio.sleep(CATALOG_RELOAD_SECONDS)
+
+# ==================== STATIC SNAPSHOTS ====================
+
+STATIC_SNAPSHOTS_ENABLED = os.environ.get('STATIC_SNAPSHOTS', '1') == '1'
+STATIC_SNAPSHOT_DIR = Path(os.environ.get('STATIC_SNAPSHOT_DIR', Path(tempfile.gettempdir()) / 'zk-snapshots'))
+# Bursts of catalog writes (bulk repricing, admin edits) collapse into one render
+SNAPSHOT_DEBOUNCE_SECONDS = 0.5
+SNAPSHOT_HEADERS = ("content-type", "etag", "cache-control", "vary", "x-catalog-version", "x-next-cursor")
+SNAPSHOT_EXTENSIONS = {"identity": "", "gzip": ".gz", "br": ".br"}
+
+class SnapshotEntry:
+    def __init__(self, files: dict, headers: dict):
+        self.files = files  # encoding -> (path, size)
+        self.headers = headers
+        self.etag = headers.get("etag")
+        self.validators = {k: headers[k] for k in ("etag", "cache-control", "vary") if k in headers}
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class StaticSnapshots:
+    """Public, non-personalized responses rendered to precompressed files whenever prices or the catalog change.
+
+    Rendering goes through the app itself, so files are byte-identical to the live handlers.
+    Each worker writes its own directory; files are named by content hash.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory / str(os.getpid())
+        self.manifest = {}  # (path, canonical query) -> SnapshotEntry
+        self.generation = 0
+        self.pending = None
+        self.previous_files = set()  # files of the manifest published before the current one
+
+    def routes(self) -> list:
+        routes = [("/api/gold-prices", ""), ("/api/merchants", ""), ("/api/designers", ""), ("/api/products", "")]
+        return routes + [("/api/products", f"type={t}") for t in sorted(catalog.product_indexes["type"])]
+
+    def prepare(self):
+        """Create this worker's directory and remove ones left by dead workers"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for child in self.directory.parent.iterdir():
+            if child.name.isdigit() and child != self.directory and not pid_alive(int(child.name)):
+                shutil.rmtree(child, ignore_errors=True)
+
+    def refresh(self):
+        """Data changed: stop serving snapshots now and re-render shortly; requests fall through meanwhile"""
+        self.manifest = {}
+        self.generation += 1
+        if not STATIC_SNAPSHOTS_ENABLED:
+            return
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self.pending is None or self.pending.done():
+            self.pending = asyncio.ensure_future(self._render_later())
+
+    async def _render_later(self):
+        await asyncio.sleep(SNAPSHOT_DEBOUNCE_SECONDS)
+        while True:
+            generation = self.generation
+            try:
+                manifest = await self.render()
+            except Exception as e:
+                logger.error(f"Static snapshot render failed: {e}")
+                return
+            # Data changed mid-render: render again rather than publish stale files
+            if generation == self.generation:
+                self.manifest = manifest
+                await asyncio.to_thread(self.cleanup, manifest)
+                return
+
+    async def render(self) -> dict:
+        manifest = {}
+        headers = {"accept": "application/json", "accept-encoding": "identity", SNAPSHOT_RENDER_HEADER: "1"}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://snapshot") as http:
+            for path, query in self.routes():
+                response = await http.get(f"{path}?{query}" if query else path, headers=headers)
+                if response.status_code != 200:
+                    continue
+                kept = {k: response.headers[k] for k in SNAPSHOT_HEADERS if k in response.headers}
+                files = await asyncio.to_thread(self.write, response.content)
+                manifest[(path, query)] = SnapshotEntry(files, kept)
+        return manifest
+
+    def write(self, body: bytes) -> dict:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = hashlib.blake2b(body, digest_size=16).hexdigest()
+        variants = {"identity": body}
+        if len(body) >= COMPRESS_MIN_BYTES:
+            variants["gzip"] = compress(body, "gzip", level="cached")
+            variants["br"] = compress(body, "br", level="cached")
+        files = {}
+        for encoding, data in variants.items():
+            path = self.directory / f"{name}.json{SNAPSHOT_EXTENSIONS[encoding]}"
+            if not path.exists():
+                # Write-then-rename so a concurrent reader never sees a partial file
+                tmp = path.with_suffix(path.suffix + ".tmp")
+                tmp.write_bytes(data)
+                os.replace(tmp, path)
+            files[encoding] = (str(path), len(data))
+        return files
+
+    def cleanup(self, manifest: dict):
+        """Delete unreferenced files, keeping the previous generation until the next publish.
+
+        A request that took a path from the old manifest just before the swap opens the file
+        afterwards; unlinking it at once would fail that response.
+        """
+        keep = {path for entry in manifest.values() for path, _ in entry.files.values()}
+        for child in self.directory.iterdir():
+            if str(child) not in keep and str(child) not in self.previous_files:
+                child.unlink(missing_ok=True)
+        self.previous_files = keep
+
+static_snapshots = StaticSnapshots(STATIC_SNAPSHOT_DIR)
+catalog.listeners.append(lambda collection, doc_id: static_snapshots.refresh())
+
+# ==================== CHANGE SEQUENCE ====================
+
+CHANGE_SEQ_COUNTER = "catalog_change_seq"
+# A writer that died without releasing its number stops holding the watermark back after this long
+CHANGE_SEQ_PENDING_SECONDS = 60
+
+@asynccontextmanager
+async def change_seq_write():
+    """Allocate the next catalog change sequence number for a write made inside the block.
+
+    The number stays listed as pending on the counter document until the block exits, so
+    current_change_seq() never reports a version past a write that has not committed yet.
+    Allocation and the pending entry are one atomic update.
+    """
+    now = datetime.now(timezone.utc)
+    # Entries left behind by dead writers are dropped while appending this one
+    live = {"$filter": {"input": {"$ifNull": ["$pending", []]}, "as": "p",
+                        "cond": {"$gt": ["$$p.at", now - timedelta(seconds=CHANGE_SEQ_PENDING_SECONDS)]}}}
+    counter = await db.counters.find_one_and_update(
+        {"_id": CHANGE_SEQ_COUNTER},
+        [
+            {"$set": {"seq": {"$add": [{"$ifNull": ["$seq", 0]}, 1]}}},
+            {"$set": {"pending": {"$concatArrays": [live, [{"seq": "$seq", "at": now}]]}}},
+        ],
+        upsert=True, return_document=ReturnDocument.AFTER
+    )
+    seq = counter["seq"]
+    try:
+        yield seq
+    finally:
+        await db.counters.update_one({"_id": CHANGE_SEQ_COUNTER}, {"$pull": {"pending": {"seq": seq}}})
+
+async def current_change_seq() -> int:
+    """Highest sequence number below which every write has committed (the safe sync watermark)"""
+    counter = await db.counters.find_one({"_id": CHANGE_SEQ_COUNTER})
+    if not counter:
+        return 0
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=CHANGE_SEQ_PENDING_SECONDS)
+    in_flight = [p["seq"] for p in counter.get("pending", [])
+                 if p["at"].replace(tzinfo=p["at"].tzinfo or timezone.utc) > cutoff]
+    return min(in_flight) - 1 if in_flight else counter["seq"]
+
+async def record_catalog_delete(collection: str, doc_id: str):
+    """Hard deletes leave a tombstone so delta sync can tell clients to drop the document"""
+    async with change_seq_write() as change_seq:
+        await db.catalog_tombstones.insert_one({
+            "collection": collection,
+            "doc_id": doc_id,
+            "change_seq": change_seq,
+            "deleted_at": datetime.now(timezone.utc).isoformat()
+        })
+
+# ==================== DASHBOARD COUNTERS ====================
+
+# One document in stats_counters holds every admin dashboard number. Write paths
+# apply $inc deltas; a periodic recount corrects drift from failed or racing writes.
+# Every $inc also bumps `version`, which the recount compares before replacing the document.
+DASHBOARD_COUNTERS = "dashboard"
+STATS_RECONCILE_SECONDS = int(os.environ.get('STATS_RECONCILE_SECONDS', '900'))
+STATS_RECONCILE_ATTEMPTS = 3
+
+# Fields counter_fields() reads, grouped on when recounting
+COUNTED_FIELDS = {
+    "users": ("role",),
+    "orders": (),
+    "products": ("type", "is_active"),
+    "merchants": ("is_active",),
+    "designers": ("is_active",),
+}
+
+def counter_fields(collection: str, doc: Optional[dict], count: int = 1) -> Dict[str, float]:
+    """Counter increments for `count` documents shaped like doc (total_qar is already summed)"""
+    if not doc:
+        return {}
+    fields = {f"{collection}.total": count}
+    if collection == "orders":
+        fields["orders.revenue_qar"] = doc.get("total_qar") or 0
+    elif collection == "users":
+        if doc.get("role"):
+            fields[f"users.by_role.{doc['role']}"] = count
+    else:
+        fields[f"{collection}.active"] = count if doc.get("is_active") else 0
+        if collection == "products" and doc.get("type"):
+            fields[f"products.by_type.{doc['type']}"] = count
+    return fields
+
+def nest_fields(fields: Dict[str, float]) -> dict:
+    """Turn dotted $inc paths into the nested document they address"""
+    doc = {}
+    for path, value in fields.items():
+        *keys, last = path.split(".")
+        node = doc
+        for key in keys:
+            node = node.setdefault(key, {})
+        node[last] = value
+    return doc
+
+async def count_write(collection: str, before: Optional[dict] = None, after: Optional[dict] = None, count: int = 1):
+    """Apply a write to the counters as the difference between the documents' old and new contribution"""
+    delta = counter_fields(collection, after, count)
+    for field, value in counter_fields(collection, before, count).items():
+        delta[field] = delta.get(field, 0) - value
+    delta = {field: value for field, value in delta.items() if value}
+    if not delta:
+        return
+    try:
+        await db.stats_counters.update_one(
+            {"_id": DASHBOARD_COUNTERS},
+            {"$inc": {**delta, "version": 1}, "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}},
+            upsert=True
+        )
+    except Exception as e:
+        # The write itself succeeded; the next reconcile picks it up
+        logger.warning(f"Dashboard counter update failed: {e}")
+
+async def recount(collection: str) -> Dict[str, float]:
+    group = {field: f"${field}" for field in COUNTED_FIELDS[collection]}
+    rows = await db[collection].aggregate([
+        {"$group": {"_id": group or None, "count": {"$sum": 1}, "total_qar": {"$sum": "$total_qar"}}}
+    ]).to_list(None)
+    fields = defaultdict(float)
+    for row in rows:
+        for field, value in counter_fields(collection, {**(row["_id"] or {}), "total_qar": row["total_qar"]}, row["count"]).items():
+            fields[field] += value
+    return fields
+
+async def reconcile_dashboard_counters(max_age_seconds: int = 0):
+    """Recount every counter from the collections, unless another worker did so within max_age_seconds"""
+    if max_age_seconds:
+        current = await db.stats_counters.find_one({"_id": DASHBOARD_COUNTERS}, {"reconciled_at": 1})
+        if current and current.get("reconciled_at") and \
+                datetime.now(timezone.utc) - datetime.fromisoformat(current["reconciled_at"]) < timedelta(seconds=max_age_seconds):
+            return
+    for _ in range(STATS_RECONCILE_ATTEMPTS):
+        current = await db.stats_counters.find_one({"_id": DASHBOARD_COUNTERS}, {"version": 1})
+        version = (current or {}).get("version")
+        counts = await asyncio.gather(*(recount(collection) for collection in COUNTED_FIELDS))
+        now = datetime.now(timezone.utc).isoformat()
+        doc = nest_fields({f"{collection}.total": 0 for collection in COUNTED_FIELDS} | {
+            path: int(value) if not path.endswith("_qar") else round(value, 2)
+            for fields in counts for path, value in fields.items()
+        })
+        # Compare-and-swap: an $inc landing during the recount changed version, and replacing
+        # the document now would drop it, so recount instead
+        try:
+            await db.stats_counters.replace_one(
+                {"_id": DASHBOARD_COUNTERS, "version": version},
+                {**doc, "version": (version or 0) + 1, "reconciled_at": now, "updated_at": now}, upsert=True
+            )
+        except DuplicateKeyError:
+            # The version moved on, so the upsert collided with the existing document
+            continue
+        logger.info("Dashboard counters reconciled")
+        return
+    logger.warning("Dashboard counters changed during every recount; reconcile skipped until the next run")
+
+async def dashboard_counters() -> dict:
+    counters = await db.stats_counters.find_one({"_id": DASHBOARD_COUNTERS}, {"_id": 0})
+    if counters is None:
+        # First read on a database that has never been reconciled
+        await with_distributed_lock("stats_reconcile", lambda: reconcile_dashboard_counters(STATS_RECONCILE_SECONDS))
+        counters = await db.stats_counters.find_one({"_id": DASHBOARD_COUNTERS}, {"_id": 0})
+    return counters
+
+async def periodic_stats_reconcile():
+    """Background task: recount the dashboard counters; workers skip it if another just ran"""
+    while True:
+        await asyncio.sleep(STATS_RECONCILE_SECONDS)
+        try:
+            await with_distributed_lock(
+                "stats_reconcile", lambda: reconcile_dashboard_counters(STATS_RECONCILE_SECONDS // 2)
+            )
+        except Exception as e:
+            logger.error(f"Dashboard counter reconcile failed: {e}")
+
+# ==================== ANALYTICS ROLLUPS ====================
+
+# Hourly and daily buckets keyed by UTC hour and day ("2025-01-31T09" / "2025-01-31").
+# Writes $inc the two buckets of their timestamp; backfill_rollups() rebuilds them from
+# the source collections. Rollups record activity: later deletes are not subtracted
+# until the next backfill.
+ROLLUP_INTERVALS = {
+    "hour": ("rollups_hourly", 13, timedelta(hours=1)),
+    "day": ("rollups_daily", 10, timedelta(days=1)),
+}
+ROLLUP_METRICS = ("revenue_qar", "orders", "gold_bought_grams", "gold_sold_grams", "new_users", "vouchers_issued")
+ROLLUP_MAX_POINTS = 1000
+ROLLUPS_BACKFILLED = "rollups_backfilled"
+
+# (collection, filter, metric -> $sum expression) for each document that feeds a rollup
+ROLLUP_SOURCES = [
+    ("orders", {}, {"revenue_qar": "$total_qar", "orders": 1}),
+    ("transactions", {"type": "buy"}, {"gold_bought_grams": "$grams"}),
+    ("transactions", {"type": "sell"}, {"gold_sold_grams": "$grams"}),
+    ("users", {}, {"new_users": 1}),
+    ("gift_vouchers", {}, {"vouchers_issued": 1}),
+]
+
+async def record_rollup(created_at: str, **metrics):
+    """Add one write's metrics to the hourly and daily buckets of its created_at"""
     try:
-        # Test connection first
-        await client.admin.command('ping')
-        logger.info("MongoDB connected successfully")
+        await asyncio.gather(*(
+            db[collection].update_one({"_id": created_at[:key_length]}, {"$inc": metrics}, upsert=True)
+            for collection, key_length, _ in ROLLUP_INTERVALS.values()
+        ))
     except Exception as e:
-        logger.error(f"MongoDB connection failed: {e}")
+        # The write itself succeeded; the next backfill picks it up
+        logger.warning(f"Rollup update failed: {e}")
+
+async def backfill_rollups(since: Optional[str] = None) -> int:
+    """Rebuild every bucket from `since` (a date, rounded down to its day) onwards from the source collections"""
+    since = since[:10] if since else ""
+    hourly = defaultdict(lambda: defaultdict(float))
+    # created_at is an ISO string on most documents, but may be a BSON date; bucket both by UTC hour
+    created = {"$convert": {"input": "$created_at", "to": "date", "onError": None, "onNull": None}}
+    hour_key = {"$dateToString": {"format": "%Y-%m-%dT%H", "date": created, "timezone": "UTC"}}
+    recent = {}
+    if since:
+        since_date = datetime.fromisoformat(since).replace(tzinfo=timezone.utc)
+        recent = {"$or": [{"created_at": {"$gte": since}}, {"created_at": {"$gte": since_date}}]}
+
+    async def collect(collection, match, sums):
+        rows = await db[collection].aggregate([
+            {"$match": {**match, **recent}},
+            {"$group": {"_id": hour_key, **{metric: {"$sum": expression} for metric, expression in sums.items()}}},
+        ]).to_list(None)
+        for row in rows:
+            if row["_id"]:
+                for metric in sums:
+                    hourly[row["_id"]][metric] += row[metric] or 0
+
+    await asyncio.gather(*(collect(*source) for source in ROLLUP_SOURCES))
+    daily = defaultdict(lambda: defaultdict(float))
+    for hour, metrics in hourly.items():
+        for metric, value in metrics.items():
+            daily[hour[:10]][metric] += value
+
+    for (collection, _, _), buckets in zip(ROLLUP_INTERVALS.values(), (hourly, daily)):
+        if buckets:
+            await db[collection].bulk_write(
+                [ReplaceOne({"_id": key}, dict(metrics), upsert=True) for key, metrics in buckets.items()],
+                ordered=False
+            )
+        await db[collection].delete_many({"_id": {"$gte": since, "$nin": list(buckets)}})
+    await db.counters.update_one(
+        {"_id": ROLLUPS_BACKFILLED}, {"$set": {"at": datetime.now(timezone.utc).isoformat(), "since": since}}, upsert=True
+    )
+    logger.info(f"Rollups backfilled from {since or 'the beginning'}: {len(hourly)} hours, {len(daily)} days")
+    return len(hourly)
+
+async def ensure_rollups():
+    """Startup step: backfill once per database so rollups cover writes made before they existed"""
+    if await db.counters.find_one({"_id": ROLLUPS_BACKFILLED}) is None:
+        await backfill_rollups()
+    if await db.counters.find_one({"_id": SELLER_SALES_BACKFILLED}) is None:
+        await backfill_seller_sales()
+
+def parse_rollup_time(value: Optional[str], default: datetime) -> datetime:
+    if not value:
+        return default
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="تاريخ غير صالح")
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+# ==================== SELLER SALES ====================
+
+# One seller_sales document per merchant and designer, keyed "<kind>:<name>" because
+# products reference their seller by name. units/revenue_qar/orders exclude cancelled
+# orders; by_status counts the seller's orders in each status. Revenue is the line
+# subtotal before order-level coupon discounts.
+SELLER_KINDS = {"merchants": ("merchant", "merchant_name"), "designers": ("designer", "designer_name")}
+SALES_EXCLUDED_STATUSES = {"cancelled"}
+SELLER_SALES_BACKFILLED = "seller_sales_backfilled"
+SELLER_SALES_SORTS = {"revenue": "revenue_qar", "units": "units", "orders": "orders"}
+
+def seller_sales_deltas(order: dict, sign: int = 1, status: Optional[str] = None, products: Optional[dict] = None) -> dict:
+    """$inc and $set fields per seller document for adding (sign=1) or removing (sign=-1) an order in `status`"""
+    status = status or order.get("status") or "pending"
+    counted = status not in SALES_EXCLUDED_STATUSES
+    sellers = {}
+    for item in order.get("items", []):
+        # Orders written before items carried their seller fall back to the product
+        source = item if any(field in item for _, field in SELLER_KINDS.values()) else (products or {}).get(item["product_id"], {})
+        for kind, field in SELLER_KINDS.values():
+            if not source.get(field):
+                continue
+            seller_id = f"{kind}:{source[field]}"
+            inc, fields = sellers.setdefault(seller_id, (defaultdict(int), {"kind": kind, "name": source[field]}))
+            if not inc:
+                inc[f"by_status.{status}"] = sign
+                if counted:
+                    inc["orders"] = sign
+            if counted:
+                product = f"products.{item['product_id']}"
+                inc["units"] += sign * item.get("quantity", 0)
+                inc["revenue_qar"] += sign * (item.get("subtotal") or 0)
+                inc[f"{product}.units"] += sign * item.get("quantity", 0)
+                inc[f"{product}.revenue_qar"] += sign * (item.get("subtotal") or 0)
+                fields[f"{product}.title"] = item.get("title")
+    return sellers
+
+async def record_seller_sales(*changes: dict):
+    """Apply seller_sales_deltas() results in one bulk write"""
+    operations = [
+        UpdateOne({"_id": seller_id},
+                  {"$inc": dict(inc), "$set": {**fields, "updated_at": datetime.now(timezone.utc).isoformat()}},
+                  upsert=True)
+        for sellers in changes for seller_id, (inc, fields) in sellers.items()
+    ]
+    if not operations:
         return
-    
     try:
-        # Create admin user if not exists
-        admin = await db.users.find_one({"email": ADMIN_EMAIL}, {"_id": 0})
-        if not admin:
-            admin_user = {
-                "user_id": f"user_{uuid.uuid4().hex[:12]}",
-                "name": "Admin",
-                "email": ADMIN_EMAIL,
-                "password_hash": hash_password(ADMIN_PASSWORD),
-                "role": "admin",
-                "picture": None,
-                "created_at": datetime.now(timezone.utc).isoformat()
-            }
-            await db.users.insert_one(admin_user)
-            logger.info("Admin user created")
-        
-        # Initialize gold prices if empty
-        prices_count = await db.gold_prices.count_documents({})
-        if prices_count == 0:
-            await update_gold_prices()
-        
-        # Seed sample products if empty
-        products_count = await db.products.count_documents({})
-        if products_count == 0:
-            await seed_sample_products()
-        
-        # Seed merchants if empty
-        merchants_count = await db.merchants.count_documents({})
-        if merchants_count == 0:
-            await seed_sample_merchants()
-        
-        # Seed designers if empty
-        designers_count = await db.designers.count_documents({})
-        if designers_count == 0:
-            await seed_qatari_designers()
-        
-        # Start background task for periodic price updates
-        asyncio.create_task(periodic_price_update())
-        logger.info("Started periodic gold price updates (every 5 minutes)")
+        await db.seller_sales.bulk_write(operations, ordered=False)
     except Exception as e:
-        logger.error(f"Startup error: {e}")
+        # The order write itself succeeded; the next backfill picks it up
+        logger.warning(f"Seller sales update failed: {e}")
+
+async def backfill_seller_sales() -> int:
+    """Rebuild every seller_sales document from the orders collection"""
+    await ensure_catalog()
+    products = catalog.docs["products"]
+    totals = {}
+    async for order in db.orders.find({}, {"_id": 0, "items": 1, "status": 1}):
+        for seller_id, (inc, fields) in seller_sales_deltas(order, products=products).items():
+            total_inc, total_fields = totals.setdefault(seller_id, (defaultdict(int), {}))
+            for path, value in inc.items():
+                total_inc[path] += value
+            total_fields.update(fields)
+    now = datetime.now(timezone.utc).isoformat()
+    if totals:
+        await db.seller_sales.bulk_write([
+            ReplaceOne({"_id": seller_id}, {**nest_fields({**inc, **fields}), "updated_at": now}, upsert=True)
+            for seller_id, (inc, fields) in totals.items()
+        ], ordered=False)
+    await db.seller_sales.delete_many({"_id": {"$nin": list(totals)}})
+    await db.counters.update_one({"_id": SELLER_SALES_BACKFILLED}, {"$set": {"at": now}}, upsert=True)
+    logger.info(f"Seller sales backfilled for {len(totals)} sellers")
+    return len(totals)
+
+def seller_sales_view(doc: Optional[dict], top: int) -> dict:
+    doc = doc or {}
+    products = [{"product_id": product_id, **values} for product_id, values in doc.pop("products", {}).items()]
+    products.sort(key=lambda p: p.get("revenue_qar", 0), reverse=True)
+    return {
+        "units": 0, "revenue_qar": 0, "orders": 0, "by_status": {},
+        **{k: v for k, v in doc.items() if k != "_id"},
+        "top_products": products[:top],
+    }
+
+# ==================== SEARCH ====================
+
+ARABIC_DIACRITICS = re.compile(r"[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+ARABIC_FOLDING = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ى": "ي", "ة": "ه"})
+ARABIC_PREFIXES = ("وال", "بال", "كال", "فال", "لل", "ال")
+
+def normalize_text(text: str) -> str:
+    """Lower-case, strip Arabic diacritics/tatweel and fold alef, ya and ta marbuta variants"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return ARABIC_DIACRITICS.sub("", text).translate(ARABIC_FOLDING)
+
+def tokenize(text: str) -> list:
+    tokens = []
+    for token in re.findall(r"\w+", normalize_text(text)):
+        # Light stemming: drop the definite article and its attached prepositions
+        for prefix in ARABIC_PREFIXES:
+            if token.startswith(prefix) and len(token) - len(prefix) >= 2:
+                token = token[len(prefix):]
+                break
+        tokens.append(token)
+    return tokens
+
+# Indexed fields per catalog collection, with BM25F-style weights
+SEARCH_FIELDS = {
+    "products": [("title", 3), ("brand", 2), ("designer_name", 2), ("merchant_name", 1), ("category", 1), ("description", 1)],
+    "designers": [("name", 3), ("brand", 3), ("specialty", 1)],
+    "merchants": [("name", 3), ("description", 1)],
+}
+
+class SearchIndex:
+    """Inverted index over catalog text ranked with BM25; documents are keyed (collection, id)"""
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self.postings = defaultdict(dict)  # term -> {doc_key: weighted term frequency}
+        self.doc_terms = {}  # doc_key -> terms, so a document can be removed
+        self.doc_lengths = {}
+        self.total_length = 0
+        self._vocabulary = None  # sorted terms for prefix expansion, rebuilt lazily
+
+    def add(self, doc_key: tuple, doc: dict):
+        self.remove(doc_key)
+        frequencies = defaultdict(float)
+        for field, weight in SEARCH_FIELDS[doc_key[0]]:
+            for token in tokenize(str(doc.get(field) or "")):
+                frequencies[token] += weight
+        if not frequencies:
+            return
+        for term, frequency in frequencies.items():
+            self.postings[term][doc_key] = frequency
+        self.doc_terms[doc_key] = list(frequencies)
+        length = sum(frequencies.values())
+        self.doc_lengths[doc_key] = length
+        self.total_length += length
+        self._vocabulary = None
+
+    def remove(self, doc_key: tuple):
+        terms = self.doc_terms.pop(doc_key, None)
+        if terms is None:
+            return
+        for term in terms:
+            posting = self.postings[term]
+            posting.pop(doc_key, None)
+            if not posting:
+                del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_key)
+        self._vocabulary = None
+
+    def on_catalog_change(self, collection: str, doc_id: Optional[str]):
+        if doc_id is None:
+            for doc_key in [k for k in self.doc_terms if k[0] == collection]:
+                self.remove(doc_key)
+            for doc_id, doc in catalog.docs[collection].items():
+                self.add((collection, doc_id), doc)
+            return
+        doc = catalog.get(collection, doc_id)
+        if doc is None:
+            self.remove((collection, doc_id))
+        else:
+            self.add((collection, doc_id), doc)
+
+    def expand(self, term: str) -> list:
+        """Vocabulary terms starting with term, shortest first"""
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        start = bisect.bisect_left(self._vocabulary, term)
+        matches = []
+        for candidate in self._vocabulary[start:]:
+            if not candidate.startswith(term) or len(matches) >= 50:
+                break
+            matches.append(candidate)
+        return sorted(matches, key=len)
+
+    def search(self, query: str, collection: Optional[str] = None, prefix_last: bool = False,
+               match_all: bool = False) -> list:
+        """Rank (collection, id) keys by BM25; every query term must match, falling back to any term unless match_all"""
+        terms = tokenize(query)
+        if not terms or not self.doc_lengths:
+            return []
+        groups = [[term] for term in terms]
+        if prefix_last:
+            groups[-1] = self.expand(terms[-1]) or groups[-1]
+
+        doc_count = len(self.doc_lengths)
+        average_length = self.total_length / doc_count
+        scores = defaultdict(float)
+        matched_groups = defaultdict(int)
+        for group in groups:
+            seen = set()
+            for term in group:
+                posting = self.postings.get(term, {})
+                idf = math.log(1 + (doc_count - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_key, frequency in posting.items():
+                    if collection and doc_key[0] != collection:
+                        continue
+                    norm = self.K1 * (1 - self.B + self.B * self.doc_lengths[doc_key] / average_length)
+                    scores[doc_key] += idf * frequency * (self.K1 + 1) / (frequency + norm)
+                    seen.add(doc_key)
+            for doc_key in seen:
+                matched_groups[doc_key] += 1
+
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        all_terms = [(key, score) for key, score in ranked if matched_groups[key] == len(groups)]
+        return all_terms if match_all else all_terms or ranked
+
+search_index = SearchIndex()
+catalog.listeners.append(search_index.on_catalog_change)
+
+async def admin_search_ids(search: str, collection: str) -> list:
+    """Ids matching every term of an admin search= filter, best match first"""
+    await ensure_catalog()
+    return [key[1] for key, _ in search_index.search(search, collection, prefix_last=True, match_all=True)]
+
+def in_rank_order(docs: list, id_field: str, ranked_ids: list) -> list:
+    rank = {doc_id: i for i, doc_id in enumerate(ranked_ids)}
+    return sorted(docs, key=lambda doc: rank.get(doc[id_field], len(rank)))
+
+# Suggestion source field per catalog collection
+AUTOCOMPLETE_FIELDS = {"products": "title", "designers": "brand", "merchants": "name"}
+
+class Autocomplete:
+    """Sorted array of normalized phrase and word-start keys for prefix lookups via bisect"""
+
+    def __init__(self):
+        self.entries = []  # sorted (key, rank, collection, doc_id); rank 0 = phrase start, 1 = inner word
+        self.doc_entries = {}  # (collection, doc_id) -> its entries, for incremental removal
+
+    def _keys(self, text: str) -> list:
+        keys = []
+        # Bilingual names ("Clair De Lune / كلير دي لون") are indexed per script
+        for part in text.split("/"):
+            words = normalize_text(part).split()
+            for i in range(len(words)):
+                keys.append((" ".join(words[i:]), 0 if i == 0 else 1))
+        return keys
+
+    def add(self, collection: str, doc_id: str, doc: dict):
+        self.remove(collection, doc_id)
+        text = doc.get(AUTOCOMPLETE_FIELDS[collection])
+        if not text:
+            return
+        entries = [(key, rank, collection, doc_id) for key, rank in self._keys(str(text))]
+        for entry in entries:
+            bisect.insort(self.entries, entry)
+        self.doc_entries[(collection, doc_id)] = entries
+
+    def remove(self, collection: str, doc_id: str):
+        for entry in self.doc_entries.pop((collection, doc_id), []):
+            i = bisect.bisect_left(self.entries, entry)
+            if i < len(self.entries) and self.entries[i] == entry:
+                del self.entries[i]
+
+    def on_catalog_change(self, collection: str, doc_id: Optional[str]):
+        if doc_id is not None:
+            doc = catalog.get(collection, doc_id)
+            if doc is None:
+                self.remove(collection, doc_id)
+            else:
+                self.add(collection, doc_id, doc)
+            return
+        # Whole collection reloaded: rebuild its entries in one sort
+        self.entries = [e for e in self.entries if e[2] != collection]
+        self.doc_entries = {k: v for k, v in self.doc_entries.items() if k[0] != collection}
+        for doc_id, doc in catalog.docs[collection].items():
+            text = doc.get(AUTOCOMPLETE_FIELDS[collection])
+            if text:
+                entries = [(key, rank, collection, doc_id) for key, rank in self._keys(str(text))]
+                self.doc_entries[(collection, doc_id)] = entries
+                self.entries.extend(entries)
+        self.entries.sort()
+
+    def suggest(self, prefix: str, limit: int = 10) -> list:
+        prefix = " ".join(normalize_text(prefix).split())
+        if not prefix:
+            return []
+        candidates = {}
+        for key, rank, collection, doc_id in self.entries[bisect.bisect_left(self.entries, (prefix,)):]:
+            if not key.startswith(prefix) or len(candidates) >= limit * 4:
+                break
+            doc = catalog.get(collection, doc_id)
+            if doc and doc.get("is_active"):
+                best = candidates.get((collection, doc_id))
+                if best is None or rank < best:
+                    candidates[(collection, doc_id)] = rank
+        ranked = sorted(candidates.items(), key=lambda item: (item[1], len(catalog.get(*item[0])[AUTOCOMPLETE_FIELDS[item[0][0]]])))
+        return [
+            {"text": catalog.get(collection, doc_id)[AUTOCOMPLETE_FIELDS[collection]], "type": collection[:-1], "id": doc_id}
+            for (collection, doc_id), _ in ranked[:limit]
+        ]
+
+autocomplete = Autocomplete()
+catalog.listeners.append(autocomplete.on_catalog_change)
+
+# ==================== PAGINATION ====================
+
+MAX_PAGE_SIZE = 500
+
+def page_size(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+def encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode().rstrip("=")
+
+# Accepted JSON types per cursor position. Only scalars: a dict such as {"$ne": ...} would be an
+# operator in the keyset query, and a wrong type breaks the comparisons in bisect.
+CURSOR_INT = (int,)
+CURSOR_NUMBER = (int, float)
+CURSOR_STRING = (str,)
+CURSOR_OPTIONAL_STRING = (str, type(None))
+
+def decode_cursor(cursor: str, types: tuple) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        # type() rather than isinstance so True/False are not taken for numbers
+        if not isinstance(values, list) or len(values) != len(types) or \
+                not all(type(value) in allowed for value, allowed in zip(values, types)):
+            raise ValueError
+        return values
+    except ValueError:
+        raise HTTPException(status_code=400, detail="مؤشر الصفحة غير صالح")
+
+async def paginate(response: Optional[Response], collection: str, query: dict, projection: dict,
+                   sort_field: str, id_field: str, limit: int, cursor: Optional[str] = None,
+                   direction: int = DESCENDING):
+    """Keyset page sorted on (sort_field, id_field); the next-page cursor is set in X-Next-Cursor when a response is given"""
+    limit = page_size(limit)
+    op = "$lt" if direction == DESCENDING else "$gt"
+    if cursor:
+        if sort_field == id_field:
+            (last_id,) = decode_cursor(cursor, (CURSOR_STRING,))
+            after = {id_field: {op: last_id}}
+        else:
+            # Every paginated sort field (created_at) is stored as an ISO string
+            last_value, last_id = decode_cursor(cursor, (CURSOR_OPTIONAL_STRING, CURSOR_STRING))
+            after = {"$or": [{sort_field: {op: last_value}}, {sort_field: last_value, id_field: {op: last_id}}]}
+        query = {"$and": [query, after]} if query else after
+
+    sort = [(sort_field, direction)] if sort_field == id_field else [(sort_field, direction), (id_field, direction)]
+    docs = await db[collection].find(query, projection).sort(sort).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_cursor([last[id_field]] if sort_field == id_field else [last.get(sort_field), last[id_field]])
+        if response is not None:
+            response.headers["X-Next-Cursor"] = next_cursor
+    return docs, next_cursor
+
+# ==================== SPARSE FIELDSETS ====================
+
+FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+
+def parse_fields(fields: Optional[str], required: tuple = (), hidden: tuple = ()) -> Optional[list]:
+    """Field list from a comma-separated fields= parameter; None means whole documents.
+
+    required fields (ids, cursor keys) are always included and hidden ones never are.
+    """
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    if not names or not all(FIELD_NAME.match(name) for name in names):
+        raise HTTPException(status_code=400, detail="قائمة الحقول غير صالحة")
+    names = list(dict.fromkeys([*required, *(name for name in names if name.split(".")[0] not in hidden)]))
+    # "items" already covers "items.title"; Mongo rejects overlapping projection paths
+    return [name for name in names if not any(name.startswith(other + ".") for other in names)]
+
+def field_projection(fields: Optional[list], default: dict) -> dict:
+    """Inclusion projection for the requested fields so the rest is never read or decoded"""
+    if fields is None:
+        return default
+    return {"_id": 0, **{name: 1 for name in fields}}
+
+def pick_fields(doc, fields: list):
+    """In-memory equivalent of field_projection for documents served from the catalog snapshot"""
+    if isinstance(doc, list):
+        return [pick_fields(item, fields) for item in doc]
+    if not isinstance(doc, dict):
+        return doc
+    picked = {}
+    nested = defaultdict(list)
+    for name in fields:
+        head, _, rest = name.partition(".")
+        if head not in doc:
+            continue
+        if rest:
+            nested[head].append(rest)
+        else:
+            picked[head] = doc[head]
+    for head, rests in nested.items():
+        picked[head] = pick_fields(doc[head], rests)
+    return picked
+
+# ==================== STARTUP ====================
+
+# Per-step warm-up state reported by /api/ready (liveness stays on /api/health)
+startup_steps = {}
+startup_complete = False
+
+async def run_startup_step(name: str, step) -> bool:
+    """Run one warm-up step, recording its status and duration"""
+    startup_steps[name] = {"status": "running"}
+    started = time.perf_counter()
+    try:
+        await step()
+        startup_steps[name] = {"status": "done", "duration_ms": round((time.perf_counter() - started) * 1000, 1)}
+        return True
+    except Exception as e:
+        startup_steps[name] = {"status": "failed", "error": str(e), "duration_ms": round((time.perf_counter() - started) * 1000, 1)}
+        logger.error(f"Startup step {name} failed: {e}")
+        return False
+
+async def with_distributed_lock(name: str, fn, ttl_seconds: int = 120):
+    """Run fn while holding a Mongo-backed lock shared by every worker; waits if another worker holds it"""
+    owner = uuid.uuid4().hex
+    while True:
+        now = datetime.now(timezone.utc)
+        try:
+            # Matches only a free or expired lock; otherwise the upsert collides on _id
+            await db.locks.update_one(
+                {"_id": name, "expires_at": {"$lt": now}},
+                {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=ttl_seconds)}},
+                upsert=True
+            )
+            break
+        except DuplicateKeyError:
+            await asyncio.sleep(0.5)
+    try:
+        return await fn()
+    finally:
+        await db.locks.delete_one({"_id": name, "owner": owner})
+
+async def setup_indexes():
+    await ensure_indexes()
+    if os.environ.get('VERIFY_QUERY_PLANS') == '1':
+        # Test mode: never report ready if any known query shape is a collection scan
+        collscans = await find_collscans()
+        if collscans:
+            raise RuntimeError(f"Query shapes without index: {collscans}")
+        logger.info("All query shapes are index-backed")
+
+async def ensure_admin_user():
+    admin = await db.users.find_one({"email": ADMIN_EMAIL}, {"_id": 0, "user_id": 1})
+    if admin:
+        return
+    admin_user = {
+        "user_id": f"user_{uuid.uuid4().hex[:12]}",
+        "name": "Admin",
+        "email": ADMIN_EMAIL,
+        "password_hash": hash_password(ADMIN_PASSWORD),
+        "role": "admin",
+        "picture": None,
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+    try:
+        await db.users.insert_one(admin_user)
+        await count_write("users", after=admin_user)
+        await record_rollup(admin_user["created_at"], new_users=1)
+        logger.info("Admin user created")
+    except DuplicateKeyError:
+        # Another worker created it first
+        pass
+
+async def seed_if_empty():
+    """Seed empty collections; runs under the seed lock so only one worker seeds"""
+    # Check all counts before seeding: designer seeding also inserts products
+    prices_count, products_count, merchants_count, designers_count = await asyncio.gather(
+        db.gold_prices.count_documents({}, limit=1),
+        db.products.count_documents({}, limit=1),
+        db.merchants.count_documents({}, limit=1),
+        db.designers.count_documents({}, limit=1),
+    )
+    seeds = []
+    if prices_count == 0:
+        seeds.append(update_gold_prices())
+    if products_count == 0:
+        seeds.append(seed_sample_products())
+    if merchants_count == 0:
+        seeds.append(seed_sample_merchants())
+    if designers_count == 0:
+        seeds.append(seed_qatari_designers())
+    await asyncio.gather(*seeds)
+    if seeds:
+        # Seed inserts bypass the counter increments
+        await reconcile_dashboard_counters()
+
+async def backfill_price_per_gram():
+    """Store price_per_gram on products written before the field existed"""
+    await db.products.update_many(
+        {"price_per_gram": {"$exists": False}, "weight_grams": {"$gt": 0}},
+        [{"$set": {"price_per_gram": {"$round": [{"$divide": ["$price_qar", "$weight_grams"]}, 2]}}}]
+    )
+
+async def backfill_product_created_at():
+    """Stamp created_at on products written before it was stored, from their ObjectId's creation time"""
+    await db.products.update_many(
+        {"created_at": {"$exists": False}},
+        [{"$set": {"created_at": {"$dateToString": {
+            "date": {"$toDate": "$_id"}, "format": "%Y-%m-%dT%H:%M:%S.%L000+00:00", "timezone": "UTC"
+        }}}}]
+    )
+
+async def warm_up():
+    """Independent startup steps run concurrently; readiness flips once all succeed"""
+    global startup_complete
+    if not await run_startup_step("mongo_ping", lambda: client.admin.command('ping')):
+        return
+    logger.info("MongoDB connected successfully")
+
+    results = await asyncio.gather(
+        run_startup_step("indexes", setup_indexes),
+        run_startup_step("admin_user", ensure_admin_user),
+        run_startup_step("seed_data", lambda: with_distributed_lock("seed", seed_if_empty)),
+        run_startup_step("coupon_rules", refresh_coupon_rules),
+        run_startup_step("connection_pool", prime_connection_pool),
+    )
+    # After seeding, so products the seed inserts are covered, and before the catalog loads
+    results += tuple(await asyncio.gather(
+        run_startup_step("price_per_gram", backfill_price_per_gram),
+        run_startup_step("product_created_at", backfill_product_created_at),
+    ))
+
+    # Started whatever the other steps report: it owns the catalog reloads. It is created before
+    # read_caches so warm-up shares its first load instead of starting another.
+    asyncio.create_task(watch_catalog_changes())
+
+    # Caches are filled after seeding so a fresh database warms with its seed data
+    if results[2]:
+        results += tuple(await asyncio.gather(
+            run_startup_step("read_caches", warm_read_caches),
+            run_startup_step("dashboard_counters", lambda: with_distributed_lock(
+                "stats_reconcile", lambda: reconcile_dashboard_counters(STATS_RECONCILE_SECONDS))),
+            run_startup_step("rollups", lambda: with_distributed_lock("rollups_backfill", ensure_rollups, ttl_seconds=600)),
+        ))
+
+    # Start background task for periodic price updates
+    asyncio.create_task(periodic_price_update())
+    logger.info("Started periodic gold price updates (every 5 minutes)")
+    asyncio.create_task(periodic_stats_reconcile())
+
+    startup_complete = all(results)
+    logger.info(f"Warm-up finished: {'ready' if startup_complete else 'not ready'}")
+
+@app.on_event("startup")
+async def startup_event():
+    if db is None:
+        logger.error("MongoDB not connected!")
+        return
+
+    # Warm up in the background so the process answers liveness probes immediately
+    app.state.warm_up_task = asyncio.create_task(warm_up())
 
 async def seed_sample_merchants():
     merchants = [
@@ -372,9 +2195,9 @@ async def seed_qatari_designers():
 async def seed_sample_products():
     products = [
         # Investment bars
-        {"product_id": f"prod_{uuid.uuid4().hex[:8]}", "type": "investment_bar", "title": "سبيكة ذهب 10 جرام", "description": "سبيكة ذهب نقي عيار 24", "price_qar": 2850, "karat": 24, "weight_grams": 10, "image_url": "https://images.unsplash.com/photo-1624365169364-0640dd10e180?w=400", "merchant_name": "خزينة للذهب", "stock": 50, "category": "سبائك", "is_active": True},
-        {"product_id": f"prod_{uuid.uuid4().hex[:8]}", "type": "investment_bar", "title": "سبيكة ذهب 50 جرام", "description": "سبيكة ذهب نقي عيار 24", "price_qar": 14250, "karat": 24, "weight_grams": 50, "image_url": "https://images.unsplash.com/photo-1610375461246-83df859d849d?w=400", "merchant_name": "خزينة للذهب", "stock": 30, "category": "سبائك", "is_active": True},
-        {"product_id": f"prod_{uuid.uuid4().hex[:8]}", "type": "investment_bar", "title": "سبيكة ذهب 100 جرام", "description": "سبيكة ذهب نقي عيار 24", "price_qar": 28500, "karat": 24, "weight_grams": 100, "image_url": "https://images.unsplash.com/photo-1637597383958-d777c022e241?w=400", "merchant_name": "خزينة للذهب", "stock": 20, "category": "سبائك", "is_active": True},
+        {"product_id": f"prod_{uuid.uuid4().hex[:8]}", "type": "investment_bar", "title": "سبيكة ذهب 10 جرام", "description": "سبيكة ذهب نقي عيار 24", "price_qar": 2850, "karat": 24, "weight_grams": 10, "image_url": "https://images.unsplash.com/photo-1624365169364-0640dd10e180?w=400", "merchant_name": "خزينة للذهب", "stock": 50, "category": "سبائك", "price_linked": True, "making_charge": 1.0, "is_active": True},
+        {"product_id": f"prod_{uuid.uuid4().hex[:8]}", "type": "investment_bar", "title": "سبيكة ذهب 50 جرام", "description": "سبيكة ذهب نقي عيار 24", "price_qar": 14250, "karat": 24, "weight_grams": 50, "image_url": "https://images.unsplash.com/photo-1610375461246-83df859d849d?w=400", "merchant_name": "خزينة للذهب", "stock": 30, "category": "سبائك", "price_linked": True, "making_charge": 1.0, "is_active": True},
+        {"product_id": f"prod_{uuid.uuid4().hex[:8]}", "type": "investment_bar", "title": "سبيكة ذهب 100 جرام", "description": "سبيكة ذهب نقي عيار 24", "price_qar": 28500, "karat": 24, "weight_grams": 100, "image_url": "https://images.unsplash.com/photo-1637597383958-d777c022e241?w=400", "merchant_name": "خزينة للذهب", "stock": 20, "category": "سبائك", "price_linked": True, "making_charge": 1.0, "is_active": True},
         # Jewelry - Rings
         {"product_id": f"prod_{uuid.uuid4().hex[:8]}", "type": "jewelry", "title": "خاتم الماس ملكي", "description": "خاتم ذهب مرصع بالألماس", "price_qar": 3450, "karat": 21, "weight_grams": 5, "image_url": "https://images.unsplash.com/photo-1605100804763-247f67b3557e?w=400", "merchant_name": "مجوهرات الدوحة", "stock": 15, "category": "خواتم", "is_active": True},
         {"product_id": f"prod_{uuid.uuid4().hex[:8]}", "type": "jewelry", "title": "خاتم رجالي فاخر", "description": "خاتم ذهب رجالي كلاسيكي", "price_qar": 4800, "karat": 21, "weight_grams": 8, "image_url": "https://images.unsplash.com/photo-1611591437281-460bfbe1220a?w=400", "merchant_name": "الرميزان", "stock": 10, "category": "خواتم", "is_active": True},
@@ -390,7 +2213,8 @@ async def seed_sample_products():
         {"product_id": f"prod_{uuid.uuid4().hex[:8]}", "type": "gift", "title": "هدية المواليد", "description": "سوار ذهب للمولود الجديد", "price_qar": 2500, "karat": 18, "image_url": "https://images.unsplash.com/photo-1596944924616-7b38e7cfac36?w=400", "merchant_name": "زينة للهدايا", "stock": 20, "category": "مواليد", "is_active": True},
         {"product_id": f"prod_{uuid.uuid4().hex[:8]}", "type": "gift", "title": "هدية النجاح", "description": "ميدالية ذهب للتخرج", "price_qar": 1800, "karat": 21, "image_url": "https://images.unsplash.com/photo-1627656688426-927a5d6c1a1e?w=400", "merchant_name": "زينة للهدايا", "stock": 25, "category": "نجاح", "is_active": True},
     ]
-    await db.products.insert_many(products)
+    created_at = datetime.now(timezone.utc).isoformat()
+    await db.products.insert_many([{**product, "created_at": created_at} for product in products])
     logger.info("Sample products seeded")
 
 async def seed_designer_products():
@@ -424,14 +2248,99 @@ async def seed_designer_products():
         # DW Jewellery - الدانة حمد الحنزاب
         {"product_id": f"prod_{uuid.uuid4().hex[:8]}", "type": "designer", "title": "أقراط DW الحديثة", "description": "أقراط بتصميم حديث ومميز", "price_qar": 4500, "karat": 21, "weight_grams": 5, "image_url": "https://images.unsplash.com/photo-1535632066927-ab7c9ab60908?w=400", "designer_name": "الدانة حمد الحنزاب", "brand": "DW Jewellery", "stock": 10, "category": "أقراط", "is_active": True},
     ]
-    await db.products.insert_many(designer_products)
+    created_at = datetime.now(timezone.utc).isoformat()
+    await db.products.insert_many([{**product, "created_at": created_at} for product in designer_products])
     logger.info("Designer products seeded")
 
+# ==================== PRICE MATRIX ====================
+
+GRAMS_PER_OZ = 31.1035
+# Qatar gold market typically adds 35-45% to spot price
+# This includes: making charges (~25%), VAT, and profit margin (~15-20%)
+QATAR_MARKET_MARKUP = 1.44  # 44% markup to match local market prices
+# Currency units per 1 USD (Gulf currencies are pegged; KWD is basket-pegged)
+FX_RATES_FROM_USD = {"QAR": 3.64, "SAR": 3.75, "AED": 3.6725, "KWD": 0.307, "USD": 1.0}
+# Purities per asset as (label, fraction of pure metal)
+METAL_PURITIES = {
+    "gold": [(24, 24 / 24), (22, 22 / 24), (21, 21 / 24), (18, 18 / 24), (14, 14 / 24), (9, 9 / 24)],
+    "silver": [(999, 0.999), (925, 0.925)],
+    "platinum": [(999, 0.999), (950, 0.950)],
+}
+GOLD_KARATS = [karat for karat, _ in METAL_PURITIES["gold"]]
+# Fallback spot prices (USD/oz) when the feed has no value
+FALLBACK_SPOT_USD_PER_OZ = {
+    "gold": 2950,
+}
+# Silver is read from the same feed (xagPrice) with its own calibration; gold's 0.694 does not apply
+SILVER_FEED_CALIBRATION = float(os.environ.get('SILVER_FEED_CALIBRATION', '1.0'))
+# The feed has no platinum: its spot is set by an admin (PUT /api/admin/prices/spot/platinum)
+CONFIGURED_SPOT_METALS = ("platinum",)
+# Plausible spot range (USD/oz); a feed or configured value outside it is ignored
+SPOT_SANITY_USD_PER_OZ = {"silver": (5, 200), "platinum": (300, 5000)}
+# A metal whose last accepted spot is older than this is left out of the matrix, not priced stale
+SPOT_MAX_AGE = timedelta(hours=int(os.environ.get('SPOT_MAX_AGE_HOURS', '24')))
+# Plausible 24K QAR/gram range; a stored price outside it (scaled by karat/24) is not used as the previous price
+GOLD_24K_SANITY_QAR = (200, 1000)
+
+class PriceMatrix:
+    """(asset, purity) rows × currency columns of retail price per gram, recomputed once per tick"""
+
+    def __init__(self):
+        self.rows = [(asset, purity) for asset, purities in METAL_PURITIES.items() for purity, _ in purities]
+        self.row_index = {row: i for i, row in enumerate(self.rows)}
+        self.currencies = list(FX_RATES_FROM_USD)
+        self.currency_index = {c: i for i, c in enumerate(self.currencies)}
+        self._row_assets = np.array([list(METAL_PURITIES).index(asset) for asset, _ in self.rows])
+        self._row_fractions = np.array([fraction for purities in METAL_PURITIES.values() for _, fraction in purities])
+        self._fx = np.array([FX_RATES_FROM_USD[c] for c in self.currencies])
+        self.values = np.full((len(self.rows), len(self.currencies)), np.nan)
+        self.spots = {}  # asset -> (usd_per_oz, as_of); reused when a source misses a tick
+        self.priced = set()
+        self.updated_at = None
+
+    def compute(self, spots: dict):
+        """spots maps asset -> (USD/oz, as_of); missing or stale assets get NaN rows and are not served"""
+        cutoff = datetime.now(timezone.utc) - SPOT_MAX_AGE
+        fresh = {asset: usd for asset, (usd, as_of) in spots.items() if as_of >= cutoff}
+        spot = np.array([fresh.get(asset, np.nan) for asset in METAL_PURITIES])
+        usd_per_gram = spot / GRAMS_PER_OZ * QATAR_MARKET_MARKUP
+        # rows × 1 outer 1 × currencies in one broadcast
+        self.values = np.round((usd_per_gram[self._row_assets] * self._row_fractions)[:, None] * self._fx[None, :], 3)
+        self.spots = dict(spots)
+        self.priced = set(fresh)
+        self.updated_at = datetime.now(timezone.utc).isoformat()
+
+    def price(self, asset: str, purity: int, currency: str = "QAR") -> float:
+        return float(self.values[self.row_index[(asset, purity)], self.currency_index[currency]])
+
+    def slice(self, asset: Optional[str] = None, purity: Optional[int] = None, currency: Optional[str] = None) -> dict:
+        rows = [i for i, (a, p) in enumerate(self.rows)
+                if a in self.priced and (asset is None or a == asset) and (purity is None or p == purity)]
+        columns = [self.currency_index[currency]] if currency else list(range(len(self.currencies)))
+        block = self.values[np.ix_(rows, columns)].tolist()
+        currencies = [self.currencies[j] for j in columns]
+        return {
+            "updated_at": self.updated_at,
+            "spot_as_of": {a: self.spots[a][1].isoformat() for a in METAL_PURITIES if a in self.priced},
+            "currencies": currencies,
+            "rows": [
+                {"asset": self.rows[i][0], "purity": self.rows[i][1], "prices_per_gram": dict(zip(currencies, values))}
+                for i, values in zip(rows, block)
+            ],
+        }
+
+price_matrix = PriceMatrix()
+
+def plausible_spot(metal: str, usd_per_oz: float) -> bool:
+    low, high = SPOT_SANITY_USD_PER_OZ[metal]
+    return low < usd_per_oz < high
+
 async def update_gold_prices():
     """Fetch gold prices from free API and convert to QAR"""
     global last_gold_prices
     
-    usd_per_oz = 2950  # Default fallback (current market rate approximately)
+    usd_per_oz = FALLBACK_SPOT_USD_PER_OZ["gold"]  # Default fallback (current market rate approximately)
+    silver_usd_per_oz = None
     
     try:
         # Use goldprice.org free API with browser-like headers
@@ -453,38 +2362,41 @@ async def update_gold_prices():
                     # Ratio updated to 0.694 to match real market prices (Feb 2026)
                     usd_per_oz = xau_raw * 0.694
                     logger.info(f"Fetched LIVE gold price: ${usd_per_oz:.2f}/oz (raw: {xau_raw})")
+                xag_raw = float(data.get('items', [{}])[0].get('xagPrice', 0))
+                if xag_raw > 0:
+                    silver_usd_per_oz = xag_raw * SILVER_FEED_CALIBRATION
             else:
                 logger.warning(f"Gold API returned {response.status_code}, using fallback")
     except Exception as e:
         logger.error(f"Error fetching gold price: {e}, using fallback")
     
-    # Convert to QAR (1 USD = 3.64 QAR)
-    qar_per_oz = usd_per_oz * 3.64
-    # Convert to grams (1 oz = 31.1035 grams)
-    qar_per_gram_raw = qar_per_oz / 31.1035
-    
-    # Add Qatar market markup (making charges + profit margin)
-    # Qatar gold market typically adds 35-45% to spot price
-    # This includes: making charges (~25%), VAT, and profit margin (~15-20%)
-    QATAR_MARKET_MARKUP = 1.44  # 44% markup to match local market prices
-    qar_per_gram_24k = qar_per_gram_raw * QATAR_MARKET_MARKUP
+    # Whole assets × purities × currencies grid in one pass. Silver and platinum keep their last
+    # accepted spot when this tick has none; compute() drops them once that is too old.
+    now = datetime.now(timezone.utc)
+    spots = {**price_matrix.spots, "gold": (usd_per_oz, now)}
+    if silver_usd_per_oz is not None and plausible_spot("silver", silver_usd_per_oz):
+        spots["silver"] = (silver_usd_per_oz, now)
+    async for doc in db.metal_spots.find({"_id": {"$in": list(CONFIGURED_SPOT_METALS)}}):
+        spots[doc["_id"]] = (doc["usd_per_oz"], datetime.fromisoformat(doc["updated_at"]))
+    price_matrix.compute(spots)
     
     # Get previous prices to calculate change
     old_prices = await db.gold_prices.find({}, {"_id": 0}).to_list(10)
     old_price_map = {}
     
     # Only use old prices if they're recent (within 24 hours) and reasonable
+    low, high = GOLD_24K_SANITY_QAR
     for p in old_prices:
-        # Validate old price is reasonable (not too low or too high)
-        if 200 < p.get("price_per_gram_qar", 0) < 1000:
+        # Validate old price is reasonable for its karat (not too low or too high)
+        scale = p.get("karat", 0) / 24
+        if low * scale < p.get("price_per_gram_qar", 0) < high * scale:
             old_price_map[p["karat"]] = p["price_per_gram_qar"]
     
     # Calculate different karats with real change
     prices = []
-    karat_multipliers = {24: 1, 22: 22/24, 21: 21/24, 18: 18/24}
     
-    for karat, multiplier in karat_multipliers.items():
-        new_price = round(qar_per_gram_24k * multiplier, 2)
+    for karat in GOLD_KARATS:
+        new_price = round(price_matrix.price("gold", karat, "QAR"), 2)
         old_price = old_price_map.get(karat)
         
         # Calculate change only if we have a valid old price
@@ -508,17 +2420,27 @@ async def update_gold_prices():
     
     # Update database and track changes
     price_changed = False
-    for price in prices:
-        old_p = old_price_map.get(price["karat"], 0)
-        if abs(price["price_per_gram_qar"] - old_p) > 0.01:
-            price_changed = True
-        
-        await db.gold_prices.update_one(
-            {"karat": price["karat"]},
-            {"$set": {**price, "updated_at": datetime.now(timezone.utc).isoformat()}},
-            upsert=True
-        )
+    async with change_seq_write() as change_seq:
+        for price in prices:
+            old_p = old_price_map.get(price["karat"], 0)
+            if abs(price["price_per_gram_qar"] - old_p) > 0.01:
+                price_changed = True
+            
+            await db.gold_prices.update_one(
+                {"karat": price["karat"]},
+                {"$set": {**price, "change_seq": change_seq, "updated_at": datetime.now(timezone.utc).isoformat()}},
+                upsert=True
+            )
     
+    read_cache.invalidate("gold_prices")
+    body_cache.invalidate("gold_prices")
+    static_snapshots.refresh()
+
+    try:
+        await reprice_linked_products({p["karat"]: p["price_per_gram_qar"] for p in prices})
+    except Exception as e:
+        logger.error(f"Product repricing failed: {e}")
+
     # Store for notifications
     last_gold_prices = {p["karat"]: p["price_per_gram_qar"] for p in prices}
     
@@ -529,6 +2451,41 @@ async def update_gold_prices():
     logger.info(f"Gold prices updated - 24K: {prices[0]['price_per_gram_qar']} QAR/g")
     return prices
 
+async def reprice_linked_products(karat_prices: dict) -> int:
+    """Reprice gold-linked products as weight × karat price × making charge in one vectorized pass"""
+    if not catalog.loaded:
+        # Seeding tick before the snapshot exists; the next tick reprices
+        return 0
+    products = [
+        p for p in catalog.docs["products"].values()
+        if p.get("price_linked") and p.get("weight_grams") and p.get("karat") in karat_prices
+    ]
+    if not products:
+        return 0
+
+    weights = np.fromiter((p["weight_grams"] for p in products), dtype=np.float64, count=len(products))
+    per_gram = np.fromiter((karat_prices[p["karat"]] for p in products), dtype=np.float64, count=len(products))
+    charges = np.fromiter((p.get("making_charge", 1.0) for p in products), dtype=np.float64, count=len(products))
+    current = np.fromiter((p["price_qar"] for p in products), dtype=np.float64, count=len(products))
+
+    new_prices = np.round(weights * per_gram * charges, 2)
+    new_per_gram = np.round(new_prices / weights, 2)
+    changed = np.flatnonzero(np.abs(new_prices - current) >= 0.01)
+    if changed.size == 0:
+        return 0
+
+    updates = []
+    repriced = []
+    async with change_seq_write() as change_seq:
+        for i in changed:
+            fields = {"price_qar": float(new_prices[i]), "price_per_gram": float(new_per_gram[i]), "change_seq": change_seq}
+            updates.append(UpdateOne({"product_id": products[i]["product_id"]}, {"$set": fields}))
+            repriced.append({**products[i], **fields})
+        await db.products.bulk_write(updates, ordered=False)
+    catalog.apply_many("products", repriced)
+    logger.info(f"Repriced {len(repriced)} gold-linked products (catalog version {catalog.version})")
+    return len(repriced)
+
 async def check_price_alerts(current_prices):
     """Check and trigger price alerts"""
     price_map = {p["karat"]: p["price_per_gram_qar"] for p in current_prices}
@@ -591,6 +2548,8 @@ async def register(user: UserCreate, response: Response):
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     await db.users.insert_one(user_doc)
+    await count_write("users", after=user_doc)
+    await record_rollup(user_doc["created_at"], new_users=1)
     
     # Create wallet for user
     wallet = {
@@ -677,6 +2636,8 @@ async def process_session(request: Request, response: Response):
             "created_at": datetime.now(timezone.utc).isoformat()
         }
         await db.users.insert_one(user_doc)
+        await count_write("users", after=user_doc)
+        await record_rollup(user_doc["created_at"], new_users=1)
         
         # Create wallet
         wallet = {
@@ -719,16 +2680,23 @@ async def delete_account(request: Request):
     
     # Delete user's data from all collections
     await db.cart.delete_many({"user_id": user_id})
+    orders = await db.orders.aggregate([
+        {"$match": {"user_id": user_id}},
+        {"$group": {"_id": None, "count": {"$sum": 1}, "total_qar": {"$sum": "$total_qar"}}}
+    ]).to_list(1)
     await db.orders.delete_many({"user_id": user_id})
+    if orders:
+        await count_write("orders", before=orders[0], count=orders[0]["count"])
     await db.wallets.delete_many({"user_id": user_id})
     await db.notifications.delete_many({"user_id": user_id})
     await db.price_alerts.delete_many({"user_id": user_id})
     
     # Delete the user
-    result = await db.users.delete_one({"user_id": user_id})
+    deleted = await db.users.find_one_and_delete({"user_id": user_id}, {"_id": 0, "role": 1})
     
-    if result.deleted_count == 0:
+    if deleted is None:
         raise HTTPException(status_code=404, detail="المستخدم غير موجود")
+    await count_write("users", before=deleted)
     
     return {"message": "تم حذف الحساب بنجاح"}
 
@@ -843,17 +2811,19 @@ async def reset_password(data: PasswordResetConfirm):
 
 # ==================== NOTIFICATIONS ====================
 
+async def load_notifications(user_id: str, limit: int = 50, cursor: Optional[str] = None, response: Optional[Response] = None):
+    (notifications, next_cursor), unread_count = await asyncio.gather(
+        paginate(response, "notifications", {"user_id": user_id}, {"_id": 0},
+                 "created_at", "notification_id", limit, cursor),
+        db.notifications.count_documents({"user_id": user_id, "read": False})
+    )
+    return {"notifications": notifications, "unread_count": unread_count, "next_cursor": next_cursor}
+
 @api_router.get("/notifications")
-async def get_notifications(request: Request):
+async def get_notifications(request: Request, response: Response, limit: int = 50, cursor: Optional[str] = None):
     """Get user notifications"""
     user = await get_current_user(request)
-    notifications = await db.notifications.find(
-        {"user_id": user["user_id"]},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(50)
-    
-    unread_count = sum(1 for n in notifications if not n.get("read", False))
-    return {"notifications": notifications, "unread_count": unread_count}
+    return await load_notifications(user["user_id"], limit, cursor, response)
 
 @api_router.put("/notifications/{notification_id}/read")
 async def mark_notification_read(request: Request, notification_id: str):
@@ -919,61 +2889,238 @@ async def delete_price_alert(request: Request, alert_id: str):
 
 # ==================== GOLD PRICES ====================
 
+# Projection mirrors GoldPriceResponse so the cached list can be sent without validation
+GOLD_PRICE_PROJECTION = {"_id": 0, **{field: 1 for field in GoldPriceResponse.model_fields}}
+
+async def load_gold_prices():
+    # Validated once per load, not per request: updated_at keeps the model's wire format ("...Z")
+    docs = await db.gold_prices.find({}, GOLD_PRICE_PROJECTION).to_list(10)
+    return [GoldPriceResponse.model_validate(doc).model_dump(mode="json") for doc in docs]
+
+async def cached_gold_prices() -> list:
+    return await read_cache.get_or_load("gold_prices", load_gold_prices)
+
 @api_router.get("/gold-prices", response_model=List[GoldPriceResponse])
-async def get_gold_prices():
-    prices = await db.gold_prices.find({}, {"_id": 0}).to_list(10)
-    for p in prices:
-        if isinstance(p.get("updated_at"), str):
-            p["updated_at"] = datetime.fromisoformat(p["updated_at"])
-    return prices
+async def get_gold_prices(request: Request):
+    # response_model documents the schema; returning a response directly skips re-validating it
+    prices = await cached_gold_prices()
+    version = content_version(prices)
+
+    async def build(_):
+        return prices
+    return await cached_response(request, f"gold_prices:{version}", build,
+                                 etag=make_etag("gold_prices", version), policy="prices")
 
 @api_router.post("/gold-prices/refresh")
 async def refresh_gold_prices():
     await update_gold_prices()
     return {"message": "تم تحديث الأسعار"}
 
+@api_router.get("/prices/matrix")
+async def get_price_matrix(asset: Optional[str] = None, purity: Optional[int] = None, currency: Optional[str] = None):
+    """Per-gram prices for every metal, purity and currency, sliced from the per-tick matrix.
+
+    Metals without a fresh spot are left out of the full matrix; asking for one directly is a 503.
+    """
+    if asset and asset not in METAL_PURITIES:
+        raise HTTPException(status_code=400, detail="المعدن غير مدعوم")
+    if currency and currency.upper() not in FX_RATES_FROM_USD:
+        raise HTTPException(status_code=400, detail="العملة غير مدعومة")
+    if price_matrix.updated_at is None or (asset and asset not in price_matrix.priced):
+        raise HTTPException(status_code=503, detail="أسعار المعادن غير متوفرة بعد")
+    return price_matrix.slice(asset, purity, currency.upper() if currency else None)
+
+@api_router.put("/admin/prices/spot/{metal}")
+async def admin_set_metal_spot(request: Request, metal: str, spot: MetalSpotUpdate):
+    """Set the spot price of a metal the feed does not carry; it ages out after SPOT_MAX_AGE"""
+    await get_admin_user(request)
+    if metal not in CONFIGURED_SPOT_METALS:
+        raise HTTPException(status_code=404, detail="المعدن غير مدعوم")
+    if not plausible_spot(metal, spot.usd_per_oz):
+        raise HTTPException(status_code=400, detail="سعر المعدن غير منطقي")
+    now = datetime.now(timezone.utc)
+    await db.metal_spots.update_one(
+        {"_id": metal}, {"$set": {"usd_per_oz": spot.usd_per_oz, "updated_at": now.isoformat()}}, upsert=True
+    )
+    # This worker reprices now; the others on their next price tick
+    if price_matrix.updated_at is not None:
+        price_matrix.compute({**price_matrix.spots, metal: (spot.usd_per_oz, now)})
+    return {"message": "تم تحديث سعر المعدن", "metal": metal, "usd_per_oz": spot.usd_per_oz, "updated_at": now.isoformat()}
+
 # ==================== PRODUCTS ====================
 
 @api_router.get("/products")
-async def get_products(type: Optional[str] = None, category: Optional[str] = None):
-    query = {"is_active": True}
-    if type:
-        query["type"] = type
-    if category:
-        query["category"] = category
-    products = await db.products.find(query, {"_id": 0}).to_list(100)
-    return products
+async def get_products(request: Request, type: Optional[str] = None, category: Optional[str] = None,
+                       merchant: Optional[str] = None, designer: Optional[str] = None,
+                       sort: Optional[str] = None,
+                       min_price: Optional[float] = None, max_price: Optional[float] = None,
+                       min_weight: Optional[float] = None, max_weight: Optional[float] = None,
+                       min_karat: Optional[int] = None, max_karat: Optional[int] = None,
+                       limit: int = 100, cursor: Optional[str] = None, fields: Optional[str] = None):
+    if sort and sort not in PRODUCT_SORTS:
+        raise HTTPException(status_code=400, detail="ترتيب غير صالح")
+    selected = parse_fields(fields, required=("product_id",))
+    limit = page_size(limit)
+    await ensure_catalog()
+    version = catalog.version
+
+    async def build(response: Response):
+        response.headers["X-Catalog-Version"] = str(version)
+        filters = {"type": type, "category": category, "merchant_name": merchant, "designer_name": designer}
+        if sort:
+            # Presorted view; exact filters are checked while scanning
+            products = catalog.sorted_products(sort)
+            exact = {field: value for field, value in filters.items() if value is not None}
+        else:
+            products = catalog.query_products(**filters)
+            exact = {}
+        ranges = [(field, low, high) for field, low, high in [
+            ("price_qar", min_price, max_price),
+            ("weight_grams", min_weight, max_weight),
+            ("karat", min_karat, max_karat),
+        ] if low is not None or high is not None]
+
+        # Keyset: the cursor is the sort key of the last product returned
+        sort_key = catalog.sort_key(sort)
+        start = 0
+        if cursor:
+            # Same shape as CatalogSnapshot.sort_key: (missing flag, value, position) or (position,)
+            key_types = (CURSOR_INT, CURSOR_NUMBER, CURSOR_INT) if sort and PRODUCT_SORTS[sort][0] else (CURSOR_INT,)
+            start = bisect.bisect_right(products, tuple(decode_cursor(cursor, key_types)), key=sort_key)
+
+        page = []
+        for i in range(start, len(products)):
+            product = products[i]
+            if any(product.get(field) != value for field, value in exact.items()):
+                continue
+            if any(product.get(field) is None or (low is not None and product[field] < low) or (high is not None and product[field] > high)
+                   for field, low, high in ranges):
+                continue
+            if len(page) == limit:
+                response.headers["X-Next-Cursor"] = encode_cursor(list(sort_key(page[-1])))
+                break
+            page.append(product)
+        return pick_fields(page, selected) if selected else page
+
+    query = canonical_query(request)
+    return await cached_response(request, f"products:{version}:{query}", build,
+                                 etag=make_etag("products", catalog.digests["products"], query), policy="catalog_list")
+
+# Upper bounds (QAR) of the price facet buckets; the last bucket is open-ended
+PRICE_BUCKETS = [1000, 2500, 5000, 10000, 25000]
+FACET_FIELDS = {"type": "type", "category": "category", "karat": "karat", "merchant": "merchant_name", "designer": "designer_name"}
+
+def price_bucket(price: float) -> str:
+    lower = 0
+    for upper in PRICE_BUCKETS:
+        if price < upper:
+            return f"{lower}-{upper}"
+        lower = upper
+    return f"{lower}+"
+
+def compute_facets(products: list) -> dict:
+    counts = {name: defaultdict(int) for name in [*FACET_FIELDS, "price"]}
+    for product in products:
+        for name, field in FACET_FIELDS.items():
+            value = product.get(field)
+            if value is not None:
+                counts[name][value] += 1
+        counts["price"][price_bucket(product.get("price_qar", 0))] += 1
+    facets = {name: [{"value": value, "count": count} for value, count in sorted(values.items(), key=lambda item: -item[1])]
+              for name, values in counts.items() if name != "price"}
+    # Price buckets stay in range order
+    bounds = [price_bucket(upper - 1) for upper in PRICE_BUCKETS] + [f"{PRICE_BUCKETS[-1]}+"]
+    facets["price"] = [{"value": bucket, "count": counts["price"][bucket]} for bucket in bounds if counts["price"][bucket]]
+    return {"total": len(products), **facets}
+
+@api_router.get("/products/facets")
+async def get_product_facets(request: Request, type: Optional[str] = None, category: Optional[str] = None,
+                             merchant: Optional[str] = None, designer: Optional[str] = None):
+    """Filter sidebar counts; cached per catalog version so repeat renders send stored bytes"""
+    await ensure_catalog()
+    version = catalog.version
+
+    async def build(response: Response):
+        response.headers["X-Catalog-Version"] = str(version)
+        products = catalog.query_products(type=type, category=category, merchant_name=merchant, designer_name=designer)
+        return {"version": version, **compute_facets(products)}
+
+    return await cached_response(request, f"facets:{version}:{type}:{category}:{merchant}:{designer}", build)
 
 @api_router.get("/products/{product_id}")
-async def get_product(product_id: str):
-    product = await db.products.find_one({"product_id": product_id}, {"_id": 0})
-    if not product:
+async def get_product(request: Request, response: Response, product_id: str):
+    await ensure_catalog()
+    doc_hash = catalog.doc_hashes["products"].get(product_id)
+    if doc_hash is None:
         raise HTTPException(status_code=404, detail="المنتج غير موجود")
-    return product
+    etag = make_etag("product", doc_hash)
+    unchanged = not_modified(request, etag, "catalog_item")
+    if unchanged:
+        return unchanged
+    response.headers["X-Catalog-Version"] = str(catalog.version)
+    response.headers.update(validator_headers(etag, "catalog_item"))
+    return fast_response(catalog.get("products", product_id), response)
+
+@api_router.get("/catalog/version")
+async def get_catalog_version():
+    return {"version": catalog.version, "loaded": catalog.loaded, "change_stream": catalog.change_stream_active}
 
 # ==================== MERCHANTS ====================
 
 @api_router.get("/merchants")
-async def get_merchants():
-    merchants = await db.merchants.find({"is_active": True}, {"_id": 0}).to_list(50)
-    return merchants
+async def get_merchants(request: Request):
+    await ensure_catalog()
+    version = catalog.version
+
+    async def build(response: Response):
+        response.headers["X-Catalog-Version"] = str(version)
+        return catalog.active("merchants")
+
+    return await cached_response(request, f"merchants:{version}", build,
+                                 etag=make_etag("merchants", catalog.digests["merchants"]), policy="catalog_list")
 
 # ==================== DESIGNERS ====================
 
 @api_router.get("/designers")
-async def get_designers():
-    designers = await db.designers.find({"is_active": True}, {"_id": 0}).to_list(50)
-    return designers
+async def get_designers(request: Request):
+    await ensure_catalog()
+    version = catalog.version
+
+    async def build(response: Response):
+        response.headers["X-Catalog-Version"] = str(version)
+        return catalog.active("designers")
+
+    return await cached_response(request, f"designers:{version}", build,
+                                 etag=make_etag("designers", catalog.digests["designers"]), policy="catalog_list")
+
+# ==================== CATALOG SEARCH ====================
+
+@api_router.get("/search")
+async def search_catalog(response: Response, q: str, limit: int = 20):
+    """Ranked search over active products, designers and merchants (Arabic and Latin)"""
+    await ensure_catalog()
+    response.headers["X-Catalog-Version"] = str(catalog.version)
+    limit = page_size(limit)
+    results = {"products": [], "designers": [], "merchants": []}
+    for (collection, doc_id), score in search_index.search(q, prefix_last=True):
+        doc = catalog.get(collection, doc_id)
+        if doc and doc.get("is_active") and len(results[collection]) < limit:
+            results[collection].append({**doc, "score": round(score, 4)})
+    return fast_response({"query": q, **results}, response)
+
+@api_router.get("/autocomplete")
+async def autocomplete_catalog(q: str, limit: int = 10):
+    """Typeahead suggestions from product titles, designer brands and merchant names"""
+    await ensure_catalog()
+    return autocomplete.suggest(q, min(max(limit, 1), 20))
 
 # ==================== WALLET ====================
 
-@api_router.get("/wallet")
-async def get_wallet(request: Request):
-    user = await get_current_user(request)
-    wallet = await db.wallets.find_one({"user_id": user["user_id"]}, {"_id": 0})
+async def load_wallet(user_id: str) -> dict:
+    wallet = await db.wallets.find_one({"user_id": user_id}, {"_id": 0})
     if not wallet:
         wallet_doc = {
-            "user_id": user["user_id"],
+            "user_id": user_id,
             "gold_grams_total": 0.0,
             "cash_qar": 0.0,
             "updated_at": datetime.now(timezone.utc).isoformat()
@@ -981,13 +3128,18 @@ async def get_wallet(request: Request):
         await db.wallets.insert_one(wallet_doc)
         # Return a clean copy without _id
         wallet = {
-            "user_id": user["user_id"],
+            "user_id": user_id,
             "gold_grams_total": 0.0,
             "cash_qar": 0.0,
             "updated_at": wallet_doc["updated_at"]
         }
     return wallet
 
+@api_router.get("/wallet")
+async def get_wallet(request: Request):
+    user = await get_current_user(request)
+    return await load_wallet(user["user_id"])
+
 @api_router.post("/wallet/buy-gold")
 async def buy_gold(request: Request, transaction: TransactionCreate):
     user = await get_current_user(request)
@@ -1011,6 +3163,7 @@ async def buy_gold(request: Request, transaction: TransactionCreate):
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     await db.transactions.insert_one(tx)
+    await record_rollup(tx["created_at"], gold_bought_grams=grams)
     
     # Update wallet
     await db.wallets.update_one(
@@ -1043,6 +3196,7 @@ async def sell_gold(request: Request, transaction: TransactionCreate):
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     await db.transactions.insert_one(tx)
+    await record_rollup(tx["created_at"], gold_sold_grams=grams)
     
     await db.wallets.update_one(
         {"user_id": user["user_id"]},
@@ -1052,10 +3206,116 @@ async def sell_gold(request: Request, transaction: TransactionCreate):
     return {"message": "تم البيع بنجاح", "transaction": {k: v for k, v in tx.items() if k != "_id"}}
 
 @api_router.get("/transactions")
-async def get_transactions(request: Request):
+async def get_transactions(request: Request, response: Response, limit: int = 50, cursor: Optional[str] = None,
+                           fields: Optional[str] = None):
     user = await get_current_user(request)
-    transactions = await db.transactions.find({"user_id": user["user_id"]}, {"_id": 0}).sort("created_at", -1).to_list(50)
-    return transactions
+    projection = field_projection(parse_fields(fields, required=("transaction_id", "created_at")), {"_id": 0})
+    transactions, _ = await paginate(response, "transactions", {"user_id": user["user_id"]}, projection,
+                                     "created_at", "transaction_id", limit, cursor)
+    return fast_response(transactions, response)
+
+# ==================== BOOTSTRAP ====================
+
+BOOTSTRAP_PRODUCTS_LIMIT = 100
+
+def content_version(value) -> str:
+    """Short content hash used as a bootstrap section version"""
+    encoded = orjson.dumps(value, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+async def get_optional_user(request: Request) -> Optional[dict]:
+    try:
+        return await get_current_user(request)
+    except HTTPException:
+        return None
+
+def catalog_section(collection: str) -> tuple:
+    """(version, data) of a catalog bootstrap section, hashed once per snapshot version.
+
+    Content hashes rather than snapshot counters, so versions agree across workers and restarts.
+    """
+    view = ("bootstrap", collection)
+    if view not in catalog.active_lists:
+        if collection == "products":
+            products = catalog.query_products()
+            last = products[BOOTSTRAP_PRODUCTS_LIMIT - 1] if len(products) > BOOTSTRAP_PRODUCTS_LIMIT else None
+            data = {
+                "items": products[:BOOTSTRAP_PRODUCTS_LIMIT],
+                # Continues with GET /api/products?cursor=
+                "next_cursor": encode_cursor(list(catalog.sort_key(None)(last))) if last else None,
+            }
+        else:
+            data = catalog.active(collection)
+        catalog.active_lists[view] = (content_version(data), data)
+    return catalog.active_lists[view]
+
+@api_router.get("/bootstrap")
+async def bootstrap(request: Request, known: Optional[str] = None):
+    """Home-screen data in one round trip.
+
+    known is a comma-separated list of section:version pairs the client already holds;
+    matching sections come back as {"version", "unchanged": true} without data.
+    """
+    known_versions = dict(item.split(":", 1) for item in (known or "").split(",") if ":" in item)
+
+    async def user_sections():
+        user = await get_optional_user(request)
+        if not user:
+            return {}
+        wallet, notifications = await asyncio.gather(load_wallet(user["user_id"]), load_notifications(user["user_id"]))
+        me = {"user_id": user["user_id"], "name": user["name"], "email": user["email"], "role": user["role"], "picture": user.get("picture")}
+        return {"user": me, "wallet": wallet, "notifications": notifications}
+
+    gold_prices, _, personal = await asyncio.gather(cached_gold_prices(), ensure_catalog(), user_sections())
+
+    sections = {"gold_prices": (content_version(gold_prices), gold_prices)}
+    for name in ("products", "merchants", "designers"):
+        sections[name] = catalog_section(name)
+    for name, value in personal.items():
+        sections[name] = (content_version(value), value)
+
+    payload = {"authenticated": bool(personal), "sections": {}}
+    for name, (version, data) in sections.items():
+        if known_versions.get(name) == version:
+            payload["sections"][name] = {"version": version, "unchanged": True}
+        else:
+            payload["sections"][name] = {"version": version, "data": data}
+    # Compressed by CompressionMiddleware
+    return ApiResponse(payload)
+
+# ==================== SYNC ====================
+
+@api_router.get("/sync")
+async def sync_catalog(since: int = 0):
+    """Catalog and price changes after change sequence `since`; pass the returned version next time.
+
+    since=0 (or a version ahead of the server, e.g. after a database reset) returns a full snapshot.
+    """
+    # Read the watermark first: every write at or below it has committed, anything later
+    # (including writes still in flight) is picked up by the next sync
+    version = await current_change_seq()
+    full = since <= 0 or since > version
+    changed = {} if full else {"change_seq": {"$gt": since}}
+
+    collections = list(CATALOG_COLLECTIONS)
+    *catalog_docs, gold_prices, tombstones = await asyncio.gather(
+        *(db[name].find({"is_active": True} if full else changed, {"_id": 0}).to_list(None) for name in collections),
+        db.gold_prices.find(changed, {"_id": 0}).to_list(None),
+        # A full snapshot has nothing to delete
+        db.catalog_tombstones.find({"change_seq": {"$gt": version if full else since}}, {"_id": 0}).to_list(None),
+    )
+
+    payload = {"version": version, "full": full}
+    for name, docs in zip(collections, catalog_docs):
+        id_field = CATALOG_COLLECTIONS[name]
+        payload[name] = {
+            "upserted": [d for d in docs if d.get("is_active")],
+            # Deactivated documents are gone as far as clients are concerned
+            "deleted": [d[id_field] for d in docs if not d.get("is_active")]
+                       + [t["doc_id"] for t in tombstones if t["collection"] == name],
+        }
+    payload["gold_prices"] = gold_prices
+    return payload
 
 # ==================== SHARIA ACCEPTANCE ====================
 
@@ -1075,16 +3335,211 @@ async def accept_sharia(request: Request, data: ShariaAcceptance):
     )
     return {"message": "تم حفظ الموافقة", "accepted": data.accepted}
 
+# ==================== COUPONS ====================
+
+# Active coupon rules compiled in memory, keyed by upper-case code
+coupon_rules = {}
+# Bumped in db.counters by every coupon write so each instance knows when to recompile
+COUPON_RULES_VERSION = "coupon_rules"
+coupon_rules_version = None
+
+class CompiledCoupon:
+    """Coupon rule compiled once so carts can be priced without touching the database"""
+    __slots__ = ("code", "discount_type", "value", "categories", "merchants", "karats",
+                 "min_order_qar", "max_discount_qar", "usage_limit", "expires_at")
+
+    def __init__(self, doc: dict):
+        self.code = doc["code"]
+        self.discount_type = doc["discount_type"]
+        self.value = float(doc["value"])
+        self.categories = frozenset(doc.get("categories") or [])
+        self.merchants = frozenset(doc.get("merchants") or [])
+        self.karats = frozenset(doc.get("karats") or [])
+        self.min_order_qar = float(doc.get("min_order_qar") or 0)
+        self.max_discount_qar = doc.get("max_discount_qar")
+        self.usage_limit = doc.get("usage_limit")
+        self.expires_at = datetime.fromisoformat(doc["expires_at"]) if doc.get("expires_at") else None
+
+    def is_expired(self) -> bool:
+        return self.expires_at is not None and datetime.now(timezone.utc) > self.expires_at
+
+    def applies_to(self, product: dict) -> bool:
+        if self.categories and product.get("category") not in self.categories:
+            return False
+        if self.merchants and product.get("merchant_name") not in self.merchants:
+            return False
+        if self.karats and product.get("karat") not in self.karats:
+            return False
+        return True
+
+    def discount_for(self, lines: list) -> float:
+        """Discount for a list of (product, quantity) lines"""
+        eligible = sum(product["price_qar"] * quantity for product, quantity in lines if self.applies_to(product))
+        if self.discount_type == "percentage":
+            discount = eligible * self.value / 100
+        else:
+            discount = min(self.value, eligible)
+        if self.max_discount_qar is not None:
+            discount = min(discount, self.max_discount_qar)
+        return round(discount, 2)
+
+async def read_coupon_rules_version() -> int:
+    counter = await db.counters.find_one({"_id": COUPON_RULES_VERSION}, {"seq": 1})
+    return counter["seq"] if counter else 0
+
+async def refresh_coupon_rules():
+    """Recompile all active coupons into the in-memory rule table"""
+    global coupon_rules, coupon_rules_version
+    # Read first: a write landing during the reload leaves a newer version to pick up next time
+    version = await read_coupon_rules_version()
+    docs = await db.coupons.find(
+        {"is_active": True, "remaining_uses": {"$ne": 0}},
+        {"_id": 0}
+    ).to_list(None)
+    coupon_rules = {doc["code"]: CompiledCoupon(doc) for doc in docs}
+    coupon_rules_version = version
+    logger.info(f"Coupon rules compiled: {len(coupon_rules)} active")
+
+async def coupons_changed():
+    """Coupon write hook: bump the shared version, then recompile this instance's rules"""
+    await db.counters.update_one({"_id": COUPON_RULES_VERSION}, {"$inc": {"seq": 1}}, upsert=True)
+    await refresh_coupon_rules()
+
+async def ensure_coupon_rules():
+    """Recompile when another instance has changed a coupon since the last compile"""
+    if await read_coupon_rules_version() != coupon_rules_version:
+        await refresh_coupon_rules()
+
+def evaluate_coupon(code: str, lines: list, subtotal: float):
+    """Price a coupon against cart lines; raises HTTPException if it cannot be applied"""
+    coupon = coupon_rules.get(code.strip().upper())
+    if not coupon or coupon.is_expired():
+        raise HTTPException(status_code=400, detail="كود الخصم غير صالح أو منتهي الصلاحية")
+    if subtotal < coupon.min_order_qar:
+        raise HTTPException(status_code=400, detail=f"الحد الأدنى للطلب لاستخدام الكود {coupon.min_order_qar} ر.ق")
+    discount = coupon.discount_for(lines)
+    if discount <= 0:
+        raise HTTPException(status_code=400, detail="كود الخصم لا ينطبق على منتجات السلة")
+    return coupon, discount
+
+async def price_cart_coupon(code: str, items: list, products_by_id: dict):
+    """Coupon and discount for cart items; get_cart and create_order both price through here.
+
+    Only catalog products are discountable: gold investment lines are priced by weight and are
+    not part of the order, so they count toward neither the minimum nor the discount.
+    """
+    await ensure_coupon_rules()
+    lines = [(products_by_id[item["product_id"]], item["quantity"]) for item in items
+             if not item.get("is_gold_investment") and item["product_id"] in products_by_id]
+    subtotal = sum(product["price_qar"] * quantity for product, quantity in lines)
+    return evaluate_coupon(code, lines, subtotal)
+
+async def reserve_coupon_use(coupon: CompiledCoupon):
+    """Atomically consume one use of a coupon; raises HTTPException when the cap is exhausted"""
+    if coupon.usage_limit is None:
+        result = await db.coupons.update_one({"code": coupon.code, "is_active": True}, {"$inc": {"used_count": 1}})
+        if result.matched_count == 0:
+            # Deactivated or deleted after this instance compiled it
+            await refresh_coupon_rules()
+            raise HTTPException(status_code=400, detail="كود الخصم غير صالح أو منتهي الصلاحية")
+        return
+
+    result = await db.coupons.find_one_and_update(
+        {"code": coupon.code, "is_active": True, "remaining_uses": {"$gt": 0}},
+        {"$inc": {"remaining_uses": -1, "used_count": 1}},
+        projection={"_id": 0, "remaining_uses": 1}
+    )
+    if not result:
+        await refresh_coupon_rules()
+        raise HTTPException(status_code=400, detail="تم استنفاد كود الخصم")
+    if result["remaining_uses"] <= 1:
+        # Last use taken (result is the document before the decrement): other instances must stop offering it
+        await coupons_changed()
+
+async def release_coupon_use(coupon: CompiledCoupon):
+    """Give back a use reserved for an order that was not created"""
+    inc = {"used_count": -1}
+    if coupon.usage_limit is not None:
+        inc["remaining_uses"] = 1
+    await db.coupons.update_one({"code": coupon.code}, {"$inc": inc})
+    await coupons_changed()
+
+async def load_cart_products(items: list) -> dict:
+    """Fetch all products referenced by cart items with a single query"""
+    product_ids = [item["product_id"] for item in items if not item.get("is_gold_investment")]
+    if not product_ids:
+        return {}
+    products = await db.products.find({"product_id": {"$in": product_ids}}, {"_id": 0}).to_list(None)
+    return {p["product_id"]: p for p in products}
+
+@api_router.get("/admin/coupons")
+async def admin_get_coupons(request: Request):
+    await get_admin_user(request)
+    coupons = await db.coupons.find({}, {"_id": 0}).sort("created_at", -1).to_list(200)
+    return coupons
+
+@api_router.post("/admin/coupons")
+async def admin_create_coupon(request: Request, coupon: CouponCreate):
+    await get_admin_user(request)
+
+    if coupon.discount_type not in ["percentage", "fixed"]:
+        raise HTTPException(status_code=400, detail="نوع الخصم غير صالح")
+    if coupon.value <= 0 or (coupon.discount_type == "percentage" and coupon.value > 100):
+        raise HTTPException(status_code=400, detail="قيمة الخصم غير صالحة")
+    if coupon.usage_limit is not None and coupon.usage_limit <= 0:
+        raise HTTPException(status_code=400, detail="حد الاستخدام يجب أن يكون أكبر من صفر")
+
+    code = coupon.code.strip().upper()
+    if await db.coupons.find_one({"code": code}, {"_id": 0, "code": 1}):
+        raise HTTPException(status_code=400, detail="كود الخصم موجود مسبقاً")
+
+    expires_at = coupon.expires_at
+    if expires_at and expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+
+    coupon_doc = {
+        "coupon_id": f"coupon_{uuid.uuid4().hex[:12]}",
+        **coupon.model_dump(),
+        "code": code,
+        "expires_at": expires_at.isoformat() if expires_at else None,
+        "remaining_uses": coupon.usage_limit,
+        "used_count": 0,
+        "created_at": datetime.now(timezone.utc).isoformat()
+    }
+    await db.coupons.insert_one(coupon_doc)
+    await coupons_changed()
+
+    return {"message": "تم إنشاء كود الخصم", "coupon": {k: v for k, v in coupon_doc.items() if k != "_id"}}
+
+@api_router.put("/admin/coupons/{coupon_id}/active")
+async def admin_toggle_coupon(request: Request, coupon_id: str, is_active: bool):
+    await get_admin_user(request)
+    result = await db.coupons.update_one({"coupon_id": coupon_id}, {"$set": {"is_active": is_active}})
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="كود الخصم غير موجود")
+    await coupons_changed()
+    return {"message": "تم تحديث كود الخصم", "is_active": is_active}
+
+@api_router.delete("/admin/coupons/{coupon_id}")
+async def admin_delete_coupon(request: Request, coupon_id: str):
+    await get_admin_user(request)
+    result = await db.coupons.delete_one({"coupon_id": coupon_id})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="كود الخصم غير موجود")
+    await coupons_changed()
+    return {"message": "تم حذف كود الخصم"}
+
 # ==================== CART ====================
 
 @api_router.get("/cart")
-async def get_cart(request: Request):
+async def get_cart(request: Request, coupon_code: Optional[str] = None):
     user = await get_current_user(request)
     cart = await db.carts.find_one({"user_id": user["user_id"]}, {"_id": 0})
     if not cart:
         return {"items": [], "total": 0}
-    
+
     # Populate product details
+    products_by_id = await load_cart_products(cart.get("items", []))
     items_with_products = []
     total = 0
     for item in cart.get("items", []):
@@ -1102,13 +3557,21 @@ async def get_cart(request: Request):
             total += item["total_price"]
             items_with_products.append(item)
         else:
-            product = await db.products.find_one({"product_id": item["product_id"]}, {"_id": 0})
+            product = products_by_id.get(item["product_id"])
             if product:
                 item["product"] = product
                 total += product["price_qar"] * item["quantity"]
                 items_with_products.append(item)
-    
-    return {"items": items_with_products, "total": total}
+
+    result = {"items": items_with_products, "total": total}
+    if coupon_code:
+        try:
+            coupon, discount = await price_cart_coupon(coupon_code, cart.get("items", []), products_by_id)
+            result.update({"coupon_code": coupon.code, "discount": discount, "total_after_discount": round(total - discount, 2)})
+        except HTTPException as e:
+            result.update({"coupon_error": e.detail, "discount": 0, "total_after_discount": total})
+
+    return result
 
 @api_router.post("/cart/add")
 async def add_to_cart(request: Request, item: CartItemCreate):
@@ -1226,10 +3689,11 @@ async def create_order(request: Request, order: OrderCreate):
         raise HTTPException(status_code=400, detail="السلة فارغة")
     
     # Calculate total
+    products_by_id = await load_cart_products(cart["items"])
     items_details = []
     total = 0
     for item in cart["items"]:
-        product = await db.products.find_one({"product_id": item["product_id"]}, {"_id": 0})
+        product = products_by_id.get(item["product_id"])
         if product:
             item_total = product["price_qar"] * item["quantity"]
             total += item_total
@@ -1238,21 +3702,40 @@ async def create_order(request: Request, order: OrderCreate):
                 "title": product["title"],
                 "quantity": item["quantity"],
                 "price_qar": product["price_qar"],
-                "subtotal": item_total
+                "subtotal": item_total,
+                "merchant_name": product.get("merchant_name"),
+                "designer_name": product.get("designer_name")
             })
-    
+
+    # Apply coupon from the compiled rules, then consume one use atomically
+    coupon = None
+    discount = 0
+    if order.coupon_code:
+        coupon, discount = await price_cart_coupon(order.coupon_code, cart["items"], products_by_id)
+        await reserve_coupon_use(coupon)
+
     order_doc = {
         "order_id": f"order_{uuid.uuid4().hex[:12]}",
         "user_id": user["user_id"],
         "items": items_details,
-        "total_qar": total,
+        "subtotal_qar": total,
+        "discount_qar": discount,
+        "total_qar": round(total - discount, 2),
         "status": "pending",
         "payment_method": "cash_on_delivery",
         "delivery_address": order.delivery_address,
-        "coupon_code": order.coupon_code,
+        "coupon_code": coupon.code if coupon else None,
         "created_at": datetime.now(timezone.utc).isoformat()
     }
-    await db.orders.insert_one(order_doc)
+    try:
+        await db.orders.insert_one(order_doc)
+    except Exception:
+        if coupon:
+            await release_coupon_use(coupon)
+        raise
+    await count_write("orders", after=order_doc)
+    await record_rollup(order_doc["created_at"], revenue_qar=order_doc["total_qar"], orders=1)
+    await record_seller_sales(seller_sales_deltas(order_doc))
     
     # Clear cart
     await db.carts.delete_one({"user_id": user["user_id"]})
@@ -1260,10 +3743,11 @@ async def create_order(request: Request, order: OrderCreate):
     return {"message": "تم إنشاء الطلب بنجاح", "order": {k: v for k, v in order_doc.items() if k != "_id"}}
 
 @api_router.get("/orders")
-async def get_orders(request: Request):
+async def get_orders(request: Request, fields: Optional[str] = None):
     user = await get_current_user(request)
-    orders = await db.orders.find({"user_id": user["user_id"]}, {"_id": 0}).sort("created_at", -1).to_list(50)
-    return orders
+    projection = field_projection(parse_fields(fields, required=("order_id",)), {"_id": 0})
+    orders = await db.orders.find({"user_id": user["user_id"]}, projection).sort("created_at", -1).to_list(50)
+    return fast_response(orders)
 
 @api_router.get("/orders/{order_id}")
 async def get_order(request: Request, order_id: str):
@@ -1275,93 +3759,174 @@ async def get_order(request: Request, order_id: str):
 
 # ==================== ADMIN ROUTES ====================
 
+@api_router.get("/admin/dashboard")
+async def admin_dashboard(request: Request):
+    """Every dashboard number from the materialized counters: one document read"""
+    await get_admin_user(request)
+    counters = await dashboard_counters()
+    users, orders, products, merchants, designers = (counters.get(c, {}) for c in COUNTED_FIELDS)
+    return {
+        "users": {"total": users.get("total", 0), "by_role": users.get("by_role", {})},
+        "orders": {"total": orders.get("total", 0), "revenue_qar": round(orders.get("revenue_qar", 0), 2)},
+        "products": {"total": products.get("total", 0), "active": products.get("active", 0),
+                     "by_type": products.get("by_type", {})},
+        "merchants": {"total": merchants.get("total", 0), "active": merchants.get("active", 0)},
+        "designers": {"total": designers.get("total", 0), "active": designers.get("active", 0)},
+        "reconciled_at": counters.get("reconciled_at"),
+        "updated_at": counters.get("updated_at"),
+    }
+
+@api_router.get("/admin/analytics")
+async def admin_analytics(request: Request, metric: str, interval: str = "day",
+                          start: Optional[str] = Query(None, alias="from"), end: Optional[str] = Query(None, alias="to")):
+    """One metric over time, read from the rollup buckets only; empty buckets are returned as zero"""
+    await get_admin_user(request)
+    if metric not in ROLLUP_METRICS:
+        raise HTTPException(status_code=400, detail="مقياس غير معروف")
+    if interval not in ROLLUP_INTERVALS:
+        raise HTTPException(status_code=400, detail="فترة غير معروفة")
+    collection, key_length, step = ROLLUP_INTERVALS[interval]
+
+    end = parse_rollup_time(end, datetime.now(timezone.utc)).astimezone(timezone.utc)
+    start = parse_rollup_time(start, end - step * 30).astimezone(timezone.utc)
+    start = start.replace(minute=0, second=0, microsecond=0)
+    if interval == "day":
+        start = start.replace(hour=0)
+    if start > end or (end - start) / step >= ROLLUP_MAX_POINTS:
+        raise HTTPException(status_code=400, detail="نطاق التاريخ غير صالح")
+
+    buckets = await db[collection].find(
+        {"_id": {"$gte": start.isoformat()[:key_length], "$lte": end.isoformat()[:key_length]}},
+        {metric: 1}
+    ).to_list(None)
+    values = {bucket["_id"]: bucket.get(metric, 0) for bucket in buckets}
+
+    points = []
+    bucket_start = start
+    while bucket_start <= end:
+        value = values.get(bucket_start.isoformat()[:key_length], 0)
+        points.append({"bucket": bucket_start.isoformat(), "value": round(value, 3)})
+        bucket_start += step
+    return {
+        "metric": metric,
+        "interval": interval,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "total": round(sum(point["value"] for point in points), 3),
+        "points": points,
+    }
+
+@api_router.post("/admin/analytics/backfill")
+async def admin_backfill_analytics(request: Request, since: Optional[str] = None):
+    """Rebuild the rollups from the source collections, from `since` (YYYY-MM-DD) or from the beginning; seller sales are always rebuilt in full"""
+    await get_admin_user(request)
+    if since:
+        parse_rollup_time(since, None)
+    hours = await with_distributed_lock("rollups_backfill", lambda: backfill_rollups(since), ttl_seconds=600)
+    sellers = await with_distributed_lock("rollups_backfill", backfill_seller_sales, ttl_seconds=600)
+    return {"message": "تم تحديث الإحصاءات", "hours": hours, "sellers": sellers}
+
 @api_router.get("/admin/stats")
 async def admin_stats(request: Request):
-    await get_admin_user(request)
-    
-    users_count = await db.users.count_documents({})
-    orders_count = await db.orders.count_documents({})
-    products_count = await db.products.count_documents({})
-    shops_count = await db.merchants.count_documents({})
-    designers_count = await db.designers.count_documents({})
-    
-    # Get total revenue
-    pipeline = [{"$group": {"_id": None, "total": {"$sum": "$total_qar"}}}]
-    revenue_result = await db.orders.aggregate(pipeline).to_list(1)
-    total_revenue = revenue_result[0]["total"] if revenue_result else 0
-    
+    dashboard = await admin_dashboard(request)
     return {
-        "users_count": users_count,
-        "orders_count": orders_count,
-        "products_count": products_count,
-        "shops_count": shops_count,
-        "designers_count": designers_count,
-        "total_revenue_qar": total_revenue
+        "users_count": dashboard["users"]["total"],
+        "orders_count": dashboard["orders"]["total"],
+        "products_count": dashboard["products"]["total"],
+        "shops_count": dashboard["merchants"]["total"],
+        "designers_count": dashboard["designers"]["total"],
+        "total_revenue_qar": dashboard["orders"]["revenue_qar"]
     }
 
 @api_router.get("/admin/orders")
-async def admin_get_orders(request: Request):
+async def admin_get_orders(request: Request, response: Response, limit: int = 100, cursor: Optional[str] = None,
+                           fields: Optional[str] = None):
     await get_admin_user(request)
-    orders = await db.orders.find({}, {"_id": 0}).sort("created_at", -1).to_list(100)
+    projection = field_projection(parse_fields(fields, required=("order_id", "created_at")), {"_id": 0})
+    orders, _ = await paginate(response, "orders", {}, projection, "created_at", "order_id", limit, cursor)
     return orders
 
 @api_router.put("/admin/orders/{order_id}/status")
 async def admin_update_order_status(request: Request, order_id: str, status: str):
     await get_admin_user(request)
-    result = await db.orders.update_one({"order_id": order_id}, {"$set": {"status": status}})
-    if result.modified_count == 0:
+    before = await db.orders.find_one_and_update(
+        {"order_id": order_id}, {"$set": {"status": status}},
+        projection={"_id": 0, "items": 1, "status": 1}
+    )
+    if before is None:
         raise HTTPException(status_code=404, detail="الطلب غير موجود")
+    if before.get("status") != status:
+        products = await load_cart_products([item for item in before.get("items", []) if "merchant_name" not in item])
+        await record_seller_sales(seller_sales_deltas(before, -1, products=products),
+                                  seller_sales_deltas(before, 1, status, products=products))
     return {"message": "تم تحديث حالة الطلب"}
 
 @api_router.post("/admin/products")
 async def admin_create_product(request: Request, product: ProductCreate):
     await get_admin_user(request)
     
-    product_doc = {
-        "product_id": f"prod_{uuid.uuid4().hex[:8]}",
-        **product.model_dump(),
-        "is_active": True
-    }
-    await db.products.insert_one(product_doc)
+    async with change_seq_write() as change_seq:
+        product_doc = {
+            "product_id": f"prod_{uuid.uuid4().hex[:8]}",
+            **product.model_dump(),
+            "price_per_gram": price_per_gram(product.model_dump()),
+            "is_active": True,
+            "change_seq": change_seq,
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
+        await db.products.insert_one(product_doc)
+    await count_write("products", after=product_doc)
+    await sync_catalog_doc("products", product_doc["product_id"])
     return {"message": "تم إنشاء المنتج", "product": {k: v for k, v in product_doc.items() if k != "_id"}}
 
 @api_router.put("/admin/products/{product_id}")
 async def admin_update_product(request: Request, product_id: str, product: ProductCreate):
     await get_admin_user(request)
-    result = await db.products.update_one(
-        {"product_id": product_id},
-        {"$set": product.model_dump()}
-    )
-    if result.modified_count == 0:
+    async with change_seq_write() as change_seq:
+        before = await db.products.find_one_and_update(
+            {"product_id": product_id},
+            {"$set": {**product.model_dump(), "price_per_gram": price_per_gram(product.model_dump()),
+                      "change_seq": change_seq}},
+            projection={"_id": 0, **{field: 1 for field in COUNTED_FIELDS["products"]}}
+        )
+    if before is None:
         raise HTTPException(status_code=404, detail="المنتج غير موجود")
+    await count_write("products", before=before, after={**before, "type": product.type})
+    await sync_catalog_doc("products", product_id)
     return {"message": "تم تحديث المنتج"}
 
 @api_router.delete("/admin/products/{product_id}")
 async def admin_delete_product(request: Request, product_id: str):
     await get_admin_user(request)
-    result = await db.products.update_one(
-        {"product_id": product_id},
-        {"$set": {"is_active": False}}
-    )
-    if result.modified_count == 0:
+    async with change_seq_write() as change_seq:
+        before = await db.products.find_one_and_update(
+            {"product_id": product_id},
+            {"$set": {"is_active": False, "change_seq": change_seq}},
+            projection={"_id": 0, **{field: 1 for field in COUNTED_FIELDS["products"]}}
+        )
+    if before is None:
         raise HTTPException(status_code=404, detail="المنتج غير موجود")
+    await count_write("products", before=before, after={**before, "is_active": False})
+    await sync_catalog_doc("products", product_id)
     return {"message": "تم حذف المنتج"}
 
 @api_router.post("/admin/merchants")
 async def admin_create_merchant(request: Request, merchant: MerchantCreate):
     await get_admin_user(request)
     
-    merchant_doc = {
-        "merchant_id": f"merchant_{uuid.uuid4().hex[:8]}",
-        **merchant.model_dump(),
-        "is_active": True
-    }
-    await db.merchants.insert_one(merchant_doc)
+    async with change_seq_write() as change_seq:
+        merchant_doc = {
+            "merchant_id": f"merchant_{uuid.uuid4().hex[:8]}",
+            **merchant.model_dump(),
+            "is_active": True,
+            "change_seq": change_seq
+        }
+        await db.merchants.insert_one(merchant_doc)
+    await count_write("merchants", after=merchant_doc)
+    await sync_catalog_doc("merchants", merchant_doc["merchant_id"])
     return {"message": "تم إنشاء المتجر", "merchant": {k: v for k, v in merchant_doc.items() if k != "_id"}}
 
-@api_router.get("/admin/users")
-async def admin_get_users(request: Request, search: Optional[str] = None, role: Optional[str] = None):
-    await get_admin_user(request)
+def admin_users_query(search: Optional[str] = None, role: Optional[str] = None) -> dict:
     query = {}
     
     if search:
@@ -1372,27 +3937,30 @@ async def admin_get_users(request: Request, search: Optional[str] = None, role:
     
     if role:
         query["role"] = role
-    
-    users = await db.users.find(query, {"_id": 0, "password_hash": 0}).to_list(100)
+    return query
+
+@api_router.get("/admin/users")
+async def admin_get_users(request: Request, response: Response, search: Optional[str] = None, role: Optional[str] = None,
+                          limit: int = 100, cursor: Optional[str] = None, fields: Optional[str] = None):
+    await get_admin_user(request)
+    query = admin_users_query(search, role)
+    projection = field_projection(parse_fields(fields, required=("user_id", "created_at"), hidden=("password_hash",)),
+                                  {"_id": 0, "password_hash": 0})
+    users, _ = await paginate(response, "users", query, projection, "created_at", "user_id", limit, cursor)
     return users
 
 @api_router.get("/admin/users/count")
 async def admin_get_users_count(request: Request):
-    await get_admin_user(request)
-    count = await db.users.count_documents({})
-    return {"count": count}
+    dashboard = await admin_dashboard(request)
+    return {"count": dashboard["users"]["total"]}
 
 @api_router.get("/admin/users/stats")
 async def admin_get_users_stats(request: Request):
-    await get_admin_user(request)
-    total = await db.users.count_documents({})
-    admins = await db.users.count_documents({"role": "admin"})
-    users_role = await db.users.count_documents({"role": "user"})
-    
+    users = (await admin_dashboard(request))["users"]
     return {
-        "total": total,
-        "admins": admins,
-        "users": users_role
+        "total": users["total"],
+        "admins": users["by_role"].get("admin", 0),
+        "users": users["by_role"].get("user", 0)
     }
 
 @api_router.get("/admin/users/{user_id}")
@@ -1418,13 +3986,15 @@ async def admin_update_user_role(request: Request, user_id: str, role_update: Ro
         raise HTTPException(status_code=400, detail="دور غير صالح")
     
     # تحديث الدور
-    result = await db.users.update_one(
+    before = await db.users.find_one_and_update(
         {"user_id": user_id},
-        {"$set": {"role": role_update.role}}
+        {"$set": {"role": role_update.role}},
+        projection={"_id": 0, "role": 1}
     )
     
-    if result.matched_count == 0:
+    if before is None:
         raise HTTPException(status_code=404, detail="المستخدم غير موجود")
+    await count_write("users", before=before, after={**before, "role": role_update.role})
     
     return {"message": "تم تحديث الدور بنجاح", "role": role_update.role}
 
@@ -1450,9 +4020,42 @@ async def admin_toggle_user_block(request: Request, user_id: str, block_update:
 @api_router.get("/admin/users/{user_id}/orders")
 async def admin_get_user_orders(request: Request, user_id: str):
     await get_admin_user(request)
-    orders = await db.orders.find({"user_id": user_id}, {"_id": 0}).to_list(100)
+    orders = await db.orders.find({"user_id": user_id}, {"_id": 0}).sort(
+        [("created_at", DESCENDING), ("order_id", DESCENDING)]
+    ).to_list(100)
     return orders
 
+@api_router.get("/admin/users/{user_id}/overview")
+async def admin_get_user_overview(request: Request, user_id: str, limit: int = 10):
+    """Profile, wallet and the latest orders, transactions, alerts and vouchers; every query is index-backed and runs concurrently"""
+    await get_admin_user(request)
+    limit = min(max(limit, 1), 50)
+
+    def recent(collection, query, sort):
+        return db[collection].find(query, {"_id": 0}).sort(sort).to_list(limit)
+
+    user, wallet, orders_count, orders, transactions, alerts, vouchers_sent, vouchers_redeemed = await asyncio.gather(
+        db.users.find_one({"user_id": user_id}, {"_id": 0, "password_hash": 0}),
+        db.wallets.find_one({"user_id": user_id}, {"_id": 0}),
+        db.orders.count_documents({"user_id": user_id}),
+        recent("orders", {"user_id": user_id}, [("created_at", DESCENDING), ("order_id", DESCENDING)]),
+        recent("transactions", {"user_id": user_id}, [("created_at", DESCENDING), ("transaction_id", DESCENDING)]),
+        recent("price_alerts", {"user_id": user_id}, [("created_at", DESCENDING)]),
+        recent("gift_vouchers", {"sender_id": user_id}, [("created_at", DESCENDING), ("voucher_id", DESCENDING)]),
+        recent("gift_vouchers", {"redeemed_by": user_id}, [("redeemed_at", DESCENDING)]),
+    )
+    if not user:
+        raise HTTPException(status_code=404, detail="المستخدم غير موجود")
+
+    return fast_response({
+        "profile": user,
+        "wallet": wallet,
+        "orders": {"count": orders_count, "recent": orders},
+        "transactions": transactions,
+        "price_alerts": alerts,
+        "vouchers": {"sent": vouchers_sent, "redeemed": vouchers_redeemed},
+    })
+
 @api_router.delete("/admin/users/{user_id}")
 async def admin_delete_user(request: Request, user_id: str):
     current_user = await get_admin_user(request)
@@ -1461,10 +4064,11 @@ async def admin_delete_user(request: Request, user_id: str):
     if current_user.get("user_id") == user_id:
         raise HTTPException(status_code=400, detail="لا يمكن حذف نفسك")
     
-    result = await db.users.delete_one({"user_id": user_id})
+    deleted = await db.users.find_one_and_delete({"user_id": user_id}, {"_id": 0, "role": 1})
     
-    if result.deleted_count == 0:
+    if deleted is None:
         raise HTTPException(status_code=404, detail="المستخدم غير موجود")
+    await count_write("users", before=deleted)
     
     return {"message": "تم حذف المستخدم بنجاح"}
 
@@ -1493,66 +4097,90 @@ async def admin_reset_user_password(request: Request, user_id: str, data: dict):
 
 @api_router.get("/admin/shops/stats")
 async def admin_get_shops_stats(request: Request):
-    await get_admin_user(request)
-    total = await db.merchants.count_documents({})
-    active = await db.merchants.count_documents({"is_active": True})
-    
+    shops = (await admin_dashboard(request))["merchants"]
     return {
-        "total": total,
-        "active": active,
-        "inactive": total - active
+        "total": shops["total"],
+        "active": shops["active"],
+        "inactive": shops["total"] - shops["active"]
     }
 
 @api_router.get("/admin/designers/stats")
 async def admin_get_designers_stats(request: Request):
-    await get_admin_user(request)
-    total = await db.designers.count_documents({})
-    active = await db.designers.count_documents({"is_active": True})
-    
-    # حساب عدد المنتجات للمصممات
-    total_products = await db.products.count_documents({"type": "designer"})
-    
+    dashboard = await admin_dashboard(request)
+    designers = dashboard["designers"]
     return {
-        "total": total,
-        "active": active,
-        "total_products": total_products
+        "total": designers["total"],
+        "active": designers["active"],
+        # عدد منتجات المصممات
+        "total_products": dashboard["products"]["by_type"].get("designer", 0)
     }
 
 @api_router.get("/admin/products/stats")
 async def admin_get_products_stats(request: Request):
-    await get_admin_user(request)
-    total = await db.products.count_documents({})
-    jewelry = await db.products.count_documents({"type": "jewelry"})
-    designer = await db.products.count_documents({"type": "designer"})
-    gifts = await db.products.count_documents({"type": "gift"})
-    investment = await db.products.count_documents({"type": "investment_bar"})
-    active = await db.products.count_documents({"is_active": True})
-    
+    products = (await admin_dashboard(request))["products"]
+    by_type = products["by_type"]
     return {
-        "total": total,
-        "jewelry": jewelry,
-        "designer": designer,
-        "gifts": gifts,
-        "investment": investment,
-        "active": active,
-        "inactive": total - active
+        "total": products["total"],
+        "jewelry": by_type.get("jewelry", 0),
+        "designer": by_type.get("designer", 0),
+        "gifts": by_type.get("gift", 0),
+        "investment": by_type.get("investment_bar", 0),
+        "active": products["active"],
+        "inactive": products["total"] - products["active"]
     }
 
+# ==================== ADMIN SELLER SALES ====================
+
+@api_router.get("/admin/sales/{collection}")
+async def admin_get_seller_sales(request: Request, collection: str, sort: str = "revenue", limit: int = 50, top: int = 5):
+    """Merchants or designers ranked by sales, answered from seller_sales"""
+    await get_admin_user(request)
+    if collection not in SELLER_KINDS:
+        raise HTTPException(status_code=404, detail="غير موجود")
+    if sort not in SELLER_SALES_SORTS:
+        raise HTTPException(status_code=400, detail="ترتيب غير معروف")
+    kind, _ = SELLER_KINDS[collection]
+    docs = await db.seller_sales.find({"kind": kind}).sort(SELLER_SALES_SORTS[sort], DESCENDING).to_list(min(max(limit, 1), 200))
+    return [seller_sales_view(doc, top) for doc in docs]
+
+async def seller_sales_for(collection: str, doc_id: str, top: int, not_found: str) -> dict:
+    id_field = CATALOG_COLLECTIONS[collection]
+    seller = await db[collection].find_one({id_field: doc_id}, {"_id": 0, "name": 1})
+    if not seller:
+        raise HTTPException(status_code=404, detail=not_found)
+    kind, _ = SELLER_KINDS[collection]
+    doc = await db.seller_sales.find_one({"_id": f"{kind}:{seller['name']}"})
+    return {id_field: doc_id, **seller_sales_view(doc, top), "kind": kind, "name": seller["name"]}
+
+@api_router.get("/admin/shops/{shop_id}/sales")
+async def admin_get_shop_sales(request: Request, shop_id: str, top: int = 5):
+    await get_admin_user(request)
+    return await seller_sales_for("merchants", shop_id, top, "المحل غير موجود")
+
+@api_router.get("/admin/designers/{designer_id}/sales")
+async def admin_get_designer_sales(request: Request, designer_id: str, top: int = 5):
+    await get_admin_user(request)
+    return await seller_sales_for("designers", designer_id, top, "المصممة غير موجودة")
+
 # ==================== ADMIN SHOPS (MERCHANTS) ====================
 
 @api_router.get("/admin/shops")
-async def admin_get_shops(request: Request, search: Optional[str] = None, type: Optional[str] = None):
+async def admin_get_shops(request: Request, search: Optional[str] = None, type: Optional[str] = None,
+                          fields: Optional[str] = None):
     await get_admin_user(request)
     query = {}
     
+    ranked_ids = None
     if search:
-        query["name"] = {"$regex": search, "$options": "i"}
+        ranked_ids = await admin_search_ids(search, "merchants")
+        query["merchant_id"] = {"$in": ranked_ids}
     
     if type:
         query["type"] = type
     
-    shops = await db.merchants.find(query, {"_id": 0}).to_list(100)
-    return shops
+    projection = field_projection(parse_fields(fields, required=("merchant_id",)), {"_id": 0})
+    shops = await db.merchants.find(query, projection).to_list(100)
+    return in_rank_order(shops, "merchant_id", ranked_ids) if ranked_ids is not None else shops
 
 @api_router.get("/admin/shops/{shop_id}")
 async def admin_get_shop_by_id(request: Request, shop_id: str):
@@ -1568,13 +4196,17 @@ async def admin_get_shop_by_id(request: Request, shop_id: str):
 async def admin_create_shop(request: Request, shop_data: dict):
     await get_admin_user(request)
     
-    shop_doc = {
-        "merchant_id": f"merchant_{uuid.uuid4().hex[:8]}",
-        **shop_data,
-        "is_active": shop_data.get("isActive", True)
-    }
-    await db.merchants.insert_one(shop_doc)
+    async with change_seq_write() as change_seq:
+        shop_doc = {
+            "merchant_id": f"merchant_{uuid.uuid4().hex[:8]}",
+            **shop_data,
+            "is_active": shop_data.get("isActive", True),
+            "change_seq": change_seq
+        }
+        await db.merchants.insert_one(shop_doc)
+    await count_write("merchants", after=shop_doc)
     
+    await sync_catalog_doc("merchants", shop_doc["merchant_id"])
     return {"message": "تم إنشاء المحل بنجاح", "shop": {k: v for k, v in shop_doc.items() if k != "_id"}}
 
 @api_router.put("/admin/shops/{shop_id}")
@@ -1585,42 +4217,49 @@ async def admin_update_shop(request: Request, shop_id: str, shop_data: dict):
     if "isActive" in shop_data:
         shop_data["is_active"] = shop_data.pop("isActive")
     
-    result = await db.merchants.update_one(
-        {"merchant_id": shop_id},
-        {"$set": shop_data}
-    )
+    async with change_seq_write() as change_seq:
+        before = await db.merchants.find_one_and_update(
+            {"merchant_id": shop_id},
+            {"$set": {**shop_data, "change_seq": change_seq}},
+            projection={"_id": 0, "is_active": 1}
+        )
     
-    if result.matched_count == 0:
+    if before is None:
         raise HTTPException(status_code=404, detail="المحل غير موجود")
+    await count_write("merchants", before=before, after={**before, **shop_data})
     
+    await sync_catalog_doc("merchants", shop_id)
     return {"message": "تم تحديث المحل بنجاح"}
 
 @api_router.delete("/admin/shops/{shop_id}")
 async def admin_delete_shop(request: Request, shop_id: str):
     await get_admin_user(request)
     
-    result = await db.merchants.delete_one({"merchant_id": shop_id})
+    deleted = await db.merchants.find_one_and_delete({"merchant_id": shop_id}, {"_id": 0, "is_active": 1})
     
-    if result.deleted_count == 0:
+    if deleted is None:
         raise HTTPException(status_code=404, detail="المحل غير موجود")
+    await count_write("merchants", before=deleted)
     
+    await record_catalog_delete("merchants", shop_id)
+    await sync_catalog_doc("merchants", shop_id)
     return {"message": "تم حذف المحل بنجاح"}
 
 # ==================== ADMIN DESIGNERS ====================
 
 @api_router.get("/admin/designers")
-async def admin_get_designers(request: Request, search: Optional[str] = None):
+async def admin_get_designers(request: Request, search: Optional[str] = None, fields: Optional[str] = None):
     await get_admin_user(request)
     query = {}
     
+    ranked_ids = None
     if search:
-        query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"brand": {"$regex": search, "$options": "i"}}
-        ]
+        ranked_ids = await admin_search_ids(search, "designers")
+        query["designer_id"] = {"$in": ranked_ids}
     
-    designers = await db.designers.find(query, {"_id": 0}).to_list(100)
-    return designers
+    projection = field_projection(parse_fields(fields, required=("designer_id",)), {"_id": 0})
+    designers = await db.designers.find(query, projection).to_list(100)
+    return in_rank_order(designers, "designer_id", ranked_ids) if ranked_ids is not None else designers
 
 @api_router.get("/admin/designers/{designer_id}")
 async def admin_get_designer_by_id(request: Request, designer_id: str):
@@ -1636,13 +4275,17 @@ async def admin_get_designer_by_id(request: Request, designer_id: str):
 async def admin_create_designer(request: Request, designer_data: dict):
     await get_admin_user(request)
     
-    designer_doc = {
-        "designer_id": f"designer_{uuid.uuid4().hex[:8]}",
-        **designer_data,
-        "is_active": designer_data.get("isActive", True)
-    }
-    await db.designers.insert_one(designer_doc)
+    async with change_seq_write() as change_seq:
+        designer_doc = {
+            "designer_id": f"designer_{uuid.uuid4().hex[:8]}",
+            **designer_data,
+            "is_active": designer_data.get("isActive", True),
+            "change_seq": change_seq
+        }
+        await db.designers.insert_one(designer_doc)
+    await count_write("designers", after=designer_doc)
     
+    await sync_catalog_doc("designers", designer_doc["designer_id"])
     return {"message": "تم إنشاء المصممة بنجاح", "designer": {k: v for k, v in designer_doc.items() if k != "_id"}}
 
 @api_router.put("/admin/designers/{designer_id}")
@@ -1653,41 +4296,55 @@ async def admin_update_designer(request: Request, designer_id: str, designer_dat
     if "isActive" in designer_data:
         designer_data["is_active"] = designer_data.pop("isActive")
     
-    result = await db.designers.update_one(
-        {"designer_id": designer_id},
-        {"$set": designer_data}
-    )
+    async with change_seq_write() as change_seq:
+        before = await db.designers.find_one_and_update(
+            {"designer_id": designer_id},
+            {"$set": {**designer_data, "change_seq": change_seq}},
+            projection={"_id": 0, "is_active": 1}
+        )
     
-    if result.matched_count == 0:
+    if before is None:
         raise HTTPException(status_code=404, detail="المصممة غير موجودة")
+    await count_write("designers", before=before, after={**before, **designer_data})
     
+    await sync_catalog_doc("designers", designer_id)
     return {"message": "تم تحديث المصممة بنجاح"}
 
 @api_router.delete("/admin/designers/{designer_id}")
 async def admin_delete_designer(request: Request, designer_id: str):
     await get_admin_user(request)
     
-    result = await db.designers.delete_one({"designer_id": designer_id})
+    deleted = await db.designers.find_one_and_delete({"designer_id": designer_id}, {"_id": 0, "is_active": 1})
     
-    if result.deleted_count == 0:
+    if deleted is None:
         raise HTTPException(status_code=404, detail="المصممة غير موجودة")
+    await count_write("designers", before=deleted)
     
+    await record_catalog_delete("designers", designer_id)
+    await sync_catalog_doc("designers", designer_id)
     return {"message": "تم حذف المصممة بنجاح"}
 
 # ==================== ADMIN PRODUCTS MANAGEMENT ====================
 
-@api_router.get("/admin/products")
-async def admin_get_all_products(request: Request, search: Optional[str] = None, type: Optional[str] = None):
-    await get_admin_user(request)
+async def admin_products_query(search: Optional[str] = None, type: Optional[str] = None) -> dict:
     query = {}
     
     if search:
-        query["title"] = {"$regex": search, "$options": "i"}
+        # Paginated by product_id, so only the match set is used here, not the rank
+        query["product_id"] = {"$in": await admin_search_ids(search, "products")}
     
     if type:
         query["type"] = type
-    
-    products = await db.products.find(query, {"_id": 0}).to_list(200)
+    return query
+
+@api_router.get("/admin/products")
+async def admin_get_all_products(request: Request, response: Response, search: Optional[str] = None, type: Optional[str] = None,
+                                 limit: int = 200, cursor: Optional[str] = None, fields: Optional[str] = None):
+    await get_admin_user(request)
+    query = await admin_products_query(search, type)
+    projection = field_projection(parse_fields(fields, required=("product_id",)), {"_id": 0})
+    products, _ = await paginate(response, "products", query, projection,
+                                 "product_id", "product_id", limit, cursor, direction=ASCENDING)
     return products
 
 @api_router.get("/admin/products/{product_id}")
@@ -1700,6 +4357,106 @@ async def admin_get_product_by_id(request: Request, product_id: str):
     
     return product
 
+# ==================== ADMIN EXPORTS ====================
+
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+EXPORT_FORMATS = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+# collection -> (id field, hidden fields, default CSV columns)
+EXPORTS = {
+    "users": ("user_id", ("password_hash",), ("user_id", "name", "email", "role", "isBlocked", "created_at")),
+    "orders": ("order_id", (), ("order_id", "user_id", "status", "subtotal_qar", "discount_qar", "total_qar",
+                                "coupon_code", "payment_method", "delivery_address", "created_at", "items")),
+    "products": ("product_id", (), ("product_id", "type", "title", "category", "karat", "weight_grams", "price_qar",
+                                    "price_per_gram", "stock", "merchant_name", "designer_name", "is_active")),
+    "transactions": ("transaction_id", (), ("transaction_id", "user_id", "type", "grams", "price_qar", "status", "created_at")),
+}
+
+async def export_query(collection: str, search: Optional[str], role: Optional[str], type: Optional[str],
+                       user_id: Optional[str], status: Optional[str]) -> dict:
+    """Same filters as the matching admin list endpoint; orders and transactions filter by user and status/type"""
+    if collection == "users":
+        return admin_users_query(search, role)
+    if collection == "products":
+        return await admin_products_query(search, type)
+    query = {"user_id": user_id} if user_id else {}
+    if collection == "orders" and status:
+        query["status"] = status
+    if collection == "transactions" and type:
+        query["type"] = type
+    return query
+
+def export_cell(doc: dict, path: str):
+    value = doc
+    for key in path.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return orjson.dumps(value, default=str).decode()
+    return value
+
+async def export_chunks(cursor, export_format: str, columns: tuple, compressed: bool):
+    """Encode the cursor one batch at a time, so memory stays flat however many rows are exported"""
+    # wbits=31 writes a gzip container rather than a raw zlib stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compressed else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    batch = []
+    if export_format == "csv":
+        # BOM so spreadsheet apps open the Arabic text as UTF-8
+        buffer.write("\ufeff")
+        writer.writerow(columns)
+
+    def encode() -> bytes:
+        if export_format == "csv":
+            writer.writerows([export_cell(doc, column) for column in columns] for doc in batch)
+            chunk = buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        else:
+            chunk = b"".join(orjson.dumps(doc, default=str) + b"\n" for doc in batch)
+        batch.clear()
+        return compressor.compress(chunk) if compressor else chunk
+
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            chunk = encode()
+            if chunk:
+                yield chunk
+    chunk = encode()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
+
+@api_router.get("/admin/export/{collection}")
+async def admin_export(request: Request, collection: str, export_format: str = Query("csv", alias="format"),
+                       compressed: bool = Query(False, alias="gzip"), fields: Optional[str] = None,
+                       search: Optional[str] = None, role: Optional[str] = None, type: Optional[str] = None,
+                       user_id: Optional[str] = None, status: Optional[str] = None):
+    """Full export as CSV or NDJSON, streamed from a Motor cursor in EXPORT_BATCH_SIZE batches"""
+    await get_admin_user(request)
+    if collection not in EXPORTS:
+        raise HTTPException(status_code=404, detail="غير موجود")
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="صيغة غير مدعومة")
+    id_field, hidden, default_columns = EXPORTS[collection]
+    selected = parse_fields(fields, required=(id_field,), hidden=hidden)
+    projection = field_projection(selected, {"_id": 0, **{field: 0 for field in hidden}})
+    columns = tuple(selected or default_columns)
+
+    query = await export_query(collection, search, role, type, user_id, status)
+    # _id order streams straight off the _id index without a blocking sort
+    cursor = db[collection].find(query, projection).sort("_id", ASCENDING).batch_size(EXPORT_BATCH_SIZE)
+
+    filename = f"{collection}-{datetime.now(timezone.utc):%Y%m%d}.{export_format}" + (".gz" if compressed else "")
+    return StreamingResponse(
+        export_chunks(cursor, export_format, columns, compressed),
+        media_type="application/gzip" if compressed else EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"', "Cache-Control": "no-store"},
+    )
+
 # ==================== GIFTS MANAGEMENT ====================
 
 @api_router.post("/gifts/send")
@@ -1777,6 +4534,7 @@ async def create_gift_voucher(request: Request, voucher: GiftVoucherCreate):
     }
     
     await db.gift_vouchers.insert_one(voucher_doc)
+    await record_rollup(voucher_doc["created_at"], vouchers_issued=1)
     
     # Create notification for sender
     notification = {
@@ -1805,18 +4563,34 @@ async def create_gift_voucher(request: Request, voucher: GiftVoucherCreate):
     }
 
 @api_router.get("/gifts/vouchers/sent")
-async def get_sent_vouchers(request: Request):
+async def get_sent_vouchers(request: Request, response: Response, limit: int = 50, cursor: Optional[str] = None):
     """الحصول على القسائم المرسلة من المستخدم"""
     user = await get_current_user(request)
-    vouchers = await db.gift_vouchers.find(
-        {"sender_id": user["user_id"]},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(50)
+    vouchers, _ = await paginate(response, "gift_vouchers", {"sender_id": user["user_id"]}, {"_id": 0},
+                                 "created_at", "voucher_id", limit, cursor)
     return vouchers
 
+def voucher_status(voucher: dict) -> str:
+    """Status as clients see it: active vouchers past expires_at read as expired"""
+    if voucher["status"] == "active" and datetime.now(timezone.utc) > datetime.fromisoformat(voucher["expires_at"]):
+        return "expired"
+    return voucher["status"]
+
 @api_router.get("/gifts/voucher/{voucher_code}")
-async def get_voucher_by_code(voucher_code: str):
+async def get_voucher_by_code(request: Request, voucher_code: str):
     """الحصول على تفاصيل القسيمة بالكود"""
+    # Status is the only field that changes after creation, so it versions the voucher
+    if request.headers.get("if-none-match"):
+        # Covered by the (voucher_code, status, expires_at) index: no document fetch
+        state = await db.gift_vouchers.find_one(
+            {"voucher_code": voucher_code},
+            {"_id": 0, "voucher_code": 1, "status": 1, "expires_at": 1}
+        )
+        if state:
+            unchanged = not_modified(request, make_etag("voucher", voucher_code, voucher_status(state)), "voucher")
+            if unchanged:
+                return unchanged
+
     voucher = await db.gift_vouchers.find_one(
         {"voucher_code": voucher_code},
         {"_id": 0}
@@ -1826,15 +4600,16 @@ async def get_voucher_by_code(voucher_code: str):
         raise HTTPException(status_code=404, detail="القسيمة غير موجودة")
     
     # Check if expired
-    expires_at = datetime.fromisoformat(voucher["expires_at"])
-    if datetime.now(timezone.utc) > expires_at and voucher["status"] == "active":
+    if voucher_status(voucher) != voucher["status"]:
         await db.gift_vouchers.update_one(
             {"voucher_code": voucher_code},
             {"$set": {"status": "expired"}}
         )
         voucher["status"] = "expired"
     
-    return voucher
+    response = fast_response(voucher)
+    response.headers.update(validator_headers(make_etag("voucher", voucher_code, voucher["status"]), "voucher"))
+    return response
 
 @api_router.post("/gifts/voucher/{voucher_code}/redeem")
 async def redeem_voucher(request: Request, voucher_code: str):
@@ -2030,6 +4805,12 @@ async def root():
 async def health():
     return {"status": "healthy"}
 
+@api_router.get("/ready")
+async def ready(response: Response):
+    if not startup_complete:
+        response.status_code = 503
+    return {"status": "ready" if startup_complete else "warming_up", "steps": startup_steps}
+
 # Include router
 app.include_router(api_router)
 
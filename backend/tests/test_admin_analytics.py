@@ -0,0 +1,200 @@
+"""
+Admin analytics tests - زينة وخزينة
+- GET /api/admin/dashboard - Materialized dashboard counters
+- GET /api/admin/stats and /admin/*/stats - Served from the same counters
+- GET /api/admin/analytics - Hourly/daily rollups
+- POST /api/admin/analytics/backfill - Rebuild rollups from the source collections
+- GET /api/admin/sales/{merchants|designers}, /admin/shops/{id}/sales, /admin/designers/{id}/sales - Seller sales
+- GET /api/admin/users/{id}/overview - 360° user view (latency: benchmarks/bench_user_overview.py)
+"""
+
+import pytest
+import requests
+import os
+import uuid
+from datetime import datetime, timezone, timedelta
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+@pytest.fixture(scope="module")
+def admin_headers():
+    response = requests.post(
+        f"{BASE_URL}/api/auth/login",
+        json={"email": "eng.mohamed87@live.com", "password": "Realmadridclub2011"}
+    )
+    if response.status_code != 200:
+        pytest.skip("Could not authenticate")
+    return {"Authorization": f"Bearer {response.json().get('token')}"}
+
+
+class TestDashboardCounters:
+    """Counters follow writes without a recount"""
+
+    def dashboard(self, headers):
+        response = requests.get(f"{BASE_URL}/api/admin/dashboard", headers=headers)
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    def test_dashboard_requires_admin(self):
+        response = requests.get(f"{BASE_URL}/api/admin/dashboard")
+        assert response.status_code == 401
+
+    def test_dashboard_sections(self, admin_headers):
+        data = self.dashboard(admin_headers)
+        for section in ("users", "orders", "products", "merchants", "designers"):
+            assert data[section]["total"] >= 0
+        assert data["users"]["by_role"].get("admin", 0) >= 1
+        assert data["products"]["active"] <= data["products"]["total"]
+        assert data["reconciled_at"]
+        print(f"✓ Dashboard: {data['users']['total']} users, {data['orders']['total']} orders")
+
+    def test_register_increments_users(self, admin_headers):
+        before = self.dashboard(admin_headers)["users"]
+        response = requests.post(f"{BASE_URL}/api/auth/register", json={
+            "name": "Counter Test",
+            "email": f"counter_{uuid.uuid4().hex[:8]}@example.com",
+            "password": "counter12345"
+        })
+        assert response.status_code == 200
+        after = self.dashboard(admin_headers)["users"]
+        assert after["total"] == before["total"] + 1
+        assert after["by_role"]["user"] == before["by_role"].get("user", 0) + 1
+
+    def test_product_type_change_moves_counter(self, admin_headers):
+        product = {"type": "jewelry", "title": "TEST_عداد", "description": "منتج اختبار", "price_qar": 100,
+                   "image_url": "https://example.com/a.jpg"}
+        created = requests.post(f"{BASE_URL}/api/admin/products", json=product, headers=admin_headers).json()["product"]
+        before = self.dashboard(admin_headers)["products"]
+
+        requests.put(f"{BASE_URL}/api/admin/products/{created['product_id']}",
+                     json={**product, "type": "gift"}, headers=admin_headers)
+        moved = self.dashboard(admin_headers)["products"]
+        assert moved["by_type"]["jewelry"] == before["by_type"]["jewelry"] - 1
+        assert moved["by_type"]["gift"] == before["by_type"].get("gift", 0) + 1
+
+        requests.delete(f"{BASE_URL}/api/admin/products/{created['product_id']}", headers=admin_headers)
+        deleted = self.dashboard(admin_headers)["products"]
+        assert deleted["active"] == before["active"] - 1
+        assert deleted["total"] == before["total"]
+
+    def test_legacy_stats_match_dashboard(self, admin_headers):
+        data = self.dashboard(admin_headers)
+        stats = requests.get(f"{BASE_URL}/api/admin/stats", headers=admin_headers).json()
+        assert stats["users_count"] == data["users"]["total"]
+        assert stats["total_revenue_qar"] == data["orders"]["revenue_qar"]
+        shops = requests.get(f"{BASE_URL}/api/admin/shops/stats", headers=admin_headers).json()
+        assert shops["active"] + shops["inactive"] == data["merchants"]["total"]
+
+
+class TestAnalyticsRollups:
+    """Time-bucketed metrics read from the rollup collections"""
+
+    def analytics(self, headers, **params):
+        response = requests.get(f"{BASE_URL}/api/admin/analytics", params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    def test_daily_series_has_every_bucket(self, admin_headers):
+        today = datetime.now(timezone.utc).date()
+        data = self.analytics(admin_headers, metric="new_users", interval="day",
+                              **{"from": (today - timedelta(days=6)).isoformat(), "to": today.isoformat()})
+        assert len(data["points"]) == 7
+        assert data["total"] == sum(p["value"] for p in data["points"])
+
+    def test_signup_lands_in_current_hour(self, admin_headers):
+        now = datetime.now(timezone.utc)
+        params = {"metric": "new_users", "interval": "hour", "from": (now - timedelta(hours=1)).isoformat()}
+        before = self.analytics(admin_headers, **params)["points"][-1]["value"]
+        requests.post(f"{BASE_URL}/api/auth/register", json={
+            "name": "Rollup Test",
+            "email": f"rollup_{uuid.uuid4().hex[:8]}@example.com",
+            "password": "rollup12345"
+        })
+        after = self.analytics(admin_headers, **params)["points"][-1]["value"]
+        assert after == before + 1
+
+    def test_backfill_matches_incremental(self, admin_headers):
+        params = {"metric": "orders", "interval": "day"}
+        before = self.analytics(admin_headers, **params)
+        response = requests.post(f"{BASE_URL}/api/admin/analytics/backfill", headers=admin_headers)
+        assert response.status_code == 200
+        assert self.analytics(admin_headers, **params)["total"] == before["total"]
+
+    def test_invalid_parameters_rejected(self, admin_headers):
+        for params in ({"metric": "profit"}, {"metric": "orders", "interval": "week"},
+                       {"metric": "orders", "from": "yesterday"}):
+            response = requests.get(f"{BASE_URL}/api/admin/analytics", params=params, headers=admin_headers)
+            assert response.status_code == 400
+
+
+class TestSellerSales:
+    """Per-merchant and per-designer sales from seller_sales"""
+
+    def place_order(self, headers, product):
+        requests.delete(f"{BASE_URL}/api/cart/clear", headers=headers)
+        requests.post(f"{BASE_URL}/api/cart/add", json={"product_id": product["product_id"], "quantity": 2}, headers=headers)
+        response = requests.post(f"{BASE_URL}/api/orders", json={"items": []}, headers=headers)
+        assert response.status_code == 200, response.text
+        return response.json()["order"]
+
+    def shop_sales(self, headers, merchant_name):
+        shops = requests.get(f"{BASE_URL}/api/admin/shops", params={"search": merchant_name}, headers=headers).json()
+        shop = next((s for s in shops if s["name"] == merchant_name), None)
+        if not shop:
+            pytest.skip("No merchant document for this product")
+        response = requests.get(f"{BASE_URL}/api/admin/shops/{shop['merchant_id']}/sales", headers=headers)
+        assert response.status_code == 200
+        return response.json()
+
+    def test_order_and_cancel_update_merchant_sales(self, admin_headers):
+        products = requests.get(f"{BASE_URL}/api/products", params={"type": "jewelry", "limit": 50}).json()
+        product = next(p for p in products if p.get("merchant_name"))
+        before = self.shop_sales(admin_headers, product["merchant_name"])
+
+        order = self.place_order(admin_headers, product)
+        placed = self.shop_sales(admin_headers, product["merchant_name"])
+        assert placed["units"] == before["units"] + 2
+        assert placed["orders"] == before["orders"] + 1
+
+        requests.put(f"{BASE_URL}/api/admin/orders/{order['order_id']}/status", params={"status": "cancelled"},
+                     headers=admin_headers)
+        cancelled = self.shop_sales(admin_headers, product["merchant_name"])
+        assert cancelled["units"] == before["units"]
+        assert cancelled["by_status"]["cancelled"] == before["by_status"].get("cancelled", 0) + 1
+
+    def test_ranking_sorted(self, admin_headers):
+        response = requests.get(f"{BASE_URL}/api/admin/sales/designers", params={"sort": "units"}, headers=admin_headers)
+        assert response.status_code == 200
+        units = [d["units"] for d in response.json()]
+        assert units == sorted(units, reverse=True)
+
+    def test_unknown_collection(self, admin_headers):
+        response = requests.get(f"{BASE_URL}/api/admin/sales/products", headers=admin_headers)
+        assert response.status_code == 404
+
+
+class TestUserOverview:
+    """GET /api/admin/users/{id}/overview assembles the 360° view"""
+
+    @pytest.fixture(scope="class")
+    def user_id(self, admin_headers):
+        response = requests.get(f"{BASE_URL}/api/auth/me", headers=admin_headers)
+        assert response.status_code == 200
+        return response.json()["user_id"]
+
+    def test_overview_sections(self, admin_headers, user_id):
+        response = requests.get(f"{BASE_URL}/api/admin/users/{user_id}/overview", headers=admin_headers)
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data["profile"]["user_id"] == user_id
+        assert "password_hash" not in data["profile"]
+        for section in ("wallet", "orders", "transactions", "price_alerts", "vouchers"):
+            assert section in data
+        created = [o["created_at"] for o in data["orders"]["recent"]]
+        assert created == sorted(created, reverse=True)
+        assert data["orders"]["count"] >= len(created)
+
+    def test_unknown_user(self, admin_headers):
+        response = requests.get(f"{BASE_URL}/api/admin/users/user_missing/overview", headers=admin_headers)
+        assert response.status_code == 404
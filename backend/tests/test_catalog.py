@@ -0,0 +1,312 @@
+"""
+Catalog read path tests - زينة وخزينة
+- GET /api/products - Snapshot-backed listing with keyset pagination, sorts, range filters and sparse fields
+- GET /api/catalog/version - Snapshot version
+- GET /api/search - Arabic-aware ranked search
+- GET /api/autocomplete - Prefix suggestions
+- GET /api/products/facets - Sidebar counts
+- Accept: application/msgpack - MessagePack negotiation
+- Accept-Encoding: br/gzip - Response compression
+- If-None-Match - Conditional GET with ETags
+- Static snapshots - Pre-rendered public responses
+"""
+
+import pytest
+import requests
+import os
+import msgpack
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+
+class TestProductPagination:
+    """Keyset pagination over /api/products"""
+
+    def test_pages_cover_listing_without_duplicates(self):
+        full = requests.get(f"{BASE_URL}/api/products", params={"limit": 500}).json()
+
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 5}
+            if cursor:
+                params["cursor"] = cursor
+            response = requests.get(f"{BASE_URL}/api/products", params=params)
+            assert response.status_code == 200
+            seen += [p["product_id"] for p in response.json()]
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+
+        assert seen == [p["product_id"] for p in full]
+        print(f"✓ Walked {len(seen)} products in pages of 5")
+
+    def test_invalid_cursor_rejected(self):
+        response = requests.get(f"{BASE_URL}/api/products", params={"cursor": "not-a-cursor"})
+        assert response.status_code == 400
+
+    def test_catalog_version_header(self):
+        response = requests.get(f"{BASE_URL}/api/products")
+        version = requests.get(f"{BASE_URL}/api/catalog/version").json()
+        assert version["loaded"] is True
+        assert int(response.headers["X-Catalog-Version"]) <= version["version"]
+
+
+class TestProductSortAndRanges:
+    """Server-side sort orders and range filters"""
+
+    def walk(self, **params):
+        products = []
+        cursor = None
+        while True:
+            query = {**params, "limit": 4}
+            if cursor:
+                query["cursor"] = cursor
+            response = requests.get(f"{BASE_URL}/api/products", params=query)
+            assert response.status_code == 200, response.text
+            products += response.json()
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                return products
+
+    def test_price_desc_sorted_across_pages(self):
+        prices = [p["price_qar"] for p in self.walk(sort="price_desc")]
+        assert prices == sorted(prices, reverse=True)
+
+    def test_price_per_gram_sort(self):
+        values = [p["price_per_gram"] for p in self.walk(sort="price_per_gram_asc") if p.get("price_per_gram") is not None]
+        assert values == sorted(values)
+
+    def test_newest_sorted_by_created_at(self):
+        created = [p.get("created_at") for p in self.walk(sort="newest")]
+        assert created and all(created)
+        assert created == sorted(created, reverse=True)
+
+    def test_range_filters(self):
+        products = self.walk(min_price=2000, max_price=6000, min_karat=21)
+        assert products
+        assert all(2000 <= p["price_qar"] <= 6000 and p["karat"] >= 21 for p in products)
+
+    def test_sort_with_type_filter(self):
+        products = self.walk(sort="weight_asc", type="investment_bar")
+        assert all(p["type"] == "investment_bar" for p in products)
+        weights = [p["weight_grams"] for p in products]
+        assert weights == sorted(weights)
+
+    def test_unknown_sort_rejected(self):
+        response = requests.get(f"{BASE_URL}/api/products", params={"sort": "random"})
+        assert response.status_code == 400
+
+
+class TestSparseFields:
+    """fields= trims listing documents to the requested fields"""
+
+    def test_products_fields(self):
+        response = requests.get(f"{BASE_URL}/api/products", params={"fields": "title,price_qar", "limit": 10})
+        assert response.status_code == 200
+        products = response.json()
+        assert products
+        assert all(set(p) <= {"product_id", "title", "price_qar"} and "product_id" in p for p in products)
+
+    def test_fields_keep_pagination_working(self):
+        response = requests.get(f"{BASE_URL}/api/products", params={"fields": "title", "limit": 2, "sort": "price_asc"})
+        cursor = response.headers.get("X-Next-Cursor")
+        assert cursor
+        next_page = requests.get(f"{BASE_URL}/api/products", params={"fields": "title", "limit": 2, "sort": "price_asc", "cursor": cursor})
+        assert next_page.status_code == 200
+        assert {p["product_id"] for p in next_page.json()}.isdisjoint(p["product_id"] for p in response.json())
+
+    def test_invalid_field_name_rejected(self):
+        response = requests.get(f"{BASE_URL}/api/products", params={"fields": "$where"})
+        assert response.status_code == 400
+
+
+class TestMessagePack:
+    """Accept: application/msgpack returns the same documents as JSON"""
+
+    def test_products_msgpack_matches_json(self):
+        as_json = requests.get(f"{BASE_URL}/api/products", params={"limit": 20}).json()
+        response = requests.get(f"{BASE_URL}/api/products", params={"limit": 20}, headers={"Accept": "application/msgpack"})
+        assert response.status_code == 200
+        assert response.headers["Content-Type"].startswith("application/msgpack")
+        assert msgpack.unpackb(response.content) == as_json
+
+    def test_errors_negotiated_too(self):
+        response = requests.get(f"{BASE_URL}/api/products/missing", headers={"Accept": "application/msgpack"})
+        assert response.status_code == 404
+        assert "detail" in msgpack.unpackb(response.content)
+
+    def test_json_preferred_by_quality(self):
+        response = requests.get(f"{BASE_URL}/api/merchants", headers={"Accept": "application/json, application/msgpack;q=0.5"})
+        assert response.headers["Content-Type"].startswith("application/json")
+
+
+class TestCompression:
+    """gzip/brotli negotiation with a size threshold"""
+
+    def test_product_list_compressed(self):
+        for encoding in ("gzip", "br"):
+            response = requests.get(f"{BASE_URL}/api/products", headers={"Accept-Encoding": encoding}, stream=True)
+            assert response.headers.get("Content-Encoding") == encoding
+            assert "Accept-Encoding" in response.headers.get("Vary", "")
+
+    def test_small_response_not_compressed(self):
+        response = requests.get(f"{BASE_URL}/api/health", headers={"Accept-Encoding": "gzip"})
+        assert "Content-Encoding" not in response.headers
+        assert "Accept-Encoding" in response.headers.get("Vary", "")
+
+    def test_identity_when_not_accepted(self):
+        response = requests.get(f"{BASE_URL}/api/products", headers={"Accept-Encoding": "identity"})
+        assert "Content-Encoding" not in response.headers
+        assert "Accept-Encoding" in response.headers.get("Vary", "")
+        assert response.json()
+
+
+class TestConditionalGet:
+    """ETag / If-None-Match on public catalog reads"""
+
+    def revalidate(self, path, **params):
+        response = requests.get(f"{BASE_URL}{path}", params=params)
+        assert response.status_code == 200
+        etag = response.headers.get("ETag")
+        assert etag and response.headers.get("Cache-Control")
+        return requests.get(f"{BASE_URL}{path}", params=params, headers={"If-None-Match": etag})
+
+    def test_listing_304(self):
+        assert self.revalidate("/api/products", limit=10).status_code == 304
+
+    def test_product_304(self):
+        product = requests.get(f"{BASE_URL}/api/products", params={"limit": 1}).json()[0]
+        assert self.revalidate(f"/api/products/{product['product_id']}").status_code == 304
+
+    def test_merchants_and_designers_304(self):
+        assert self.revalidate("/api/merchants").status_code == 304
+        assert self.revalidate("/api/designers").status_code == 304
+
+    def test_etag_differs_per_query(self):
+        first = requests.get(f"{BASE_URL}/api/products", params={"limit": 1}).headers["ETag"]
+        second = requests.get(f"{BASE_URL}/api/products", params={"limit": 2}).headers["ETag"]
+        assert first != second
+
+    def test_stale_etag_gets_full_body(self):
+        response = requests.get(f"{BASE_URL}/api/merchants", headers={"If-None-Match": 'W/"stale"'})
+        assert response.status_code == 200
+        assert isinstance(response.json(), list)
+
+
+class TestStaticSnapshots:
+    """Pre-rendered public responses match the live handlers"""
+
+    @pytest.mark.parametrize("path,params", [
+        ("/api/merchants", {}),
+        ("/api/designers", {}),
+        ("/api/gold-prices", {}),
+        ("/api/products", {"type": "jewelry"}),
+    ])
+    def test_snapshot_matches_live_handler(self, path, params):
+        served = requests.get(f"{BASE_URL}{path}", params=params)
+        live = requests.get(f"{BASE_URL}{path}", params=params, headers={"X-Snapshot-Render": "1"})
+        assert served.status_code == live.status_code == 200
+        assert served.headers.get("ETag") == live.headers.get("ETag")
+        assert served.json() == live.json()
+        assert served.headers.get("Content-Length")
+
+
+class TestSearch:
+    """Arabic normalization and BM25 ranking"""
+
+    def search(self, q):
+        response = requests.get(f"{BASE_URL}/api/search", params={"q": q})
+        assert response.status_code == 200
+        return response.json()
+
+    def test_ta_marbuta_folding(self):
+        # "سبيكه" must match "سبيكة"
+        titles = [p["title"] for p in self.search("سبيكه")["products"]]
+        assert titles and all("سبيكة" in t for t in titles)
+
+    def test_definite_article_and_diacritics(self):
+        plain = [p["product_id"] for p in self.search("خاتم")["products"]]
+        decorated = [p["product_id"] for p in self.search("الخَاتَم")["products"]]
+        assert plain and plain == decorated
+
+    def test_bilingual_brand_search(self):
+        latin = self.search("Clair De Lune")["designers"]
+        arabic = self.search("كلير دي لون")["designers"]
+        assert latin and arabic
+        assert latin[0]["designer_id"] == arabic[0]["designer_id"]
+
+    def test_results_ranked_by_score(self):
+        products = self.search("ذهب")["products"]
+        scores = [p["score"] for p in products]
+        assert scores == sorted(scores, reverse=True)
+
+    def test_search_requires_query(self):
+        response = requests.get(f"{BASE_URL}/api/search")
+        assert response.status_code == 422
+
+    def test_admin_search_requires_every_term(self):
+        login = requests.post(f"{BASE_URL}/api/auth/login",
+                              json={"email": "eng.mohamed87@live.com", "password": "Realmadridclub2011"})
+        if login.status_code != 200:
+            pytest.skip("Could not authenticate")
+        headers = {"Authorization": f"Bearer {login.json().get('token')}"}
+
+        def admin_designers(search):
+            response = requests.get(f"{BASE_URL}/api/admin/designers", params={"search": search}, headers=headers)
+            assert response.status_code == 200
+            return response.json()
+
+        # A filter narrows as terms are added; it never falls back to any-term matches
+        assert admin_designers("Clair zzqx") == []
+        ranked = self.search("Clair De Lune")["designers"]
+        assert admin_designers("Clair De Lune")[0]["designer_id"] == ranked[0]["designer_id"]
+
+
+class TestAutocomplete:
+    """Typeahead over product titles, designer brands and merchant names"""
+
+    def suggest(self, q, **params):
+        response = requests.get(f"{BASE_URL}/api/autocomplete", params={"q": q, **params})
+        assert response.status_code == 200
+        return response.json()
+
+    def test_arabic_prefix(self):
+        suggestions = self.suggest("خا")
+        assert suggestions and all(s["text"].startswith("خا") for s in suggestions if s["type"] == "product")
+
+    def test_latin_prefix_matches_bilingual_brand(self):
+        suggestions = self.suggest("clai")
+        assert any(s["type"] == "designer" and "Clair De Lune" in s["text"] for s in suggestions)
+
+    def test_inner_word_prefix(self):
+        # "الدوحة" is the second word of "مجوهرات الدوحة"
+        suggestions = self.suggest("الدوح")
+        assert any(s["type"] == "merchant" for s in suggestions)
+
+    def test_limit_respected(self):
+        assert len(self.suggest("م", limit=3)) <= 3
+
+
+class TestFacets:
+    """Facet counts agree with the product listing"""
+
+    def test_facets_match_listing(self):
+        products = requests.get(f"{BASE_URL}/api/products", params={"limit": 500}).json()
+        response = requests.get(f"{BASE_URL}/api/products/facets")
+        assert response.status_code == 200
+        facets = response.json()
+
+        assert facets["total"] == len(products)
+        assert sum(f["count"] for f in facets["price"]) == len(products)
+        type_counts = {f["value"]: f["count"] for f in facets["type"]}
+        for product_type, count in type_counts.items():
+            assert count == sum(1 for p in products if p["type"] == product_type)
+
+    def test_facets_respect_filter(self):
+        facets = requests.get(f"{BASE_URL}/api/products/facets", params={"type": "jewelry"}).json()
+        assert [f["value"] for f in facets["type"]] in ([], ["jewelry"])
+
+    def test_facets_carry_catalog_version(self):
+        response = requests.get(f"{BASE_URL}/api/products/facets")
+        assert response.json()["version"] == int(response.headers["X-Catalog-Version"])
@@ -0,0 +1,51 @@
+"""
+In-process catalog snapshot tests - زينة وخزينة
+- GET /api/products - Keyset pagination after a reload that returns documents in another order
+"""
+
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import server  # noqa: E402
+
+
+def product(i):
+    return {"product_id": f"prod_{i:02d}", "type": "jewelry", "title": f"خاتم {i}", "price_qar": 1000 + i,
+            "weight_grams": 5, "karat": 21, "is_active": True}
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    snapshot = server.CatalogSnapshot()
+    snapshot.loaded = True
+    monkeypatch.setattr(server, "catalog", snapshot)
+    monkeypatch.setattr(server.static_snapshots, "manifest", {})
+    server.body_cache.invalidate()
+    return snapshot
+
+
+class TestReloadOrder:
+    """The unsorted listing stays in position order across reloads"""
+
+    def walk(self, client):
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+            response = client.get("/api/products", params=params)
+            assert response.status_code == 200, response.text
+            seen += [p["product_id"] for p in response.json()]
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                return seen
+
+    def test_pagination_after_reversed_reload(self, catalog):
+        catalog.load("products", [product(i) for i in range(10)])
+        catalog.load("products", [{**product(i), "price_qar": 2000 + i} for i in reversed(range(10))])
+
+        seen = self.walk(TestClient(server.app))
+        assert seen == [f"prod_{i:02d}" for i in range(10)]
@@ -0,0 +1,93 @@
+"""
+Client sync tests - زينة وخزينة
+- GET /api/bootstrap - Home-screen sections in one round trip
+- GET /api/bootstrap?known= - Unchanged sections skipped by version
+- GET /api/sync?since= - Catalog and price deltas by change sequence
+"""
+
+import pytest
+import requests
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+ADMIN_CREDENTIALS = {"email": "eng.mohamed87@live.com", "password": "Realmadridclub2011"}
+
+
+class TestBootstrap:
+    """Single-call home screen payload"""
+
+    @pytest.fixture(scope="class")
+    def admin_session(self):
+        session = requests.Session()
+        response = session.post(f"{BASE_URL}/api/auth/login", json=ADMIN_CREDENTIALS)
+        assert response.status_code == 200, f"Login failed: {response.text}"
+        session.headers.update({"Authorization": f"Bearer {response.json()['token']}"})
+        return session
+
+    def test_anonymous_bootstrap_has_public_sections(self):
+        response = requests.get(f"{BASE_URL}/api/bootstrap")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["authenticated"] is False
+        assert set(data["sections"]) == {"gold_prices", "products", "merchants", "designers"}
+        assert data["sections"]["merchants"]["data"] == requests.get(f"{BASE_URL}/api/merchants").json()
+        print(f"✓ Bootstrap sections: {list(data['sections'])}")
+
+    def test_authenticated_bootstrap_matches_individual_endpoints(self, admin_session):
+        sections = admin_session.get(f"{BASE_URL}/api/bootstrap").json()["sections"]
+        assert sections["user"]["data"] == admin_session.get(f"{BASE_URL}/api/auth/me").json()
+        assert sections["wallet"]["data"] == admin_session.get(f"{BASE_URL}/api/wallet").json()
+        assert "unread_count" in sections["notifications"]["data"]
+
+    def test_known_versions_skip_unchanged_sections(self):
+        first = requests.get(f"{BASE_URL}/api/bootstrap").json()["sections"]
+        known = ",".join(f"{name}:{section['version']}" for name, section in first.items())
+
+        second = requests.get(f"{BASE_URL}/api/bootstrap", params={"known": known}).json()["sections"]
+        assert second["merchants"] == {"version": first["merchants"]["version"], "unchanged": True}
+        assert "data" not in second["designers"]
+
+    def test_payload_is_gzipped(self):
+        response = requests.get(f"{BASE_URL}/api/bootstrap", headers={"Accept-Encoding": "gzip"})
+        assert response.headers.get("Content-Encoding") == "gzip"
+
+
+class TestDeltaSync:
+    """Change-sequence driven catalog deltas"""
+
+    @pytest.fixture(scope="class")
+    def admin_session(self):
+        session = requests.Session()
+        response = session.post(f"{BASE_URL}/api/auth/login", json=ADMIN_CREDENTIALS)
+        assert response.status_code == 200, f"Login failed: {response.text}"
+        session.headers.update({"Authorization": f"Bearer {response.json()['token']}"})
+        return session
+
+    def test_full_sync_matches_listings(self):
+        data = requests.get(f"{BASE_URL}/api/sync").json()
+        assert data["full"] is True
+        merchants = requests.get(f"{BASE_URL}/api/merchants").json()
+        assert {m["merchant_id"] for m in data["merchants"]["upserted"]} == {m["merchant_id"] for m in merchants}
+        print(f"✓ Full sync at version {data['version']}")
+
+    def test_delta_contains_only_changes(self, admin_session):
+        version = requests.get(f"{BASE_URL}/api/sync").json()["version"]
+
+        response = admin_session.post(f"{BASE_URL}/api/admin/designers", json={"name": "TEST مصممة", "brand": "TEST"})
+        assert response.status_code == 200
+        designer_id = response.json()["designer"]["designer_id"]
+
+        delta = requests.get(f"{BASE_URL}/api/sync", params={"since": version}).json()
+        assert delta["full"] is False
+        assert [d["designer_id"] for d in delta["designers"]["upserted"]] == [designer_id]
+
+        admin_session.delete(f"{BASE_URL}/api/admin/designers/{designer_id}")
+        delta = requests.get(f"{BASE_URL}/api/sync", params={"since": delta["version"]}).json()
+        assert designer_id in delta["designers"]["deleted"]
+        print(f"✓ Delta sync reported create and delete of {designer_id}")
+
+    def test_unchanged_version_returns_empty_delta(self):
+        version = requests.get(f"{BASE_URL}/api/sync").json()["version"]
+        delta = requests.get(f"{BASE_URL}/api/sync", params={"since": version}).json()
+        assert delta["merchants"] == {"upserted": [], "deleted": []}
@@ -0,0 +1,119 @@
+"""
+Coupon engine tests - زينة وخزينة
+- POST /api/admin/coupons - Create coupon (percentage / fixed, scoped rules)
+- GET /api/cart?coupon_code= - Price discount on the cart
+- POST /api/orders - Coupon applied and usage cap enforced, priced like the cart
+"""
+
+import pytest
+import requests
+import os
+import uuid
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+
+ADMIN_CREDENTIALS = {"email": "eng.mohamed87@live.com", "password": "Realmadridclub2011"}
+TEST_USER = {"email": "test@example.com", "password": "test12345"}
+
+
+def login_session(credentials, name="Test User"):
+    session = requests.Session()
+    response = session.post(f"{BASE_URL}/api/auth/login", json=credentials)
+    if response.status_code != 200:
+        session.post(f"{BASE_URL}/api/auth/register", json={"name": name, **credentials})
+        response = session.post(f"{BASE_URL}/api/auth/login", json=credentials)
+    assert response.status_code == 200, f"Login failed: {response.text}"
+    session.headers.update({"Authorization": f"Bearer {response.json()['token']}"})
+    return session
+
+
+class TestCoupons:
+    """Coupon creation, cart pricing and usage caps"""
+
+    @pytest.fixture(scope="class")
+    def admin_session(self):
+        return login_session(ADMIN_CREDENTIALS, "Admin")
+
+    @pytest.fixture(scope="class")
+    def user_session(self):
+        return login_session(TEST_USER)
+
+    @pytest.fixture(scope="class")
+    def product(self):
+        response = requests.get(f"{BASE_URL}/api/products", params={"type": "jewelry"})
+        assert response.status_code == 200
+        products = response.json()
+        assert products, "No jewelry products seeded"
+        return products[0]
+
+    def create_coupon(self, admin_session, **overrides):
+        payload = {"code": f"TEST{uuid.uuid4().hex[:6]}", "discount_type": "percentage", "value": 10, **overrides}
+        response = admin_session.post(f"{BASE_URL}/api/admin/coupons", json=payload)
+        assert response.status_code == 200, f"Create coupon failed: {response.text}"
+        return response.json()["coupon"]
+
+    def fill_cart(self, user_session, product):
+        user_session.delete(f"{BASE_URL}/api/cart/clear")
+        response = user_session.post(f"{BASE_URL}/api/cart/add", json={"product_id": product["product_id"], "quantity": 1})
+        assert response.status_code == 200
+
+    def test_create_coupon_requires_admin(self, user_session):
+        response = user_session.post(f"{BASE_URL}/api/admin/coupons", json={"code": "X", "discount_type": "fixed", "value": 5})
+        assert response.status_code == 403
+
+    def test_invalid_discount_type_rejected(self, admin_session):
+        response = admin_session.post(f"{BASE_URL}/api/admin/coupons", json={"code": "BAD", "discount_type": "bogus", "value": 5})
+        assert response.status_code == 400
+
+    def test_percentage_coupon_priced_on_cart(self, admin_session, user_session, product):
+        coupon = self.create_coupon(admin_session, value=10)
+        self.fill_cart(user_session, product)
+
+        response = user_session.get(f"{BASE_URL}/api/cart", params={"coupon_code": coupon["code"].lower()})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["discount"] == round(product["price_qar"] * 0.1, 2)
+        assert data["total_after_discount"] == round(data["total"] - data["discount"], 2)
+
+    def test_karat_scoped_coupon_skips_other_karats(self, admin_session, user_session, product):
+        other_karat = 9 if product.get("karat") != 9 else 14
+        coupon = self.create_coupon(admin_session, discount_type="fixed", value=100, karats=[other_karat])
+        self.fill_cart(user_session, product)
+
+        response = user_session.get(f"{BASE_URL}/api/cart", params={"coupon_code": coupon["code"]})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["discount"] == 0
+        assert "coupon_error" in data
+
+    def test_order_applies_coupon_and_enforces_usage_cap(self, admin_session, user_session, product):
+        coupon = self.create_coupon(admin_session, discount_type="fixed", value=50, usage_limit=1)
+
+        self.fill_cart(user_session, product)
+        response = user_session.post(f"{BASE_URL}/api/orders", json={"items": [], "coupon_code": coupon["code"]})
+        assert response.status_code == 200, f"Order failed: {response.text}"
+        order = response.json()["order"]
+        assert order["discount_qar"] == 50
+        assert order["total_qar"] == round(order["subtotal_qar"] - 50, 2)
+
+        self.fill_cart(user_session, product)
+        response = user_session.post(f"{BASE_URL}/api/orders", json={"items": [], "coupon_code": coupon["code"]})
+        assert response.status_code == 400, "Usage cap of 1 should reject the second order"
+
+    def test_non_positive_usage_limit_rejected(self, admin_session):
+        for limit in (0, -1):
+            response = admin_session.post(f"{BASE_URL}/api/admin/coupons", json={
+                "code": f"TEST{uuid.uuid4().hex[:6]}", "discount_type": "fixed", "value": 5, "usage_limit": limit})
+            assert response.status_code == 400
+
+    def test_cart_and_order_price_coupon_alike(self, admin_session, user_session, product):
+        coupon = self.create_coupon(admin_session, value=10)
+        self.fill_cart(user_session, product)
+        # Gold investment lines are not discountable
+        user_session.post(f"{BASE_URL}/api/cart/add-gold", json={"karat": 24, "grams": 10, "price_per_gram": 250})
+
+        cart = user_session.get(f"{BASE_URL}/api/cart", params={"coupon_code": coupon["code"]}).json()
+        assert cart["discount"] == round(product["price_qar"] * 0.1, 2)
+        response = user_session.post(f"{BASE_URL}/api/orders", json={"items": [], "coupon_code": coupon["code"]})
+        assert response.status_code == 200, f"Order failed: {response.text}"
+        assert response.json()["order"]["discount_qar"] == cart["discount"]
@@ -294,6 +294,19 @@ class TestGetVoucherByCode:
         assert "expires_at" in data
         print(f"Voucher {voucher_code} retrieved successfully")
     
+    def test_get_voucher_conditional(self, auth_session_and_voucher):
+        """Repeat fetch with If-None-Match returns 304"""
+        session, voucher_code = auth_session_and_voucher
+        
+        response = requests.get(f"{BASE_URL}/api/gifts/voucher/{voucher_code}")
+        etag = response.headers.get("ETag")
+        assert etag, "Voucher response should carry an ETag"
+        assert "no-cache" in response.headers.get("Cache-Control", "")
+        
+        response = requests.get(f"{BASE_URL}/api/gifts/voucher/{voucher_code}", headers={"If-None-Match": etag})
+        assert response.status_code == 304, f"Expected 304, got {response.status_code}"
+        print(f"Voucher {voucher_code} revalidated with 304")
+    
     def test_get_voucher_invalid_code(self):
         """Test getting voucher with invalid code returns 404"""
         response = requests.get(f"{BASE_URL}/api/gifts/voucher/INVALID123")
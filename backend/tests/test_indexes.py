@@ -0,0 +1,30 @@
+"""
+Index verification - every query shape in server.py must be index-backed.
+Runs ensure_indexes() against MONGO_URL, then explain() on each QUERY_SHAPES
+entry and fails on any COLLSCAN.
+"""
+import asyncio
+import pytest
+
+import server
+
+
+async def reconcile_and_explain():
+    await server.client.admin.command('ping')
+    await server.ensure_indexes()
+    # Second run must be a no-op
+    await server.ensure_indexes()
+    return await server.find_collscans()
+
+
+def test_no_query_shape_uses_collscan():
+    try:
+        collscans = asyncio.run(reconcile_and_explain())
+    except Exception as e:
+        pytest.skip(f"MongoDB not reachable: {e}")
+    assert not collscans, f"Query shapes without index: {collscans}"
+
+
+def test_every_shape_collection_has_index_spec():
+    for collection_name, _, _ in server.QUERY_SHAPES:
+        assert collection_name in server.INDEX_SPECS, f"No index spec for {collection_name}"
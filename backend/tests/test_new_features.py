@@ -62,9 +62,78 @@ class TestGoldPrices:
         for price in prices:
             for field in required_fields:
                 assert field in price, f"Missing field: {field}"
+            # Same UTC format the response model has always produced
+            assert price["updated_at"].endswith("Z"), price["updated_at"]
         print(f"✓ All required fields present in gold prices")
 
 
+class TestPriceMatrix:
+    """Test /api/prices/matrix - metals x purities x currencies computed per tick"""
+
+    def test_matrix_gold_24k_qar_matches_gold_prices(self):
+        """Matrix 24K QAR cell should agree with /api/gold-prices"""
+        prices = requests.get(f"{BASE_URL}/api/gold-prices").json()
+        price_24k = next(p for p in prices if p["karat"] == 24)["price_per_gram_qar"]
+
+        response = requests.get(f"{BASE_URL}/api/prices/matrix", params={"asset": "gold", "purity": 24, "currency": "QAR"})
+        assert response.status_code == 200
+        rows = response.json()["rows"]
+        assert len(rows) == 1
+        assert abs(rows[0]["prices_per_gram"]["QAR"] - price_24k) < 0.01
+        print(f"✓ Matrix 24K QAR: {rows[0]['prices_per_gram']['QAR']}")
+
+    @pytest.fixture
+    def admin_headers(self):
+        response = requests.post(
+            f"{BASE_URL}/api/auth/login",
+            json={"email": "eng.mohamed87@live.com", "password": "Realmadridclub2011"}
+        )
+        if response.status_code != 200:
+            pytest.skip("Could not authenticate")
+        return {"Authorization": f"Bearer {response.json().get('token')}"}
+
+    def test_matrix_covers_all_assets_and_currencies(self, admin_headers):
+        """Full matrix should include 14K/9K gold, silver, platinum and Gulf currencies"""
+        spot = requests.put(f"{BASE_URL}/api/admin/prices/spot/platinum", json={"usd_per_oz": 1000}, headers=admin_headers)
+        assert spot.status_code == 200, spot.text
+        response = requests.get(f"{BASE_URL}/api/prices/matrix")
+        assert response.status_code == 200
+        data = response.json()
+        assert set(data["currencies"]) >= {"QAR", "SAR", "AED", "KWD", "USD"}
+        rows = {(r["asset"], r["purity"]) for r in data["rows"]}
+        assert {("gold", k) for k in (24, 22, 21, 18, 14, 9)} <= rows
+        assert {("platinum", 999), ("platinum", 950)} <= rows
+        # Silver comes from the live feed: priced whenever the feed has served it recently
+        if "silver" in data["spot_as_of"]:
+            assert {("silver", 999), ("silver", 925)} <= rows
+        print(f"✓ Matrix has {len(rows)} rows x {len(data['currencies'])} currencies")
+
+    def test_configured_platinum_spot_priced(self, admin_headers):
+        """Platinum 950 QAR/g follows the admin-set spot"""
+        requests.put(f"{BASE_URL}/api/admin/prices/spot/platinum", json={"usd_per_oz": 1200}, headers=admin_headers)
+        response = requests.get(f"{BASE_URL}/api/prices/matrix", params={"asset": "platinum", "purity": 950, "currency": "USD"})
+        assert response.status_code == 200
+        usd = response.json()["rows"][0]["prices_per_gram"]["USD"]
+        assert abs(usd - 1200 / 31.1035 * 1.44 * 0.95) < 0.01
+
+    def test_implausible_or_unconfigurable_spot_rejected(self, admin_headers):
+        """Spots outside the sanity band, or for feed-priced metals, are refused"""
+        response = requests.put(f"{BASE_URL}/api/admin/prices/spot/platinum", json={"usd_per_oz": 5}, headers=admin_headers)
+        assert response.status_code == 400
+        response = requests.put(f"{BASE_URL}/api/admin/prices/spot/gold", json={"usd_per_oz": 3000}, headers=admin_headers)
+        assert response.status_code == 404
+
+    def test_matrix_rejects_unknown_metal(self):
+        """Unsupported metal should be rejected"""
+        response = requests.get(f"{BASE_URL}/api/prices/matrix", params={"asset": "copper"})
+        assert response.status_code == 400
+
+    def test_matrix_rejects_unknown_currency(self):
+        """Unsupported currency should be rejected"""
+        response = requests.get(f"{BASE_URL}/api/prices/matrix", params={"currency": "EUR"})
+        assert response.status_code == 400
+
+
 class TestPasswordReset:
     """Test password reset flow"""
     